@@ -1,5 +1,6 @@
-from django.contrib import admin
-from .models import Team, Game, Player, PlayerStatistics
+from django.contrib import admin, messages
+from .archive import ArchiveError, archive_season, unarchive_season
+from .models import Season, Team, Game, Player, PlayerStatistics, IngestJob, UploadBatch
 
 # In your app's admin.py file
 from django.core.cache import cache
@@ -11,25 +12,83 @@ clear_cache.short_description = "Clear cache"
 
 admin.site.add_action(clear_cache, "clear_cache")
 
+class ArchivedSeasonAdmin(admin.ModelAdmin):
+    """Rows of an archived season are read-only; their model clean() keeps new ones out"""
+    season_lookup = 'season'
+
+    def is_archived(self, obj):
+        season_id = obj.game.season_id if self.season_lookup == 'game__season' else obj.season_id
+        return Season.objects.filter(pk=season_id, is_archived=True).exists()
+
+    def has_change_permission(self, request, obj=None):
+        if obj is not None and self.is_archived(obj):
+            return False
+        return super().has_change_permission(request, obj)
+
+    def has_delete_permission(self, request, obj=None):
+        if obj is not None and self.is_archived(obj):
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset.exclude(**{f'{self.season_lookup}__is_archived': True}))
+
+
+@admin.register(Season)
+class SeasonAdmin(admin.ModelAdmin):
+    list_display = ('number', 'is_archived', 'data_version', 'data_updated_at')
+    list_filter = ('is_archived',)
+    readonly_fields = ('is_archived', 'data_version', 'data_updated_at')
+    actions = ['archive', 'unarchive']
+
+    @admin.action(description="Archive selected seasons")
+    def archive(self, request, queryset):
+        for season in queryset.filter(is_archived=False):
+            try:
+                stored = archive_season(season)
+            except ArchiveError as e:
+                self.message_user(request, f"Could not archive season {season}: {e}", messages.ERROR)
+                continue
+            self.message_user(request, f"Archived season {season} with {stored} responses", messages.SUCCESS)
+
+    @admin.action(description="Unarchive selected seasons")
+    def unarchive(self, request, queryset):
+        for season in queryset.filter(is_archived=True):
+            unarchive_season(season)
+            self.message_user(request, f"Unarchived season {season}", messages.SUCCESS)
+
 @admin.register(Team)
-class TeamAdmin(admin.ModelAdmin):
+class TeamAdmin(ArchivedSeasonAdmin):
     list_display = ('name', 'hex_color', 'wins', 'losses')
     search_fields = ('name',)
 
 @admin.register(Game)
-class GameAdmin(admin.ModelAdmin):
+class GameAdmin(ArchivedSeasonAdmin):
     list_display = ('game_number', 'date', 'home_team', 'away_team', 'home_team_score', 'away_team_score', 'winner')
     list_filter = ('date', 'home_team', 'away_team')
     search_fields = ('game_number',)
 
 @admin.register(Player)
-class PlayerAdmin(admin.ModelAdmin):
+class PlayerAdmin(ArchivedSeasonAdmin):
     list_display = ('name', 'jersey_number', 'position', 'team')
     list_filter = ('team', 'position')
     search_fields = ('name', 'jersey_number')
 
 @admin.register(PlayerStatistics)
-class PlayerStatisticsAdmin(admin.ModelAdmin):
+class PlayerStatisticsAdmin(ArchivedSeasonAdmin):
+    season_lookup = 'game__season'
     list_display = ('player', 'game', 'two_point_fg', 'three_point_fg', 'free_throw_fg', 'offensive_rebounds', 'defensive_rebounds', 'assists', 'steals', 'blocks', 'fouls')
     list_filter = ('player', 'game')
     search_fields = ('player__name', 'game__game_number')
+
+@admin.register(IngestJob)
+class IngestJobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'season_number', 'status', 'rows_processed', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'season_number')
+    readonly_fields = ('rows_processed', 'result', 'errors', 'created_at', 'started_at', 'finished_at')
+
+@admin.register(UploadBatch)
+class UploadBatchAdmin(admin.ModelAdmin):
+    list_display = ('season', 'kind', 'content_hash', 'created_at')
+    list_filter = ('season', 'kind')
+    search_fields = ('content_hash',)
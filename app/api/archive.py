@@ -0,0 +1,59 @@
+"""
+Archiving of a completed season. An archived season can't be changed by an
+upload or in the admin, so its reads never go stale: archiving computes the
+final standings, player totals and leaderboards (the paths in
+settings.SEASON_ARCHIVE_PATHS, expanded like RESPONSE_CACHE_WARM_PATHS) and
+stores them as ArchivedResponses, and api.cache serves the season's
+responses as immutable without reaching the database.
+
+The responses are computed past the response cache, so a failed archive
+leaves nothing cached; the cache learns that the season is archived from
+the reads after the archive commits.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.http import QueryDict
+
+from .cache import archived_response_path, archived_season_key, get_response_cache, run_view
+from .models import ArchivedResponse, Season
+from .warming import warm_paths
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_season(season):
+    """Archive a season and store its final responses; returns how many were stored"""
+    paths = warm_paths(season.number, settings.SEASON_ARCHIVE_PATHS)
+    with transaction.atomic():
+        seasons = Season.objects.filter(pk=season.pk)
+        seasons.update(is_archived=True)
+        # Responses cached before archiving aren't immutable
+        seasons.bump_data_version()
+        for path in paths:
+            response = run_view(path, cache=False)
+            if response.status_code != 200:
+                raise ArchiveError(f'GET {path} returned {response.status_code}')
+            url, _, query = path.partition('?')
+            ArchivedResponse.objects.update_or_create(
+                season=season, path=archived_response_path(url, QueryDict(query)),
+                defaults={'data': response.data},
+            )
+    season.is_archived = True
+    return len(paths)
+
+
+def unarchive_season(season):
+    """Let a season be changed again, dropping its stored responses"""
+    with transaction.atomic():
+        seasons = Season.objects.filter(pk=season.pk)
+        seasons.update(is_archived=False)
+        seasons.bump_data_version()
+        ArchivedResponse.objects.filter(season=season).delete()
+        # Before the commit as well as after it, so reads stop skipping the database as soon as they can
+        # see the change; one racing the commit can still store the marker again until it expires
+        response_cache = get_response_cache()
+        response_cache.delete(archived_season_key(season.number))
+        transaction.on_commit(lambda: response_cache.delete(archived_season_key(season.number)))
+    season.is_archived = False
@@ -0,0 +1,318 @@
+"""
+Caching of the read endpoints' responses per season.
+
+Every season carries a data version that is bumped whenever one of its teams,
+players, games or box scores changes (see api.signals and the bulk write
+paths). Responses are cached under a key containing the version, so a write
+makes the season's earlier responses unreachable without having to find and
+delete them, and leaves the other seasons' responses cached.
+
+The key also makes a strong ETag, so a client polling an unchanged response
+gets a 304 for the price of the version lookup. There is no Last-Modified:
+the time the season last changed is shared by all of its URLs, and a date
+seen on one of them would answer If-Modified-Since on others it never got.
+
+A missing response is computed by one request at a time: the others are
+served the season's previous response while it runs, or wait briefly for
+its result, so a burst of requests after a write runs the computation once.
+
+Cached responses are fresh for RESPONSE_CACHE_SOFT_TIMEOUT seconds and kept
+for the DEFAULT_CACHE_TIMEOUT of REST_FRAMEWORK. In between, the stale
+response is served right away while one background thread recomputes it by
+running the request through its view again.
+
+An archived season can't change, so whether a season is archived is itself
+cached, for RESPONSE_CACHE_SOFT_TIMEOUT seconds like any other staleness the
+cache allows, and its responses are sent as immutable, without the staleness
+check. The responses stored as ArchivedResponses when it was archived refill
+the cache after a miss and are kept until it is cleared, so browsing an
+archived season doesn't reach the database once cached; any other query
+string of it is cached for the usual timeout.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Season, ArchivedResponse
+
+logger = logging.getLogger(__name__)
+
+# Cache-Control of the responses of an archived season
+ARCHIVED_CACHE_CONTROL = 'immutable, max-age=31536000'
+
+SeasonVersion = namedtuple('SeasonVersion', ['id', 'version', 'is_archived'])
+
+# How often a request waiting for another one's response checks the cache
+WAIT_POLL_INTERVAL = 0.05
+
+# Counters of this process. Cached responses were a "hit" when fresh, "stale"
+# when served while refreshed, and a "miss" when computed for the request.
+# "coalesced" requests were served a response computed by another request,
+# and "waited" ones had to wait for it.
+stats = Counter()
+stats_lock = threading.Lock()
+LOOKUPS = ['hit', 'stale', 'miss']
+
+_refresh_pool = None
+
+
+def record(event):
+    with stats_lock:
+        stats[event] += 1
+
+
+def get_stats():
+    """The counters, with the share of cache lookups that were hits, stale or misses"""
+    with stats_lock:
+        counters = dict(stats)
+    lookups = sum(counters.get(event, 0) for event in LOOKUPS)
+    for event in LOOKUPS:
+        counters[f'{event}_ratio'] = round(counters.get(event, 0) / lookups, 4) if lookups else None
+    return counters
+
+
+def get_refresh_pool():
+    global _refresh_pool
+    if _refresh_pool is None:
+        _refresh_pool = ThreadPoolExecutor(
+            max_workers=settings.RESPONSE_CACHE_REFRESH_WORKERS, thread_name_prefix='response-cache'
+        )
+    return _refresh_pool
+
+
+def get_response_cache():
+    return caches[settings.REST_FRAMEWORK.get('DEFAULT_CACHE_BACKEND', 'default')]
+
+
+def get_cache_timeout():
+    return settings.REST_FRAMEWORK.get('DEFAULT_CACHE_TIMEOUT', 300)
+
+
+def normalized_params(query_params):
+    """The query string with its parameters sorted, so the same request in another order shares a key"""
+    return urlencode(sorted(
+        (key, value) for key, values in query_params.lists() for value in values
+    ))
+
+
+def archived_season_key(season_number):
+    return f'api:archived-season:{season_number}'
+
+
+def archived_response_path(path, query_params):
+    """The path an ArchivedResponse of a GET is stored under"""
+    return f'{path}?{normalized_params(query_params)}'
+
+
+def get_season_version(request):
+    """
+    The SeasonVersion of the season a read request is for, or None when the
+    request isn't for a single existing season and can't be cached.
+    """
+    try:
+        season_number = int(request.query_params.get('season', 1))
+    except (TypeError, ValueError):
+        return None
+
+    cache = get_response_cache()
+    season = cache.get(archived_season_key(season_number))
+    if season is not None:
+        return season
+    season = (Season.objects.filter(number=season_number)
+              .values_list('pk', 'data_version', 'is_archived').first())
+    if season is None:
+        return None
+    season = SeasonVersion(*season)
+    if season.is_archived:
+        # A read that looked the season up just before it was unarchived can still store this after
+        # unarchiving deleted it, so it only outlives the archive for as long as a stale response would
+        cache.set(archived_season_key(season_number), season, settings.RESPONSE_CACHE_SOFT_TIMEOUT)
+    return season
+
+
+def response_cache_key(view, request, season_id, version, kwargs):
+    """The key of the response for a data version, or with version None, of the latest response computed"""
+    version = 'latest' if version is None else f'v{version}'
+    lookup = ','.join(f'{key}={value}' for key, value in sorted(kwargs.items()))
+    params = hashlib.md5(normalized_params(request.query_params).encode()).hexdigest()
+    return f'api:response:{view.basename}:{view.action}:{lookup}:season={season_id}:{version}:{params}'
+
+
+def response_headers(key, season):
+    # The key names the season's data version and everything else the response depends on
+    headers = {'ETag': quote_etag(hashlib.md5(key.encode()).hexdigest())}
+    if season.is_archived:
+        headers['Cache-Control'] = ARCHIVED_CACHE_CONTROL
+    else:
+        # A write can change the season at any time, so clients revalidate every time, which the
+        # ETag makes cheap, and may show what they have meanwhile
+        headers['Cache-Control'] = (
+            f'max-age=0, stale-while-revalidate={get_cache_timeout() - settings.RESPONSE_CACHE_SOFT_TIMEOUT}'
+        )
+    return headers
+
+
+def store_response(cache, key, season, latest_key, data, permanent=False):
+    # Only the responses stored when a season was archived are kept until the cache is cleared; other
+    # query strings could otherwise fill it with entries that never expire
+    timeout = None if permanent else get_cache_timeout()
+    cache.set(key, (time.time(), data), timeout)
+    cache.set(latest_key, (season.version, data), timeout)
+
+
+def run_view(path, host=None, cache=True):
+    """
+    Compute and cache the response of a GET of `path` by running it through
+    its view, or with cache=False only compute it, leaving the cache as it is
+    """
+    request = RequestFactory().get(path, **({'HTTP_HOST': host} if host else {}))
+    if cache:
+        request.response_cache_refresh = True
+    else:
+        request.response_cache_bypass = True
+    match = resolve(request.path_info)
+    return match.func(request, *match.args, **match.kwargs)
+
+
+def closing_connections(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # Pool threads would otherwise keep their database connections open
+        connections.close_all()
+
+
+def refresh_response(path, host, key):
+    try:
+        run_view(path, host)
+    except Exception:
+        logger.exception('Could not refresh the cached response of %s', path)
+    finally:
+        get_response_cache().delete(f'{key}:lock')
+
+
+def refresh_in_background(cache, request, key):
+    """Refresh a stale response in the refresh pool, unless another request already is"""
+    if not cache.add(f'{key}:lock', True, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        return
+    if settings.RESPONSE_CACHE_REFRESH_WORKERS:
+        get_refresh_pool().submit(
+            closing_connections, refresh_response, request.get_full_path(), request.get_host(), key
+        )
+    else:
+        refresh_response(request.get_full_path(), request.get_host(), key)
+
+
+def compute_once(cache, key, season, latest_key, compute):
+    """
+    Compute and cache a missing response, or when another request already
+    is, serve the latest response of an earlier version or wait for the
+    other's. Returns the response and whether it is for the current version.
+    """
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, settings.RESPONSE_CACHE_LOCK_TIMEOUT):
+        try:
+            response = compute()
+            if response.status_code == status.HTTP_200_OK:
+                store_response(cache, key, season, latest_key, response.data)
+            return response, True
+        finally:
+            cache.delete(lock_key)
+
+    latest = cache.get(latest_key)
+    if latest is not None and latest[0] < season.version:
+        record('coalesced')
+        return Response(latest[1]), False
+
+    record('waited')
+    deadline = time.monotonic() + settings.RESPONSE_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_POLL_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            record('coalesced')
+            return Response(entry[1]), True
+        if not cache.has_key(lock_key):
+            # The other request failed or its response can't be cached
+            break
+    return compute(), True
+
+
+def season_cached(view_method):
+    """
+    Cache the successful responses of a read action under the season's data
+    version, serve them stale while they are refreshed, and answer
+    conditional requests for an unchanged season with 304
+    """
+
+    @wraps(view_method)
+    def cached_view_method(self, request, *args, **kwargs):
+        if getattr(request, 'response_cache_bypass', False):
+            return view_method(self, request, *args, **kwargs)
+        season = get_season_version(request)
+        if season is None:
+            return view_method(self, request, *args, **kwargs)
+
+        key = response_cache_key(self, request, season.id, season.version, kwargs)
+        headers = response_headers(key, season)
+        not_modified = get_conditional_response(request, etag=headers['ETag'])
+        if not_modified is not None:
+            for header, value in headers.items():
+                not_modified.headers[header] = value
+            return not_modified
+
+        cache = get_response_cache()
+        latest_key = response_cache_key(self, request, season.id, None, kwargs)
+        if getattr(request, 'response_cache_refresh', False):
+            # A background refresh, which holds the lock of the response
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                store_response(cache, key, season, latest_key, response.data)
+            return response
+
+        entry = cache.get(key)
+        if entry is not None:
+            computed_at, data = entry
+            if season.is_archived or time.time() - computed_at < settings.RESPONSE_CACHE_SOFT_TIMEOUT:
+                record('hit')
+            else:
+                record('stale')
+                refresh_in_background(cache, request, key)
+            return Response(data, headers=headers)
+
+        if season.is_archived:
+            # Refill the cache from the responses stored when the season was archived
+            path = archived_response_path(request.path, request.query_params)
+            archived = (ArchivedResponse.objects.filter(season_id=season.id, path=path)
+                        .values_list('data', flat=True).first())
+            if archived is not None:
+                record('hit')
+                store_response(cache, key, season, latest_key, archived, permanent=True)
+                return Response(archived, headers=headers)
+
+        record('miss')
+        response, current = compute_once(
+            cache, key, season, latest_key, lambda: view_method(self, request, *args, **kwargs)
+        )
+        # A previous version's response can't carry the validators of the current one
+        if current and response.status_code == status.HTTP_200_OK:
+            for header, value in headers.items():
+                response.headers[header] = value
+        return response
+
+    return cached_view_method
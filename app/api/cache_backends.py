@@ -0,0 +1,284 @@
+"""
+A two-tier cache backend: a bounded in-process LRU (L1) in front of a cache
+shared by every worker (L2), normally django-redis.
+
+Reads are served from L1 when possible and fill it from L2. Every write,
+delete and clear goes to L2, and when it replaces or removes an entry, an
+invalidation message is broadcast so the other workers drop their L1 copy of
+the key. Entries also expire from L1 after LOCAL_TIMEOUT seconds, which
+bounds how stale a worker can be should it miss a broadcast. L2 holds each
+value with the time it was written and the time it expires, so an L1 copy
+never outlives its L2 entry either.
+
+The write time orders L1 copies: an invalidation leaves a marker with the
+time of the write or delete it announces, and a fill from an older L2 read
+that finishes after it is dropped instead of bringing the old value back.
+The times come from each worker's clock, so clocks out of step by more than
+the gap between two writes of a key can keep a worker from caching it
+locally until the marker expires, but never make it serve an older value
+than one it was told about.
+
+    CACHES = {
+        'shared': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': 'redis://redis:6379/1'},
+        'default': {
+            'BACKEND': 'api.cache_backends.TwoTierCache',
+            'LOCATION': 'default',
+            'OPTIONS': {
+                'SHARED_CACHE': 'shared',
+                'BUS': 'api.cache_backends.RedisInvalidationBus',
+                'LOCAL_MAX_ENTRIES': 1000,
+                'LOCAL_TIMEOUT': 300,
+            },
+        },
+    }
+
+LocalInvalidationBus delivers the broadcasts within the process; together
+with a LocMemCache as the shared tier it stands in for redis in tests and
+development.
+"""
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Broadcast in place of a key when a worker cleared the whole cache
+CLEAR_ALL = '*'
+
+
+class LocalTier:
+    """The in-process LRU; shared by every thread of the process, like LocMemCache's storage"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        # key: (expires at, written at, pickled value or None for an invalidated key)
+        self.entries = OrderedDict()
+        self.cleared_at = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, written_at, pickled, timeout):
+        """Store a copy written at `written_at`, unless the key was since written again, deleted or cleared"""
+        with self.lock:
+            if written_at < self.cleared_at:
+                return
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic() and entry[1] > written_at:
+                return
+            self.entries[key] = (time.monotonic() + timeout, written_at, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key, written_at, timeout):
+        """Drop the copy of a key changed at `written_at`, remembering when so older fills are dropped too"""
+        self.set(key, written_at, None, timeout)
+
+    def clear(self, cleared_at):
+        with self.lock:
+            self.entries.clear()
+            self.cleared_at = max(self.cleared_at, cleared_at)
+
+
+class LocalInvalidationBus:
+    """Delivers invalidation messages to the caches of the current process only"""
+    _subscribers = defaultdict(list)
+    _lock = threading.Lock()
+
+    def __init__(self, channel, options):
+        self.channel = channel
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers[self.channel])
+        for callback in subscribers:
+            callback(message)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._subscribers[self.channel].append(callback)
+
+
+class RedisInvalidationBus:
+    """Delivers invalidation messages to every process through redis pub/sub on the shared cache's server"""
+
+    def __init__(self, channel, options):
+        try:
+            from django_redis import get_redis_connection
+        except ImportError:
+            raise ImproperlyConfigured('RedisInvalidationBus requires django-redis')
+        self.channel = channel
+        self.connection = get_redis_connection(options['SHARED_CACHE'])
+
+    def publish(self, message):
+        self.connection.publish(self.channel, message)
+
+    def subscribe(self, callback):
+        pubsub = self.connection.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{self.channel: lambda message: callback(message['data'].decode())})
+        pubsub.run_in_thread(sleep_time=1, daemon=True)
+
+
+# Per LOCATION, the L1 and the bus of the process; caches are instantiated per thread
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+
+def write_stamp():
+    return time.time_ns()
+
+
+def get_local_tier(name, options):
+    with _tiers_lock:
+        if name not in _tiers:
+            tier = LocalTier(options.get('LOCAL_MAX_ENTRIES', 1000))
+            bus = import_string(options.get('BUS', 'api.cache_backends.LocalInvalidationBus'))(
+                options.get('CHANNEL', f"cache-invalidation:{options['SHARED_CACHE']}"), options
+            )
+            local_timeout = options.get('LOCAL_TIMEOUT', 300)
+            # Messages are "origin:written at:key", origin being the id of the process that sent them,
+            # which already updated its own L1
+            origin = uuid.uuid4().hex
+
+            def invalidate(message):
+                sender, written_at, key = message.split(':', 2)
+                if sender == origin:
+                    return
+                if key == CLEAR_ALL:
+                    tier.clear(int(written_at))
+                else:
+                    tier.invalidate(key, int(written_at), local_timeout)
+
+            bus.subscribe(invalidate)
+            _tiers[name] = (tier, bus, origin)
+        return _tiers[name]
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        if 'SHARED_CACHE' not in options:
+            raise ImproperlyConfigured('TwoTierCache needs the alias of the shared cache in OPTIONS["SHARED_CACHE"]')
+        self.shared = caches[options['SHARED_CACHE']]
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        self.local, self.bus, self.origin = get_local_tier(location or 'default', options)
+
+    def local_timeout_for(self, timeout):
+        return self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+
+    def shared_entry(self, value, timeout):
+        """What L2 holds: the value with the time it was written and the wall clock time it expires at, None
+        for never"""
+        return (write_stamp(), None if timeout is None else time.time() + timeout, value)
+
+    def remaining_timeout(self, expires_at):
+        return None if expires_at is None else expires_at - time.time()
+
+    def broadcast(self, key, written_at):
+        try:
+            self.bus.publish(f'{self.origin}:{written_at}:{key}')
+        except Exception:
+            # The other workers' copies still expire after LOCAL_TIMEOUT
+            logger.exception('Could not broadcast the invalidation of %s', key)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        pickled = self.local.get(local_key)
+        if pickled is not None:
+            return pickle.loads(pickled)
+
+        entry = self.shared.get(key, version=version)
+        if entry is None:
+            return default
+        written_at, expires_at, value = entry
+        local_timeout = self.local_timeout_for(self.remaining_timeout(expires_at))
+        if local_timeout > 0:
+            self.local.set(local_key, written_at, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        entry = self.shared_entry(value, timeout)
+        # Only an entry that replaced another can have copies in the other workers
+        replaced = not self.shared.add(key, entry, timeout, version=version)
+        if replaced:
+            self.shared.set(key, entry, timeout, version=version)
+        local_timeout = self.local_timeout_for(timeout)
+        if local_timeout > 0:
+            self.local.set(local_key, entry[0], pickle.dumps(value, pickle.HIGHEST_PROTOCOL), local_timeout)
+        else:
+            self.local.invalidate(local_key, entry[0], self.local_timeout)
+        if replaced:
+            self.broadcast(local_key, entry[0])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        # A new entry replaces nothing any worker could have a copy of
+        return self.shared.add(key, self.shared_entry(value, timeout), timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        # The entry is rewritten with its new expiry, which the L1 copies must not outlive
+        entry = self.shared.get(key, version=version)
+        if entry is None:
+            return False
+        self.set(key, entry[2], timeout, version=version)
+        return True
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted_at = write_stamp()
+        deleted = self.shared.delete(key, version=version)
+        self.local.invalidate(local_key, deleted_at, self.local_timeout)
+        if deleted:
+            self.broadcast(local_key, deleted_at)
+        return deleted
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        return self.local.get(local_key) is not None or self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Not atomic, as in BaseCache: L2 holds entries rather than numbers it could increment
+        entry = self.shared.get(key, version=version)
+        if entry is None:
+            raise ValueError(f"Key '{key}' not found")
+        _, expires_at, value = entry
+        value += delta
+        remaining = self.remaining_timeout(expires_at)
+        if remaining is not None and remaining <= 0:
+            raise ValueError(f"Key '{key}' not found")
+        self.set(key, value, remaining, version=version)
+        return value
+
+    def clear(self):
+        cleared_at = write_stamp()
+        self.shared.clear()
+        self.local.clear(cleared_at)
+        self.broadcast(CLEAR_ALL, cleared_at)
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
@@ -0,0 +1,456 @@
+"""
+Bulk CSV ingest. Uploads are streamed from the file, resolve the names and
+numbers they reference in a few queries and write in batches, instead of a
+few round trips per row.
+"""
+import csv
+import hashlib
+import io
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal, InvalidOperation
+from functools import cache
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.validators import MinValueValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+
+from .models import Season, Team, Player, Game, PlayerStatistics, PlayerSeasonTotals, IngestJob, UploadBatch
+from .serializers import PlayerCSVSerializer
+from .warming import warm_season
+
+BATCH_SIZE = 1000
+# A dry run reports at most this many errors, and how many there were in total
+MAX_REPORTED_ERRORS = 1000
+
+# Box score columns after the player name and game number, in CSV order
+STATISTICS_COLUMNS = [
+    'minutes_played', 'two_point_fg', 'two_point_attempts', 'three_point_fg', 'three_point_attempts',
+    'free_throw_fg', 'free_throw_attempts', 'offensive_rebounds', 'defensive_rebounds',
+    'assists', 'turnovers', 'steals', 'blocks', 'fouls', 'fouls_drawn', 'plus_minus', 'efficiency',
+]
+# The decimal columns come last
+DECIMAL_COLUMNS = ['plus_minus', 'efficiency']
+INTEGER_COLUMNS = STATISTICS_COLUMNS[1:-len(DECIMAL_COLUMNS)]
+# Player fields a roster upload overwrites on an existing player
+ROSTER_FIELDS = ['jersey_number', 'position', 'team']
+# Result counts of each upload kind that mean the season's data changed
+WRITE_COUNTS = {
+    IngestJob.ROSTER: ['players_created', 'players_updated'],
+    IngestJob.BOX_SCORES: ['inserted', 'updated'],
+}
+
+
+class IngestError(Exception):
+    """An upload that can't be written; `detail` is the response body explaining why"""
+
+    def __init__(self, detail):
+        super().__init__(detail['error'])
+        self.detail = detail
+
+
+def batched(iterable, size):
+    """Lists of up to `size` items from an iterable, consumed lazily"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@contextmanager
+def uploaded_csv(uploaded_file, reader=csv.reader):
+    """
+    A csv reader over an uploaded file that decodes it incrementally, so only
+    a buffer of the upload is in memory however large it is. Large uploads
+    are already spooled to a temporary file by Django.
+    """
+    uploaded_file.seek(0)
+    text = io.TextIOWrapper(uploaded_file.file, encoding='utf-8', newline='')
+    try:
+        yield reader(text)
+    except UnicodeDecodeError:
+        raise IngestError({'error': 'The file is not UTF-8 encoded text'})
+    finally:
+        # Leave the upload open for Django to close and clean up
+        text.detach()
+
+
+def parse_minutes_played(time_str):
+    if isinstance(time_str, str) and ":" in time_str:
+        minutes, seconds = map(int, time_str.split(":"))
+        return minutes * 60 + seconds
+    return 0  # default fallback
+
+
+def is_playoff_game(game_number):
+    """Playoff games are referenced by their bracket code (QF1, SF2, F, TTB...) instead of a number"""
+    return "F" in game_number or "TTB" in game_number
+
+
+@cache
+def statistics_validators():
+    """The model field validators of each box score column, like the ranges the database accepts"""
+    validators = []
+    for column in STATISTICS_COLUMNS:
+        field = PlayerStatistics._meta.get_field(column)
+        # Positive integer columns have a check constraint, which not every backend adds a validator for
+        positive = [MinValueValidator(0)] if isinstance(field, models.PositiveIntegerField) else []
+        validators.append((column, [*positive, *field.validators]))
+    return validators
+
+
+def validate_statistics_fields(row_number, fields):
+    """Reject values that parse but can't be stored, like negative counts or decimals out of range"""
+    for column, validators in statistics_validators():
+        for validator in validators:
+            try:
+                validator(fields[column])
+            except ValidationError as e:
+                raise IngestError({'error': f'Invalid {column} {fields[column]}: {e.messages[0]}', 'row': row_number})
+
+
+def parse_statistics_row(row_number, row):
+    """The player name, game reference and validated field values of one box score row"""
+    if len(row) != 2 + len(STATISTICS_COLUMNS):
+        raise IngestError({
+            'error': f'Expected {2 + len(STATISTICS_COLUMNS)} columns, found {len(row)}',
+            'row': row_number,
+        })
+    player_name, game_number, minutes_played, *values = row
+
+    try:
+        # Fast path for a row of well formed numbers
+        fields = dict(zip(INTEGER_COLUMNS, map(int, values[:len(INTEGER_COLUMNS)])))
+        fields.update(zip(DECIMAL_COLUMNS, map(Decimal, values[len(INTEGER_COLUMNS):])))
+        fields['minutes_played'] = parse_minutes_played(minutes_played)
+    except (ValueError, InvalidOperation):
+        pass
+    else:
+        validate_statistics_fields(row_number, fields)
+        return player_name.strip(), game_number.strip(), fields
+
+    try:
+        fields = {'minutes_played': parse_minutes_played(minutes_played)}
+    except ValueError:
+        raise IngestError({'error': f'Invalid minutes_played {minutes_played!r}', 'row': row_number})
+    for column, value in zip(STATISTICS_COLUMNS[1:], values):
+        value = value.strip() or '0'
+        try:
+            fields[column] = Decimal(value) if column in DECIMAL_COLUMNS else int(value)
+        except (ValueError, InvalidOperation):
+            raise IngestError({'error': f'Invalid {column} {value!r}', 'row': row_number})
+    validate_statistics_fields(row_number, fields)
+    return player_name.strip(), game_number.strip(), fields
+
+
+class BoxScoreIngest:
+    """
+    Upsert box score rows for one season.
+
+    Rows are consumed in batches. Each batch resolves the player names and
+    game references it hasn't seen yet with one query each and is written
+    with one bulk upsert. bulk_create skips the PlayerStatistics signals, so
+    the replaced and written lines of each batch are summed into season
+    totals deltas here, which are applied once every row is written. Once a name or game is missing nothing more is written,
+    but the remaining rows are still checked so they can all be reported.
+    Run it inside a transaction, and roll back on IngestError.
+    """
+
+    def __init__(self, season, batch_size=BATCH_SIZE, progress=None):
+        self.season = season
+        self.batch_size = batch_size
+        self.progress = progress  # called with the number of rows processed after each batch
+        self.players = {}
+        self.games = {}
+        self.missing_players = set()
+        self.missing_games = set()
+        # Season totals changes of the written batches, applied once at the end
+        self.deltas = defaultdict(Counter)
+        self.counts = Counter(inserted=0, updated=0, unchanged=0)
+
+    def run(self, rows):
+        """
+        Write an iterable of parsed (player name, game reference, fields) rows.
+        Returns the number of box scores inserted, updated and left unchanged.
+        """
+        processed = 0
+        for batch in batched(rows, self.batch_size):
+            processed += len(batch)
+            if self.progress is not None:
+                self.progress(processed)
+            self.resolve(batch)
+            if self.missing_players or self.missing_games:
+                continue
+
+            # A later row for the same player and game replaces the earlier one
+            rows_by_key = {}
+            for player_name, game_number, fields in batch:
+                game = self.games[game_number]
+                rows_by_key[self.players[player_name], game.pk] = (game, fields)
+            self.write([
+                PlayerStatistics(player_id=player_id, game=game, **fields)
+                for (player_id, _), (game, fields) in rows_by_key.items()
+            ])
+
+        if self.missing_players or self.missing_games:
+            raise IngestError({
+                'error': 'Players or games not found',
+                'missing_players': sorted(self.missing_players),
+                'missing_games': sorted(self.missing_games),
+                'season': self.season.number,
+            })
+        PlayerSeasonTotals.objects.apply_deltas(self.deltas)
+        return dict(self.counts)
+
+    def resolve(self, batch):
+        """Look up the names and game references of a batch that earlier batches didn't"""
+        names = {player_name for player_name, _, _ in batch} - self.players.keys() - self.missing_players
+        if names:
+            self.players.update(self.resolve_players(names))
+            self.missing_players |= names - self.players.keys()
+        game_numbers = {game_number for _, game_number, _ in batch} - self.games.keys() - self.missing_games
+        if game_numbers:
+            self.games.update(self.resolve_games(game_numbers))
+            self.missing_games |= game_numbers - self.games.keys()
+
+    def resolve_players(self, names):
+        return dict(Player.objects.filter(season=self.season, name__in=names).values_list('name', 'pk'))
+
+    def resolve_games(self, game_numbers):
+        numbers = {game_number: int(game_number) for game_number in game_numbers
+                   if not is_playoff_game(game_number) and game_number.isdigit()}
+        codes = {game_number for game_number in game_numbers if is_playoff_game(game_number)}
+        games = Game.objects.filter(
+            Q(game_number__in=set(numbers.values())) | Q(playoff_game__in=codes), season=self.season
+        ).only('pk', 'season_id', 'game_number', 'playoff_game')
+
+        by_number, by_code = {}, {}
+        for game in games:
+            by_number[game.game_number] = by_code[game.playoff_game] = game
+        resolved = {game_number: by_number.get(number) for game_number, number in numbers.items()}
+        resolved.update((code, by_code.get(code)) for code in codes)
+        return {game_number: game for game_number, game in resolved.items() if game is not None}
+
+    def write(self, statistics):
+        """Upsert the box scores that are new or differ from the stored ones"""
+        stored = {
+            (line['player_id'], line['game_id']): line
+            for line in PlayerStatistics.objects.filter(
+                player_id__in={box_score.player_id for box_score in statistics},
+                game_id__in={box_score.game_id for box_score in statistics},
+            ).totals_lines(*STATISTICS_COLUMNS)
+        }
+        changed = []
+        for box_score in statistics:
+            line = stored.get((box_score.player_id, box_score.game_id))
+            if line is None:
+                self.counts['inserted'] += 1
+            elif any(line[column] != getattr(box_score, column) for column in STATISTICS_COLUMNS):
+                self.counts['updated'] += 1
+            else:
+                self.counts['unchanged'] += 1
+                continue
+            changed.append(box_score)
+        if not changed:
+            return
+
+        PlayerStatistics.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=['player', 'game'],
+            update_fields=STATISTICS_COLUMNS,
+        )
+        PlayerSeasonTotals.objects.accumulate_deltas(
+            ((stored.get((box_score.player_id, box_score.game_id)), box_score.totals_line())
+             for box_score in changed),
+            self.deltas,
+        )
+
+
+def upsert_roster(season, players):
+    """
+    Create or update a season's players from validated PlayerCSVSerializer
+    data, creating their teams as needed. Returns the (created, updated,
+    unchanged) player counts; only players whose fields differ are written.
+    """
+    # A later row for the same player replaces the earlier one
+    players = {data['name']: data for data in players}
+    team_names = {data['team'] for data in players.values()}
+
+    with transaction.atomic():
+        Team.objects.bulk_create(
+            [Team(name=team_name, season=season) for team_name in team_names],
+            ignore_conflicts=True,
+        )
+        teams = dict(Team.objects.filter(season=season, name__in=team_names).values_list('name', 'pk'))
+        # Team names are unique across seasons, so a name taken by another season was not created
+        taken = sorted(team_names - teams.keys())
+        if taken:
+            raise IngestError({'error': 'Team names already used in another season', 'teams': taken})
+
+        existing = {
+            name: row for name, *row in Player.objects.filter(season=season, name__in=players.keys())
+            .values_list('name', 'jersey_number', 'position', 'team_id')
+        }
+        changed = {
+            name: data for name, data in players.items()
+            if existing.get(name) != [data['jersey_number'], data['position'], teams[data['team']]]
+        }
+        Player.objects.bulk_create(
+            [
+                Player(name=name, season=season, jersey_number=data['jersey_number'],
+                       position=data['position'], team_id=teams[data['team']])
+                for name, data in changed.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['name', 'season'],
+            update_fields=ROSTER_FIELDS,
+            batch_size=BATCH_SIZE,
+        )
+    created = len(changed.keys() - existing.keys())
+    return created, len(changed) - created, len(players) - len(changed)
+
+
+def ingest_box_scores(season, uploaded_file, progress=None):
+    """Upsert the box scores of a player statistics CSV; returns the inserted, updated and unchanged counts"""
+    with uploaded_csv(uploaded_file) as csv_reader:
+        next(csv_reader, None)  # Skip header
+        rows = (
+            parse_statistics_row(row_number, row)
+            for row_number, row in enumerate(csv_reader, start=2)
+            if len(row) > 1 and row[1].strip()  # Skip entry if game number is blank
+        )
+        return BoxScoreIngest(season, progress=progress).run(rows)
+
+
+def ingest_roster(season, uploaded_file, progress=None):
+    """Validate every row of a roster CSV, then upsert it; returns the (created, updated, unchanged) player counts"""
+    players = []
+    errors = []
+    with uploaded_csv(uploaded_file, reader=csv.DictReader) as csv_reader:
+        for row_number, row in enumerate(csv_reader, start=2):
+            serializer = PlayerCSVSerializer(data=row)
+            if serializer.is_valid():
+                players.append(serializer.validated_data)
+            else:
+                errors.append({'row': row_number, 'errors': serializer.errors})
+            if progress is not None and (row_number - 1) % BATCH_SIZE == 0:
+                progress(row_number - 1)
+    if progress is not None:
+        progress(len(players) + len(errors))
+    if errors:
+        raise IngestError({'error': 'Invalid rows', 'errors': errors})
+    return upsert_roster(season, players)
+
+
+def validate_box_scores(season_number, uploaded_file):
+    """
+    Check every row of a player statistics CSV against the season's players
+    and games, loaded into memory up front, without writing anything.
+    Returns the response body listing each error with its row number.
+    """
+    season = Season.objects.filter(number=season_number).first()
+    players, game_numbers, playoff_codes = set(), set(), set()
+    if season is not None:
+        players = set(Player.objects.filter(season=season).values_list('name', flat=True))
+        for game_number, playoff_game in Game.objects.filter(season=season).values_list('game_number', 'playoff_game'):
+            game_numbers.add(game_number)
+            playoff_codes.add(playoff_game)
+
+    rows = 0
+    errors = []
+    error_count = 0
+    with uploaded_csv(uploaded_file) as csv_reader:
+        next(csv_reader, None)  # Skip header
+        for row_number, row in enumerate(csv_reader, start=2):
+            if not (len(row) > 1 and row[1].strip()):
+                continue  # Skipped by the upload too
+            rows += 1
+            try:
+                player_name, game_number, fields = parse_statistics_row(row_number, row)
+            except IngestError as e:
+                row_errors = [e.detail['error']]
+            else:
+                row_errors = []
+                if player_name not in players:
+                    row_errors.append(f'Player {player_name!r} not found')
+                if is_playoff_game(game_number):
+                    found = game_number in playoff_codes
+                else:
+                    found = game_number.isdigit() and int(game_number) in game_numbers
+                if not found:
+                    row_errors.append(f'Game {game_number!r} not found')
+
+            error_count += len(row_errors)
+            errors.extend({'row': row_number, 'error': error} for error in row_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+    return {
+        'dry_run': True,
+        'valid': not error_count,
+        'season': season_number,
+        'rows': rows,
+        'error_count': error_count,
+        'errors': errors,
+    }
+
+
+def content_hash(uploaded_file):
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def archived_season_error(season_number):
+    return IngestError({'error': f"Season {season_number} is archived and can't be changed",
+                        'season': int(season_number)})
+
+
+def check_season_not_archived(season_number):
+    """Raise an IngestError if the season is archived"""
+    if Season.objects.filter(number=season_number, is_archived=True).exists():
+        raise archived_season_error(season_number)
+
+
+def repeated_upload(batch):
+    return {**batch.result, 'already_uploaded': True, 'uploaded_at': batch.created_at.isoformat()}
+
+
+def ingest_upload(kind, season_number, uploaded_file, progress=None):
+    """
+    Run an upload of an IngestJob kind into a season; returns the body of its
+    response. A file that was the last change to the season returns the
+    earlier body instead, marked with already_uploaded.
+    """
+    season, created = Season.objects.get_or_create(number=season_number)
+    if season.is_archived:
+        raise archived_season_error(season_number)
+    upload_hash = content_hash(uploaded_file)
+    batch = UploadBatch.objects.filter(season=season, kind=kind, content_hash=upload_hash).first()
+    # The season changed after the earlier upload, which this one may be reverting to
+    if batch is not None and batch.data_version == season.data_version:
+        return repeated_upload(batch)
+
+    if kind == IngestJob.ROSTER:
+        players_created, players_updated, players_unchanged = ingest_roster(season, uploaded_file, progress)
+        result = {'players_created': players_created, 'players_updated': players_updated,
+                  'players_unchanged': players_unchanged}
+    else:
+        counts = ingest_box_scores(season, uploaded_file, progress)
+        result = {'message': 'CSV file uploaded successfully', **counts}
+    if any(result[key] for key in WRITE_COUNTS[kind]):
+        # Bulk writes bypass the model signals that invalidate the season's cached responses
+        Season.objects.filter(pk=season.pk).bump_data_version()
+        transaction.on_commit(lambda: warm_season(season.number))
+    # bump_data_version is an F() update, so the version is read back
+    season.refresh_from_db(fields=['data_version'])
+    try:
+        # In a savepoint, so the request can go on when the same file uploaded concurrently was recorded first
+        with transaction.atomic():
+            UploadBatch.objects.update_or_create(season=season, kind=kind, content_hash=upload_hash,
+                                                 defaults={'result': result, 'data_version': season.data_version})
+    except IntegrityError:
+        return repeated_upload(UploadBatch.objects.get(season=season, kind=kind, content_hash=upload_hash))
+    return result
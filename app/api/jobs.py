@@ -0,0 +1,128 @@
+"""
+Background processing of uploads. An upload stored as an IngestJob is handed
+to the executor named by settings.INGEST_EXECUTOR:
+
+- "celery": the api.tasks.process_ingest_job task, run by a Celery worker
+- "thread": a thread pool in the web process, for local development
+- "eager": inline, before the upload's response, for tests
+
+A running job reports its progress and a heartbeat through the cache. One
+whose heartbeat stopped for settings.INGEST_JOB_STALE_AFTER seconds, its
+worker having died or been killed, is marked failed when jobs are next
+listed or retrieved. A job's file is deleted once it has been processed.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .ingest import IngestError, ingest_upload
+from .models import IngestJob
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+_thread_pool = None
+
+
+def get_thread_pool():
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'INGEST_THREAD_WORKERS', 2), thread_name_prefix='ingest'
+        )
+    return _thread_pool
+
+
+def start_ingest_job(kind, season_number, uploaded_file):
+    """Store an upload as an IngestJob and schedule it once the current transaction commits"""
+    job = IngestJob.objects.create(kind=kind, season_number=season_number, file=uploaded_file)
+    executor = getattr(settings, 'INGEST_EXECUTOR', 'thread')
+    if executor == 'eager':
+        run_ingest_job(job.pk)
+        job.refresh_from_db()
+    elif executor == 'thread':
+        transaction.on_commit(lambda: get_thread_pool().submit(run_ingest_job_in_thread, job.pk))
+    elif executor == 'celery':
+        from .tasks import process_ingest_job
+
+        transaction.on_commit(lambda: process_ingest_job.delay(job.pk))
+    else:
+        raise ImproperlyConfigured(f'Unknown INGEST_EXECUTOR {executor!r}, use celery, thread or eager')
+    return job
+
+
+def run_ingest_job_in_thread(job_id):
+    try:
+        run_ingest_job(job_id)
+    finally:
+        # The pool's threads would otherwise keep their connections open
+        connections.close_all()
+
+
+def run_ingest_job(job_id):
+    """Process a pending job; the upload is written in one transaction and rolled back if it fails"""
+    started_at = timezone.now()
+    if not IngestJob.objects.filter(pk=job_id, status=IngestJob.PENDING).update(
+            status=IngestJob.RUNNING, started_at=started_at):
+        return  # already picked up by another worker
+    job = IngestJob.objects.get(pk=job_id)
+
+    def progress(rows_processed):
+        cache.set(job.progress_cache_key, rows_processed, PROGRESS_TIMEOUT)
+        cache.set(job.heartbeat_cache_key, True, settings.INGEST_JOB_STALE_AFTER)
+
+    progress(0)
+    result, errors = None, []
+    try:
+        try:
+            with transaction.atomic(), job.file.open('rb') as uploaded_file:
+                result = ingest_upload(job.kind, job.season_number, uploaded_file, progress)
+        except IngestError as e:
+            errors = [e.detail]
+        except Exception as e:
+            logger.exception('Ingest job %s failed', job_id)
+            errors = [{'error': f'Processing failed: {e}'}]
+
+        IngestJob.objects.filter(pk=job_id).update(
+            status=IngestJob.FAILED if errors else IngestJob.SUCCEEDED,
+            result=result,
+            errors=errors,
+            rows_processed=cache.get(job.progress_cache_key, 0),
+            finished_at=timezone.now(),
+            file='',
+        )
+    finally:
+        # Uploads can be large, and a processed one is never read again
+        job.file.delete(save=False)
+        cache.delete_many([job.progress_cache_key, job.heartbeat_cache_key])
+    logger.info('Ingest job %s finished in %.1fs', job_id, (timezone.now() - started_at).total_seconds())
+
+
+def fail_stale_ingest_jobs():
+    """Mark failed the running jobs whose worker stopped sending heartbeats; returns how many were"""
+    started_before = timezone.now() - timedelta(seconds=settings.INGEST_JOB_STALE_AFTER)
+    stale = [
+        job for job in IngestJob.objects.filter(status=IngestJob.RUNNING, started_at__lt=started_before)
+        if cache.get(job.heartbeat_cache_key) is None
+    ]
+    failed = 0
+    for job in stale:
+        if IngestJob.objects.filter(pk=job.pk, status=IngestJob.RUNNING).update(
+                status=IngestJob.FAILED,
+                errors=[{'error': 'Processing stopped without finishing'}],
+                rows_processed=cache.get(job.progress_cache_key, 0),
+                finished_at=timezone.now(),
+                file='',
+        ):
+            logger.warning('Ingest job %s stopped sending heartbeats, marked failed', job.pk)
+            job.file.delete(save=False)
+            cache.delete(job.progress_cache_key)
+            failed += 1
+    return failed
@@ -0,0 +1,170 @@
+# leaderboards.py
+from collections import namedtuple
+
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Max, Prefetch, Sum, When, Window
+from django.db.models.functions import Rank
+
+from .models import Player, PlayerSeasonTotals, Team, SUMMED_STAT_FIELDS, games_count_subquery, season_total_alias
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+MIN_GAMES_PLAYED_RATIO = 0.75
+
+# key: (response key, summed stat, ranked per game)
+Category = namedtuple('Category', ['key', 'response_key', 'stat', 'per_game'])
+
+CATEGORIES = [
+    Category('points', 'top_points_per_game', 'points', True),
+    Category('rebounds', 'top_rebounds_per_game', 'rebounds', True),
+    Category('assists', 'top_assists_per_game', 'assists', True),
+    Category('three_points_made', 'top_three_points_made', 'three_point_fg', False),
+    Category('blocks', 'top_blocks_per_game', 'blocks', True),
+    Category('steals', 'top_steals_per_game', 'steals', True),
+]
+CATEGORIES_BY_KEY = {category.key: category for category in CATEGORIES}
+
+LeaderboardEntry = namedtuple('LeaderboardEntry', ['player', 'rank', 'tied'])
+
+
+def parse_categories(value):
+    """Categories named in a comma separated ?categories= value, all of them when it is empty"""
+    if not value:
+        return list(CATEGORIES)
+    keys = [key.strip() for key in value.split(',') if key.strip()]
+    unknown = [key for key in keys if key not in CATEGORIES_BY_KEY]
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(unknown)}. Choose from {', '.join(CATEGORIES_BY_KEY)}.")
+    return [CATEGORIES_BY_KEY[key] for key in keys]
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be a number.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}.')
+    return limit
+
+
+def team_games_total():
+    """
+    The games of a row's team in its phase, counted by a subquery on each team
+    foreign key. Wrapped in an aggregate, so the database computes it once per
+    row however often the HAVING and RANK() orderings repeat it.
+    """
+    def team_games(playoff):
+        return (games_count_subquery('home_team', playoff, team='player__team_id') +
+                games_count_subquery('away_team', playoff, team='player__team_id'))
+
+    return Max(Case(
+        When(phase=PlayerSeasonTotals.PLAYOFF, then=team_games(playoff=True)),
+        default=team_games(playoff=False),
+        output_field=IntegerField(),
+    ))
+
+
+def _stat_total(stat):
+    if stat == 'points':
+        return F('total_two_point_fg') * 2 + F('total_three_point_fg') * 3 + F('total_free_throw_fg')
+    if stat == 'rebounds':
+        return F('total_offensive_rebounds') + F('total_defensive_rebounds')
+    return F(f'total_{stat}')
+
+
+def _per_game_tenths(total, games):
+    """total / games rounded half up to one decimal, as an integer number of tenths"""
+    return Case(
+        When(**{f'{games}__gt': 0}, then=(total * 20 + F(games)) / (F(games) * 2)),
+        default=0,
+        output_field=IntegerField(),
+    )
+
+
+def leaderboards(players, phases=(PlayerSeasonTotals.REGULAR,), fairness_adjusted=False,
+                 categories=None, limit=DEFAULT_LIMIT):
+    """
+    Rank the players in every category and phase, and return the top `limit`
+    of each from a single SQL statement over PlayerSeasonTotals grouped by
+    (player, phase), ranked with RANK() OVER (PARTITION BY phase ...).
+
+    Unless the stats are fairness adjusted (divided by the team's games in
+    that phase), only players who played at least 75% of their team's games
+    in the phase are ranked; that filter runs in HAVING. Players tied on the
+    last place are all kept.
+
+    Returns {phase: {category key: [LeaderboardEntry]}}; each player carries
+    the season total annotations of its phases, as with_season_totals adds.
+    """
+    categories = categories or CATEGORIES
+    ranked = (
+        PlayerSeasonTotals.objects.filter(player__in=players, phase__in=phases)
+        .order_by()
+        .values('player_id', 'phase')
+        .annotate(
+            **{f'total_{field}': Sum(field) for field in ['games_played', *SUMMED_STAT_FIELDS]},
+            team_games=team_games_total(),
+        )
+    )
+    if not fairness_adjusted:
+        ranked = ranked.filter(team_games__gt=0, total_games_played__gte=F('team_games') * MIN_GAMES_PLAYED_RATIO)
+
+    denominator = 'team_games' if fairness_adjusted else 'total_games_played'
+    ranks = {}
+    for category in categories:
+        total = _stat_total(category.stat)
+        value = _per_game_tenths(total, denominator) if category.per_game else total
+        ranks[f'{category.key}_rank'] = Window(Rank(), partition_by=F('phase'), order_by=value.desc())
+    ranked = ranked.annotate(**ranks)
+
+    # Django can't OR window filters on an aggregated query, so the top-N cut
+    # wraps the ranked query in one outer SELECT instead
+    sql, params = ranked.query.get_compiler(using=ranked.db).as_sql()
+    connection = connections[ranked.db]
+    top_n = ' OR '.join(f'ranked.{connection.ops.quote_name(name)} <= %s' for name in ranks)
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT * FROM ({sql}) ranked WHERE {top_n}', (*params, *[limit] * len(ranks)))
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    players_by_id = Player.objects.db_manager(ranked.db).filter(pk__in={row['player_id'] for row in rows}).prefetch_related(
+        Prefetch('team', queryset=Team.objects.with_game_counts())
+    ).in_bulk()
+    for row in rows:
+        playoff = row['phase'] == PlayerSeasonTotals.PLAYOFF
+        for field in ['games_played', *SUMMED_STAT_FIELDS]:
+            setattr(players_by_id[row['player_id']], season_total_alias(field, playoff), row[f'total_{field}'])
+
+    leaders = {}
+    for phase in phases:
+        phase_rows = [row for row in rows if row['phase'] == phase]
+        leaders[phase] = {}
+        for category in categories:
+            rank_name = f'{category.key}_rank'
+            entries = sorted(
+                (row for row in phase_rows if row[rank_name] <= limit),
+                key=lambda row: (row[rank_name], row['player_id']),
+            )
+            ranks_taken = [row[rank_name] for row in entries]
+            leaders[phase][category.key] = [
+                LeaderboardEntry(players_by_id[row['player_id']], row[rank_name], ranks_taken.count(row[rank_name]) > 1)
+                for row in entries
+            ]
+    return leaders
+
+
+def leaderboard_data(serializer_class, categories, leaders):
+    """Serialize each category's leaders, adding their rank and whether they share it"""
+    serialized = {}
+    data = {}
+    for category in categories:
+        rows = []
+        for entry in leaders[category.key]:
+            if entry.player.pk not in serialized:
+                serialized[entry.player.pk] = serializer_class(entry.player).data
+            rows.append({**serialized[entry.player.pk], 'rank': entry.rank, 'tied': entry.tied})
+        data[category.response_key] = rows
+    return data
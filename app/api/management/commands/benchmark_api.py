@@ -0,0 +1,299 @@
+import json
+import math
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from api.cache import get_response_cache
+from api.models import Season, Team, Player, Game, PlayerStatistics
+
+
+def first_team(season):
+    return Team.objects.filter(season=season).order_by('pk').values_list('pk', flat=True).first()
+
+
+def first_player(season):
+    return Player.objects.filter(season=season).order_by('pk').values_list('pk', flat=True).first()
+
+
+def first_game(season):
+    return (Game.objects.filter(season=season, playoff_game__isnull=True)
+            .order_by('pk').values_list('pk', flat=True).first())
+
+
+def first_playoff_game(season):
+    return (Game.objects.filter(season=season, playoff_game__isnull=False)
+            .order_by('pk').values_list('pk', flat=True).first())
+
+
+def first_playoff_statistics(season):
+    # player-statistics only serves playoff box scores
+    return (PlayerStatistics.objects.filter(game__season=season, game__playoff_game__isnull=False)
+            .order_by('pk').values_list('pk', flat=True).first())
+
+
+@contextmanager
+def private_response_cache():
+    """Serve the response cache from a cache local to this process while measuring uncached responses, so
+    emptying it between requests leaves the shared cache other workers read from alone"""
+    private = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-api'}
+    with override_settings(
+        CACHES={**settings.CACHES, 'benchmark': private},
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_CACHE_BACKEND': 'benchmark'},
+    ):
+        yield get_response_cache()
+
+
+# (name, url, object to retrieve or None for a list)
+ENDPOINTS = [
+    ('teams-list', '/api/bball/teams/', None),
+    ('teams-detail', '/api/bball/teams/{}/', first_team),
+    ('players-list', '/api/bball/players/', None),
+    ('players-detail', '/api/bball/players/{}/', first_player),
+    ('games-list', '/api/bball/games/', None),
+    ('games-detail', '/api/bball/games/{}/', first_game),
+    ('player-statistics-list', '/api/bball/player-statistics/', None),
+    ('player-statistics-detail', '/api/bball/player-statistics/{}/', first_playoff_statistics),
+    ('top-players', '/api/bball/top-players/', None),
+    ('top-players-fairness-adjusted', '/api/bball/top-players/?fairness_adjusted=true', None),
+    ('top-players-include-playoffs', '/api/bball/top-players/?include_playoffs=true', None),
+    ('playoffs-list', '/api/bball/playoffs/', None),
+    ('playoffs-detail', '/api/bball/playoffs/{}/', first_playoff_game),
+    ('playoffs-top-players', '/api/bball/playoffs-top-players/', None),
+]
+
+# Latencies compared against the baseline; query counts must not grow at all
+COMPARED_LATENCIES = ['p50_ms', 'p95_ms']
+
+
+def percentile(samples, pct):
+    """Linearly interpolated percentile of a non-empty list of samples"""
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * pct / 100
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class InstrumentedCursor:
+    """Wraps a database cursor to count the statements it runs and the rows fetched through it"""
+
+    def __init__(self, cursor, counters):
+        self.cursor = cursor
+        self.counters = counters
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.counters['rows'] += 1
+            yield row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cursor.close()
+
+    def _count(self, sql):
+        # ATOMIC_REQUESTS wraps every request in a transaction, which isn't the endpoint's work
+        if not sql.startswith(('BEGIN', 'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')):
+            self.counters['queries'] += 1
+
+    def execute(self, sql, params=None):
+        self._count(sql)
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self._count(sql)
+        return self.cursor.executemany(sql, param_list)
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        if row is not None:
+            self.counters['rows'] += 1
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self.cursor.fetchmany(size) if size is not None else self.cursor.fetchmany()
+        self.counters['rows'] += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self.cursor.fetchall()
+        self.counters['rows'] += len(rows)
+        return rows
+
+
+@contextmanager
+def instrumented(counters):
+    """Route every cursor of the default connection through InstrumentedCursor"""
+    make_cursor, make_debug_cursor = connection.make_cursor, connection.make_debug_cursor
+    connection.make_cursor = lambda cursor: InstrumentedCursor(make_cursor(cursor), counters)
+    connection.make_debug_cursor = lambda cursor: InstrumentedCursor(make_debug_cursor(cursor), counters)
+    try:
+        yield counters
+    finally:
+        del connection.make_cursor, connection.make_debug_cursor
+
+
+def find_regressions(results, baseline, threshold):
+    """Describe every endpoint measurement that got worse than the baseline allows"""
+    regressions = []
+    for name, measured in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        for key in COMPARED_LATENCIES:
+            if measured[key] > expected[key] * (1 + threshold):
+                regressions.append(
+                    f'{name}: {key} {measured[key]:.1f}ms is more than {threshold:.0%} over '
+                    f'the baseline {expected[key]:.1f}ms'
+                )
+        if measured['queries'] > expected['queries']:
+            regressions.append(f"{name}: {measured['queries']} queries, the baseline ran {expected['queries']}")
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every read endpoint of the api in-process and compare it against a saved baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, help='Season number to benchmark, defaults to the latest season')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint before timing')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Only benchmark endpoints whose name contains this, can be repeated')
+        parser.add_argument('--generate', action='store_true',
+                            help='Generate a season with generate_league first and benchmark it')
+        parser.add_argument('--teams', type=int, default=16, help='Teams in the generated season')
+        parser.add_argument('--players', type=int, default=12, help='Players per team in the generated season')
+        parser.add_argument('--games', type=int, default=30, help='Games per team in the generated season')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results to this JSON file')
+        parser.add_argument('--baseline', metavar='PATH', help='Compare the results with this JSON baseline')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed latency growth over the baseline, as a fraction (0.25 is 25%%)')
+        parser.add_argument('--cached', action='store_true',
+                            help='Measure responses served from the response cache instead of computed ones')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+
+        if options['generate']:
+            call_command('generate_league', teams=options['teams'], players=options['players'],
+                         games=options['games'], seed=0, stdout=self.stdout)
+        season = self.get_season(options['season'])
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['endpoints'] or any(part in endpoint[0] for part in options['endpoints'])
+        ]
+        if not endpoints:
+            raise CommandError('No endpoint matches ' + ', '.join(options['endpoints']))
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Could not read the baseline {options['baseline']}: {e}")
+
+        dataset = self.describe(season)
+        self.stdout.write(
+            f"Season {season.number}: {dataset['teams']} teams, {dataset['players']} players, "
+            f"{dataset['games']} games, {dataset['player_statistics']} player statistics"
+        )
+        if baseline is not None and baseline.get('dataset') != dataset:
+            self.stdout.write(self.style.WARNING(
+                'The baseline was recorded against a different dataset, latencies may not be comparable'
+            ))
+
+        client = APIClient()
+        results = {}
+        self.stdout.write(
+            f"{'endpoint':<32}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'rows':>9}{'bytes':>11}"
+        )
+        for name, url, lookup in endpoints:
+            if lookup is not None:
+                pk = lookup(season)
+                if pk is None:
+                    self.stdout.write(self.style.WARNING(f'{name}: skipped, the season has nothing to retrieve'))
+                    continue
+                url = url.format(pk)
+            url += ('&' if '?' in url else '?') + f'season={season.number}'
+            results[name] = result = self.measure(client, url, options['iterations'], options['warmup'],
+                                                  options['cached'])
+            self.stdout.write(
+                f"{name:<32}{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                f"{result['queries']:>9}{result['rows']:>9}{result['bytes']:>11}"
+            )
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline_file:
+                json.dump({
+                    'dataset': dataset,
+                    'iterations': options['iterations'],
+                    'endpoints': results,
+                }, baseline_file, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {options['save_baseline']}"))
+
+        if baseline is not None:
+            regressions = find_regressions(results, baseline.get('endpoints', {}), options['threshold'])
+            if regressions:
+                raise CommandError('Regressed against the baseline:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def get_season(self, number):
+        seasons = Season.objects.order_by('-number')
+        season = seasons.filter(number=number).first() if number is not None else seasons.first()
+        if season is None:
+            raise CommandError(f'Season {number} does not exist' if number is not None else 'There are no seasons')
+        return season
+
+    def describe(self, season):
+        return {
+            'season': season.number,
+            'teams': Team.objects.filter(season=season).count(),
+            'players': Player.objects.filter(season=season).count(),
+            'games': Game.objects.filter(season=season).count(),
+            'player_statistics': PlayerStatistics.objects.filter(game__season=season).count(),
+        }
+
+    def measure(self, client, url, iterations, warmup, cached):
+        with nullcontext() if cached else private_response_cache() as response_cache:
+            return self.measure_with(client, url, iterations, warmup, response_cache)
+
+    def measure_with(self, client, url, iterations, warmup, response_cache):
+        for _ in range(warmup):
+            client.get(url)
+
+        timings = []
+        counters = {'queries': 0, 'rows': 0}
+        size = 0
+        with instrumented(counters):
+            for _ in range(iterations):
+                if response_cache is not None:
+                    response_cache.clear()
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'GET {url} returned {response.status_code}')
+                size = len(response.content)
+
+        return {
+            'url': url,
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'queries': counters['queries'] // iterations,
+            'rows': counters['rows'] // iterations,
+            'bytes': size,
+        }
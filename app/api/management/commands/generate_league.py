@@ -0,0 +1,227 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from api.models import Season, Team, Player, Game, PlayerStatistics, PlayerSeasonTotals
+
+POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C']
+# Box score columns after the game and player ids, in the order box_scores() builds them
+STATISTICS_COLUMNS = [
+    'minutes_played', 'two_point_fg', 'two_point_attempts', 'three_point_fg', 'three_point_attempts',
+    'free_throw_fg', 'free_throw_attempts', 'offensive_rebounds', 'defensive_rebounds',
+    'assists', 'turnovers', 'steals', 'blocks', 'fouls', 'fouls_drawn', 'plus_minus', 'efficiency',
+]
+# Positions of the free throw columns in a box score row, which starts with the player id
+FREE_THROW_FG = 1 + STATISTICS_COLUMNS.index('free_throw_fg')
+FREE_THROW_ATTEMPTS = 1 + STATISTICS_COLUMNS.index('free_throw_attempts')
+# Playoff bracket codes for 8 and 4 team brackets; the winners of each round meet in the next
+BRACKETS = {
+    8: [[Game.QUARTER_FINAL_1, Game.QUARTER_FINAL_2, Game.QUARTER_FINAL_3, Game.QUARTER_FINAL_4],
+        [Game.SEMI_FINAL_1, Game.SEMI_FINAL_2],
+        [Game.FINAL]],
+    4: [[Game.SEMI_FINAL_1, Game.SEMI_FINAL_2],
+        [Game.FINAL]],
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic seasons with plausible box scores for load and scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seasons', type=int, default=1, help='Number of seasons to create')
+        parser.add_argument('--teams', type=int, default=10, help='Teams per season')
+        parser.add_argument('--players', type=int, default=12, help='Players per team')
+        parser.add_argument('--games', type=int, default=20, help='Regular season games per team')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed, for a repeatable league')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument('--no-playoffs', action='store_true', help='Only generate the regular season')
+
+    def handle(self, *args, **options):
+        if options['teams'] < 2:
+            raise CommandError('A league needs at least 2 teams')
+        if options['players'] < 5:
+            raise CommandError('A team needs at least 5 players')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        first_number = (Season.objects.aggregate(number=Max('number'))['number'] or 0) + 1
+        statistics_created = 0
+        for number in range(first_number, first_number + options['seasons']):
+            with transaction.atomic():
+                statistics_created += self.generate_season(
+                    number, options['teams'], options['players'], options['games'], not options['no_playoffs']
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {options['seasons']} season(s) starting at season {first_number} with "
+            f"{statistics_created} player statistics in {time.monotonic() - started:.1f}s"
+        ))
+
+    def generate_season(self, number, team_count, players_per_team, games_per_team, playoffs):
+        season = Season.objects.create(number=number)
+        teams = Team.objects.bulk_create([
+            Team(name=f'Season {number} Team {index + 1}', season=season,
+                 hex_color=f'#{self.rng.randrange(0x1000000):06x}')
+            for index in range(team_count)
+        ])
+        players = Player.objects.bulk_create(
+            [
+                Player(name=f'S{number} T{team_index + 1} Player {index + 1}', jersey_number=index,
+                       position=POSITIONS[index % len(POSITIONS)], team=team, season=season)
+                for team_index, team in enumerate(teams)
+                for index in range(players_per_team)
+            ],
+            batch_size=self.batch_size,
+        )
+        # Each team gets a talent level and each player a share of the team's offense
+        self.strength = {team.pk: self.rng.uniform(0.85, 1.15) for team in teams}
+        self.roster = {team.pk: [] for team in teams}
+        for player in players:
+            self.roster[player.team_id].append((player.pk, self.rng.uniform(0.5, 1.5)))
+
+        schedule = [(home, away, None) for home, away in self.round_robin(teams, games_per_team)]
+        start = timezone.now() - timedelta(days=len(schedule))
+        created = self.play_games(season, schedule, start, game_number=1)
+
+        if playoffs:
+            created += self.play_playoffs(season, teams, start + timedelta(days=len(schedule)))
+
+        Team.objects.bulk_update(teams, ['wins', 'losses'], batch_size=self.batch_size)
+        PlayerSeasonTotals.objects.rebuild(season=season)
+        Season.objects.filter(pk=season.pk).bump_data_version()
+        return created
+
+    def round_robin(self, teams, games_per_team):
+        """Circle method pairings, repeated until every team has played its games"""
+        rotation = list(teams) + ([None] if len(teams) % 2 else [])
+        rounds = games_per_team if len(teams) % 2 == 0 else games_per_team * len(rotation) // (len(rotation) - 1)
+        for round_index in range(rounds):
+            half = len(rotation) // 2
+            for home, away in zip(rotation[:half], reversed(rotation[half:])):
+                if home is not None and away is not None:
+                    yield (home, away) if round_index % 2 else (away, home)
+            rotation.insert(1, rotation.pop())
+
+    def play_playoffs(self, season, teams, start):
+        size = max((size for size in BRACKETS if size <= len(teams)), default=None)
+        if size is None:
+            return 0
+        seeded = sorted(teams, key=lambda team: (-team.wins, team.losses))[:size]
+        # 1 v 8, 4 v 5, 2 v 7, 3 v 6 so the top seeds meet last
+        order = [0, 7, 3, 4, 1, 6, 2, 5] if size == 8 else [0, 3, 1, 2]
+        alive = [seeded[index] for index in order]
+
+        created = 0
+        for round_index, codes in enumerate(BRACKETS[size]):
+            schedule = [(alive[2 * index], alive[2 * index + 1], code) for index, code in enumerate(codes)]
+            games = self.play_games(season, schedule, start + timedelta(days=round_index), game_number=None)
+            created += games
+            alive = [self.winners[code] for code in codes]
+        return created
+
+    def play_games(self, season, schedule, start, game_number):
+        """Simulate and insert the scheduled games in batches; returns the number of box scores created"""
+        created = 0
+        self.winners = {}
+        games_per_batch = max(1, self.batch_size // (2 * max(len(players) for players in self.roster.values())))
+        for offset in range(0, len(schedule), games_per_batch):
+            games = []
+            lines = []
+            for index, (home, away, playoff_game) in enumerate(schedule[offset:offset + games_per_batch], start=offset):
+                home_lines, home_score = self.box_scores(home)
+                away_lines, away_score = self.box_scores(away)
+                if home_score == away_score:
+                    # Overtime: the home team's first starter makes a free throw
+                    home_lines[0][FREE_THROW_FG] += 1
+                    home_lines[0][FREE_THROW_ATTEMPTS] += 1
+                    home_score += 1
+                winner, loser = (home, away) if home_score > away_score else (away, home)
+                winner.wins += 1
+                loser.losses += 1
+                if playoff_game:
+                    self.winners[playoff_game] = winner
+                games.append(Game(
+                    season=season, home_team=home, away_team=away, winner=winner,
+                    home_team_score=home_score, away_team_score=away_score,
+                    game_number=game_number + index if game_number else None,
+                    playoff_game=playoff_game, date=start + timedelta(days=index // 2),
+                ))
+                lines.append(home_lines + away_lines)
+
+            Game.objects.bulk_create(games)
+            self.insert_statistics([
+                (game.pk, *line)
+                for game, game_lines in zip(games, lines)
+                for line in game_lines
+            ])
+            created += sum(len(game_lines) for game_lines in lines)
+        return created
+
+    def insert_statistics(self, rows):
+        """
+        Insert box score rows in batches with executemany. Preparing every value
+        through bulk_create costs more than simulating the game, and the rows
+        are plain integers that need no conversion.
+        """
+        columns = ['game_id', 'player_id', *STATISTICS_COLUMNS]
+        quote_name = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote_name(PlayerStatistics._meta.db_table),
+            ', '.join(quote_name(PlayerStatistics._meta.get_field(column).column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with connection.cursor() as cursor:
+            for offset in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, rows[offset:offset + self.batch_size])
+
+    def box_scores(self, team):
+        """A box score row (player id then STATISTICS_COLUMNS) for every player who played, and the team's points"""
+        random = self.rng.random
+        strength = self.strength[team.pk]
+        two_point_pct = 0.5 * strength
+        three_point_pct = 0.34 * strength
+        lines = []
+        points = 0
+        for index, (player_id, usage) in enumerate(self.roster[team.pk]):
+            if index >= 5:
+                if random() < 0.2:
+                    continue  # did not play
+                minutes = 4 + int(random() * 16)
+            else:
+                minutes = 24 + int(random() * 12)
+            load = minutes / 36 * usage * strength
+            two_point_attempts = int((2 + random() * 10) * load)
+            three_point_attempts = int(random() * 7 * load)
+            free_throw_attempts = int(random() * 6 * load)
+            # Makes are the expected makes, rounded up or down at random
+            two_point_fg = int(two_point_attempts * two_point_pct + random())
+            three_point_fg = min(three_point_attempts, int(three_point_attempts * three_point_pct + random()))
+            free_throw_fg = int(free_throw_attempts * 0.74 + random())
+            offensive_rebounds = int(random() * 3 * load)
+            defensive_rebounds = int(random() * 7 * load)
+            assists = int(random() * 6 * load)
+            turnovers = int(random() * 3.5 * load)
+            steals = int(random() * 2.5 * load)
+            blocks = int(random() * 1.8 * load)
+            player_points = 2 * two_point_fg + 3 * three_point_fg + free_throw_fg
+            efficiency = (
+                player_points + offensive_rebounds + defensive_rebounds + assists + steals + blocks - turnovers
+                - (two_point_attempts - two_point_fg) - (three_point_attempts - three_point_fg)
+                - (free_throw_attempts - free_throw_fg)
+            )
+            lines.append([
+                player_id, minutes * 60 + int(random() * 60),
+                two_point_fg, two_point_attempts, three_point_fg, three_point_attempts,
+                free_throw_fg, free_throw_attempts, offensive_rebounds, defensive_rebounds,
+                assists, turnovers, steals, blocks, int(random() * 6), int(random() * 4 * load),
+                0, efficiency,
+            ])
+            points += player_points
+        return lines, points
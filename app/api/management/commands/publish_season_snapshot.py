@@ -0,0 +1,130 @@
+import gzip
+import os
+import shutil
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.urls import resolve
+
+from api.models import Season, Team, Player, Game, PlayerStatistics
+from api.snapshots import snapshot_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def teams(season):
+    return Team.objects.filter(season=season).values_list('pk', flat=True)
+
+
+def players(season):
+    return Player.objects.filter(season=season).values_list('pk', flat=True)
+
+
+def games(season):
+    return Game.objects.filter(season=season).values_list('pk', flat=True)
+
+
+def playoff_games(season):
+    return Game.objects.filter(season=season, game_number__isnull=True).values_list('pk', flat=True)
+
+
+def playoff_statistics(season):
+    # player-statistics only serves playoff box scores
+    return (PlayerStatistics.objects.filter(game__season=season, game__playoff_game__isnull=False)
+            .values_list('pk', flat=True))
+
+
+# (url, objects to retrieve or None for a list); nginx serves these for requests whose query string is season=N
+SNAPSHOT_ROUTES = [
+    ('/api/bball/teams/', None),
+    ('/api/bball/teams/{}/', teams),
+    ('/api/bball/players/', None),
+    ('/api/bball/players/{}/', players),
+    ('/api/bball/games/', None),
+    ('/api/bball/games/{}/', games),
+    ('/api/bball/player-statistics/', None),
+    ('/api/bball/player-statistics/{}/', playoff_statistics),
+    ('/api/bball/top-players/', None),
+    ('/api/bball/playoffs/', None),
+    ('/api/bball/playoffs/{}/', playoff_games),
+    ('/api/bball/playoffs-top-players/', None),
+]
+
+
+def render(path, season_number):
+    request = RequestFactory().get(path, {'season': season_number}, HTTP_ACCEPT='application/json')
+    match = resolve(request.path_info)
+    response = match.func(request, *match.args, **match.kwargs)
+    response.render()
+    if response.status_code != 200:
+        raise CommandError(f'GET {path}?season={season_number} returned {response.status_code}')
+    return response.content
+
+
+def write_snapshot_file(directory, content):
+    """index.json with its gzip and brotli encodings, which nginx picks from by Accept-Encoding"""
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'index.json').write_bytes(content)
+    (directory / 'index.json.gz').write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        (directory / 'index.json.br').write_bytes(brotli.compress(content, quality=11))
+
+
+class Command(BaseCommand):
+    help = (
+        "Render every read endpoint's response for an archived season into static, precompressed JSON "
+        "that nginx serves without reaching Django"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('season', type=int, help='Season number to publish')
+        parser.add_argument('--output', default=settings.SEASON_SNAPSHOT_ROOT,
+                            help='Directory of the snapshots, defaults to SEASON_SNAPSHOT_ROOT')
+        parser.add_argument('--remove', action='store_true',
+                            help="Delete the season's snapshot, so its requests reach Django again")
+        parser.add_argument('--force', action='store_true',
+                            help="Publish a season that isn't archived; its snapshot is removed once it changes")
+
+    def handle(self, *args, **options):
+        season_number = options['season']
+        target = snapshot_directory(options['output'], season_number)
+        if options['remove']:
+            shutil.rmtree(target, ignore_errors=True)
+            self.stdout.write(self.style.SUCCESS(f'Removed the snapshot of season {season_number}'))
+            return
+
+        season = Season.objects.filter(number=season_number).first()
+        if season is None:
+            raise CommandError(f'Season {season_number} does not exist')
+        if not season.is_archived and not options['force']:
+            raise CommandError(
+                f'Season {season_number} is not archived and can still change; archive it first or use --force'
+            )
+        if brotli is None:
+            self.stdout.write(self.style.WARNING(
+                'brotli is not installed, clients that accept br will be served by Django'
+            ))
+
+        # Rendered next to the published snapshot and swapped in, so nginx never serves half of one
+        staging = target.with_name(f'{target.name}.staging')
+        shutil.rmtree(staging, ignore_errors=True)
+        written = 0
+        for url, lookup in SNAPSHOT_ROUTES:
+            paths = [url] if lookup is None else [url.format(pk) for pk in lookup(season)]
+            for path in paths:
+                write_snapshot_file(staging / path.strip('/'), render(path, season_number))
+                written += 1
+
+        previous = target.with_name(f'{target.name}.previous')
+        shutil.rmtree(previous, ignore_errors=True)
+        if target.exists():
+            os.replace(target, previous)
+        os.replace(staging, target)
+        shutil.rmtree(previous, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Published {written} responses of season {season_number} to {target}'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Season, PlayerSeasonTotals
+
+
+class Command(BaseCommand):
+    help = 'Recompute the PlayerSeasonTotals summary rows from the raw PlayerStatistics box scores'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, help='Only rebuild the totals of this season number')
+
+    def handle(self, *args, **options):
+        season = None
+        if options['season'] is not None:
+            season = Season.objects.filter(number=options['season']).first()
+            if season is None:
+                raise CommandError(f"Season {options['season']} does not exist")
+
+        rebuilt = PlayerSeasonTotals.objects.rebuild(season=season)
+        # The rebuild bypasses the model signals, so invalidate the cached responses here
+        seasons = Season.objects.filter(pk=season.pk) if season is not None else Season.objects.all()
+        seasons.bump_data_version()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} player season totals'))
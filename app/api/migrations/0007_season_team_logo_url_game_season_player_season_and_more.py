@@ -1,10 +1,22 @@
 # Generated by Django 4.2.4 on 2024-09-22 14:43
 
-import api.models
-from django.db import migrations, models
+from django.db import connection, migrations, models
 import django.db.models.deletion
 
 
+def create_first_season(apps, schema_editor):
+    Season = apps.get_model("api", "Season")
+    Season.objects.using(schema_editor.connection.alias).get_or_create(number=1)
+
+
+def get_default_season_id():
+    # Frozen here instead of api.models.get_default_season_id, which queries the Season model as it is now,
+    # with columns this migration's table doesn't have yet
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT id FROM api_season WHERE number = 1")
+        return cursor.fetchone()[0]
+
+
 class Migration(migrations.Migration):
     dependencies = [
         ("api", "0006_alter_game_playoff_game"),
@@ -26,6 +38,7 @@ class Migration(migrations.Migration):
                 ("number", models.PositiveIntegerField(unique=True)),
             ],
         ),
+        migrations.RunPython(create_first_season, migrations.RunPython.noop),
         migrations.AddField(
             model_name="team",
             name="logo_url",
@@ -35,7 +48,7 @@ class Migration(migrations.Migration):
             model_name="game",
             name="season",
             field=models.ForeignKey(
-                default=api.models.get_default_season_id,
+                default=get_default_season_id,
                 on_delete=django.db.models.deletion.CASCADE,
                 related_name="games",
                 to="api.season",
@@ -45,7 +58,7 @@ class Migration(migrations.Migration):
             model_name="player",
             name="season",
             field=models.ForeignKey(
-                default=api.models.get_default_season_id,
+                default=get_default_season_id,
                 on_delete=django.db.models.deletion.CASCADE,
                 related_name="players",
                 to="api.season",
@@ -55,7 +68,7 @@ class Migration(migrations.Migration):
             model_name="team",
             name="season",
             field=models.ForeignKey(
-                default=api.models.get_default_season_id,
+                default=get_default_season_id,
                 on_delete=django.db.models.deletion.CASCADE,
                 related_name="teams",
                 to="api.season",
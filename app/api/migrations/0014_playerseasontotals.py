@@ -0,0 +1,127 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+SUMMED_STAT_FIELDS = [
+    "minutes_played",
+    "two_point_fg",
+    "two_point_attempts",
+    "three_point_fg",
+    "three_point_attempts",
+    "free_throw_fg",
+    "free_throw_attempts",
+    "offensive_rebounds",
+    "defensive_rebounds",
+    "assists",
+    "turnovers",
+    "steals",
+    "blocks",
+    "fouls",
+    "fouls_drawn",
+]
+
+
+def populate_player_season_totals(apps, schema_editor):
+    PlayerStatistics = apps.get_model("api", "PlayerStatistics")
+    PlayerSeasonTotals = apps.get_model("api", "PlayerSeasonTotals")
+
+    grouped = (
+        PlayerStatistics.objects.order_by()
+        .values(
+            "player_id",
+            season_id=models.F("game__season_id"),
+            phase=models.Case(
+                models.When(
+                    game__playoff_game__isnull=True, then=models.Value("regular")
+                ),
+                default=models.Value("playoff"),
+            ),
+        )
+        .annotate(
+            games_count=models.Count("id"),
+            **{f"total_{field}": models.Sum(field) for field in SUMMED_STAT_FIELDS},
+        )
+    )
+    PlayerSeasonTotals.objects.bulk_create(
+        [
+            PlayerSeasonTotals(
+                player_id=row["player_id"],
+                season_id=row["season_id"],
+                phase=row["phase"],
+                games_played=row["games_count"],
+                **{field: row[f"total_{field}"] for field in SUMMED_STAT_FIELDS},
+            )
+            for row in grouped
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0013_alter_playerstatistics_efficiency_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PlayerSeasonTotals",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "phase",
+                    models.CharField(
+                        choices=[
+                            ("regular", "Regular season"),
+                            ("playoff", "Playoffs"),
+                        ],
+                        max_length=7,
+                    ),
+                ),
+                ("games_played", models.PositiveIntegerField(default=0)),
+                ("minutes_played", models.PositiveIntegerField(default=0)),
+                ("two_point_fg", models.PositiveIntegerField(default=0)),
+                ("two_point_attempts", models.PositiveIntegerField(default=0)),
+                ("three_point_fg", models.PositiveIntegerField(default=0)),
+                ("three_point_attempts", models.PositiveIntegerField(default=0)),
+                ("free_throw_fg", models.PositiveIntegerField(default=0)),
+                ("free_throw_attempts", models.PositiveIntegerField(default=0)),
+                ("offensive_rebounds", models.PositiveIntegerField(default=0)),
+                ("defensive_rebounds", models.PositiveIntegerField(default=0)),
+                ("assists", models.PositiveIntegerField(default=0)),
+                ("turnovers", models.PositiveIntegerField(default=0)),
+                ("steals", models.PositiveIntegerField(default=0)),
+                ("blocks", models.PositiveIntegerField(default=0)),
+                ("fouls", models.PositiveIntegerField(default=0)),
+                ("fouls_drawn", models.PositiveIntegerField(default=0)),
+                (
+                    "player",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="season_totals",
+                        to="api.player",
+                    ),
+                ),
+                (
+                    "season",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="player_totals",
+                        to="api.season",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("player", "season", "phase")},
+            },
+        ),
+        migrations.RunPython(populate_player_season_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0015_ingestjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UploadBatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("box_scores", "Player statistics"),
+                            ("roster", "Roster"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("result", models.JSONField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "season",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="upload_batches",
+                        to="api.season",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("season", "kind", "content_hash")},
+            },
+        ),
+    ]
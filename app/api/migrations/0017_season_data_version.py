@@ -0,0 +1,22 @@
+# Generated by Django 4.2.4 on 2026-10-17 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0016_uploadbatch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="season",
+            name="data_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="season",
+            name="data_version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.4 on 2026-10-17 20:21
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0017_season_data_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="season",
+            name="is_archived",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="ArchivedResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("path", models.CharField(max_length=255)),
+                (
+                    "data",
+                    models.JSONField(
+                        encoder=django.core.serializers.json.DjangoJSONEncoder
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "season",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_responses",
+                        to="api.season",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("season", "path")},
+            },
+        ),
+    ]
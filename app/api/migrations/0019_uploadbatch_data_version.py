@@ -0,0 +1,17 @@
+# Generated by Django 4.2.4 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0018_season_is_archived_archivedresponse"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadbatch",
+            name="data_version",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.4 on 2026-10-17 21:09
+
+import api.models
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("api", "0019_uploadbatch_data_version"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="game",
+            name="season",
+            field=models.ForeignKey(
+                default=api.models.get_default_season_id,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="games",
+                to="api.season",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="player",
+            name="season",
+            field=models.ForeignKey(
+                default=api.models.get_default_season_id,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="players",
+                to="api.season",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="team",
+            name="season",
+            field=models.ForeignKey(
+                default=api.models.get_default_season_id,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="teams",
+                to="api.season",
+            ),
+        ),
+    ]
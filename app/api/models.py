@@ -1,6 +1,34 @@
 # models.py
-from django.db import models
-from django.db.models import Sum, Q
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Prefetch, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .snapshots import has_snapshots, remove_snapshot
+
+# Counting stats of a box score that are summed into a player's season line
+SUMMED_STAT_FIELDS = [
+    'minutes_played',
+    'two_point_fg', 'two_point_attempts',
+    'three_point_fg', 'three_point_attempts',
+    'free_throw_fg', 'free_throw_attempts',
+    'offensive_rebounds', 'defensive_rebounds',
+    'assists', 'turnovers', 'steals', 'blocks', 'fouls', 'fouls_drawn',
+]
+
+def per_game(total, games):
+    """
+    total / games rounded half up to one decimal. Integer arithmetic, like the
+    leaderboards' ranking in SQL (see leaderboards._per_game_tenths), so a
+    ranked player never shows a lower value than the one ranked below.
+    """
+    return (total * 20 + games) // (games * 2) / 10
+
 
 def get_default_season_id():
     # Get the first season or create a new one if none exists
@@ -8,12 +36,61 @@ def get_default_season_id():
     return season.id
 
 
+class SeasonQuerySet(models.QuerySet):
+    def bump_data_version(self):
+        """Mark the seasons' data as changed, so responses cached for the previous version are no longer used"""
+        updated = self.update(data_version=F('data_version') + 1, data_updated_at=timezone.now())
+        # Nor are their published snapshots, which nginx would otherwise keep serving
+        if has_snapshots():
+            for season_number in self.values_list('number', flat=True):
+                remove_snapshot(season_number)
+        return updated
+
+
 class Season(models.Model):
     number = models.PositiveIntegerField(unique=True)
+    # Bumped whenever a game, team, player or box score of the season changes (see api.signals)
+    data_version = models.PositiveIntegerField(default=0)
+    data_updated_at = models.DateTimeField(null=True, blank=True)
+    # An archived season can't be changed and its read responses are served as immutable (see api.archive)
+    is_archived = models.BooleanField(default=False)
+
+    objects = SeasonQuerySet.as_manager()
 
     def __str__(self):
         return str(self.number)
-    
+
+
+def validate_season_not_archived(season_id):
+    """Used by the clean() of a season's rows, so forms (like the admin's) can't write to an archived season"""
+    if season_id is not None and Season.objects.filter(pk=season_id, is_archived=True).exists():
+        raise ValidationError('This season is archived and can no longer be changed.')
+
+
+def games_count_subquery(team_field, playoff, team='pk'):
+    """
+    A team's home or away games of a phase, counted by a subquery that uses
+    the foreign key's index; `team` is the outer query's team id field
+    """
+    games = (Game.objects.filter(**{team_field: OuterRef(team), 'playoff_game__isnull': not playoff})
+             .order_by().values(team_field).annotate(count=Count('pk')).values('count'))
+    return Coalesce(Subquery(games), 0)
+
+
+class TeamQuerySet(models.QuerySet):
+    def with_game_counts(self):
+        """Annotate regular season and playoff game counts so the Team game-count properties skip their queries"""
+        # Counting over joins of both home_games and away_games would multiply their rows per team
+        return self.annotate(
+            regular_season_games_count=(
+                games_count_subquery('home_team', playoff=False) + games_count_subquery('away_team', playoff=False)
+            ),
+            playoff_games_count=(
+                games_count_subquery('home_team', playoff=True) + games_count_subquery('away_team', playoff=True)
+            ),
+        )
+
+
 class Team(models.Model):
     name = models.CharField(max_length=100, unique=True)
     hex_color = models.CharField(max_length=255, null=True, blank=True)
@@ -24,26 +101,37 @@ class Team(models.Model):
                                 default=get_default_season_id,
                                 related_name='teams', on_delete=models.CASCADE)  # new season field
 
+    objects = TeamQuerySet.as_manager()
+
     class Meta:
         unique_together = ('name', 'season')  # A team name can only be unique within a season
 
     def __str__(self):
         return self.name
 
+    def clean(self):
+        validate_season_not_archived(self.season_id)
+
     @property
     def total_games_played(self):
         """Get the total number of games this team has played (both home and away)"""
+        if hasattr(self, 'regular_season_games_count'):
+            return self.regular_season_games_count + self.playoff_games_count
         return self.home_games.count() + self.away_games.count()
 
     @property
     def total_regular_season_games_played(self):
         """Get the total number of regular season games this team has played"""
+        if hasattr(self, 'regular_season_games_count'):
+            return self.regular_season_games_count
         return (self.home_games.filter(playoff_game__isnull=True).count() + 
                 self.away_games.filter(playoff_game__isnull=True).count())
 
     @property
     def total_playoff_games_played(self):
         """Get the total number of playoff games this team has played"""
+        if hasattr(self, 'playoff_games_count'):
+            return self.playoff_games_count
         return (self.home_games.filter(playoff_game__isnull=False).count() + 
                 self.away_games.filter(playoff_game__isnull=False).count())
 
@@ -80,6 +168,17 @@ class Team(models.Model):
             return wins / total_games
         return 0.0
 
+class GameQuerySet(models.QuerySet):
+    def with_teams(self):
+        """Prefetch the home, away and winning teams with their game counts for nested TeamSerializer output"""
+        teams = Team.objects.with_game_counts()
+        return self.prefetch_related(
+            Prefetch('home_team', queryset=teams),
+            Prefetch('away_team', queryset=teams),
+            Prefetch('winner', queryset=teams),
+        )
+
+
 class Game(models.Model):
     QUARTER_FINAL_1 = 'QF1'
     QUARTER_FINAL_2 = 'QF2'
@@ -117,6 +216,8 @@ class Game(models.Model):
     away_team_score = models.PositiveIntegerField(default=0)
     winner = models.ForeignKey(Team, related_name='won_games', on_delete=models.SET_NULL, null=True, blank=True)
 
+    objects = GameQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if self.home_team_score > self.away_team_score:
             self.winner = self.home_team
@@ -126,6 +227,34 @@ class Game(models.Model):
             self.winner = None
         super().save(*args, **kwargs)
 
+    def clean(self):
+        validate_season_not_archived(self.season_id)
+
+
+def season_total_alias(field, playoff=False):
+    """Name of the annotation added by PlayerQuerySet.with_season_totals for a stat field"""
+    return f"{'playoff' if playoff else 'season'}_{field}"
+
+
+class PlayerQuerySet(models.QuerySet):
+    def with_season_totals(self, playoff=False):
+        """
+        Annotate every summed stat and the games played count for one phase
+        (regular season or playoffs) from the PlayerSeasonTotals rows in a
+        single grouped query. The Player
+        properties read these annotations instead of running their own
+        aggregate queries; the team is prefetched with its game counts for
+        the fairness-adjusted values.
+        """
+        phase = Q(season_totals__phase=PlayerSeasonTotals.PLAYOFF if playoff else PlayerSeasonTotals.REGULAR)
+        annotations = {
+            season_total_alias(field, playoff): Coalesce(Sum(f'season_totals__{field}', filter=phase), 0)
+            for field in ['games_played', *SUMMED_STAT_FIELDS]
+        }
+        return self.annotate(**annotations).prefetch_related(
+            Prefetch('team', queryset=Team.objects.with_game_counts())
+        )
+
 
 class Player(models.Model):
     name = models.CharField(max_length=255, null=True)
@@ -136,19 +265,30 @@ class Player(models.Model):
                                 default=get_default_season_id,
                                 related_name='players', on_delete=models.CASCADE)
 
+    objects = PlayerQuerySet.as_manager()
+
     class Meta:
         unique_together = ('name', 'season')  # A player name can only be unique within a season
 
     def __str__(self):
         return f"{self.name} {self.jersey_number}"
 
-    def _get_statistics(self, playoff=False):
+    def clean(self):
+        validate_season_not_archived(self.season_id)
+
+    def _get_season_totals(self, playoff=False):
         if playoff:
-            return self.statistics.filter(game__playoff_game__isnull=False)
-        return self.statistics.filter(game__playoff_game__isnull=True)
+            return self.season_totals.filter(phase=PlayerSeasonTotals.PLAYOFF)
+        return self.season_totals.filter(phase=PlayerSeasonTotals.REGULAR)
 
     def _aggregate_statistics(self, stat_field, playoff=False):
-        return self._get_statistics(playoff).aggregate(total=Sum(stat_field))['total'] or 0
+        annotated = getattr(self, season_total_alias(stat_field, playoff), None)
+        if annotated is not None:
+            return annotated
+        return self._get_season_totals(playoff).aggregate(total=Sum(stat_field))['total'] or 0
+
+    def _games_played(self, playoff=False):
+        return self._aggregate_statistics('games_played', playoff)
 
     @property
     def total_two_point_fg(self):
@@ -203,37 +343,37 @@ class Player(models.Model):
 
     @property
     def average_points_per_game(self):
-        total_games = self._get_statistics().count()
+        total_games = self._games_played()
         if total_games > 0:
-            return round(self.total_points / total_games, 1)
+            return per_game(self.total_points, total_games)
         return 0
 
     @property
     def average_rebounds_per_game(self):
-        total_games = self._get_statistics().count()
+        total_games = self._games_played()
         if total_games > 0:
-            return round(self.total_rebounds / total_games, 1)
+            return per_game(self.total_rebounds, total_games)
         return 0
 
     @property
     def average_assists_per_game(self):
-        total_games = self._get_statistics().count()
+        total_games = self._games_played()
         if total_games > 0:
-            return round(self.total_assists / total_games, 1)
+            return per_game(self.total_assists, total_games)
         return 0
 
     @property
     def average_blocks_per_game(self):
-        total_games = self._get_statistics().count()
+        total_games = self._games_played()
         if total_games > 0:
-            return round(self.total_blocks / total_games, 1)
+            return per_game(self.total_blocks, total_games)
         return 0
 
     @property
     def average_steals_per_game(self):
-        total_games = self._get_statistics().count()
+        total_games = self._games_played()
         if total_games > 0:
-            return round(self.total_steals / total_games, 1)
+            return per_game(self.total_steals, total_games)
         return 0
 
     # Playoff statistics
@@ -282,37 +422,37 @@ class Player(models.Model):
 
     @property
     def average_playoff_points_per_game(self):
-        total_games = self._get_statistics(playoff=True).count()
+        total_games = self._games_played(playoff=True)
         if total_games > 0:
-            return round(self.total_playoff_points / total_games, 1)
+            return per_game(self.total_playoff_points, total_games)
         return 0
 
     @property
     def average_playoff_rebounds_per_game(self):
-        total_games = self._get_statistics(playoff=True).count()
+        total_games = self._games_played(playoff=True)
         if total_games > 0:
-            return round(self.total_playoff_rebounds / total_games, 1)
+            return per_game(self.total_playoff_rebounds, total_games)
         return 0
 
     @property
     def average_playoff_assists_per_game(self):
-        total_games = self._get_statistics(playoff=True).count()
+        total_games = self._games_played(playoff=True)
         if total_games > 0:
-            return round(self.total_playoff_assists / total_games, 1)
+            return per_game(self.total_playoff_assists, total_games)
         return 0
 
     @property
     def average_playoff_blocks_per_game(self):
-        total_games = self._get_statistics(playoff=True).count()
+        total_games = self._games_played(playoff=True)
         if total_games > 0:
-            return round(self.total_playoff_blocks / total_games, 1)
+            return per_game(self.total_playoff_blocks, total_games)
         return 0
 
     @property
     def average_playoff_steals_per_game(self):
-        total_games = self._get_statistics(playoff=True).count()
+        total_games = self._games_played(playoff=True)
         if total_games > 0:
-            return round(self.total_playoff_steals / total_games, 1)
+            return per_game(self.total_playoff_steals, total_games)
         return 0
 
     @property
@@ -360,7 +500,7 @@ class Player(models.Model):
     @property
     def games_played_ratio(self):
         """Get the ratio of games the player played vs team's total games"""
-        player_games = self._get_statistics().count()
+        player_games = self._games_played()
         team_games = self.team_total_regular_season_games
         if team_games > 0:
             return player_games / team_games
@@ -369,7 +509,7 @@ class Player(models.Model):
     @property
     def playoff_games_played_ratio(self):
         """Get the ratio of playoff games the player played vs team's total playoff games"""
-        player_playoff_games = self._get_statistics(playoff=True).count()
+        player_playoff_games = self._games_played(playoff=True)
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
             return player_playoff_games / team_playoff_games
@@ -381,7 +521,7 @@ class Player(models.Model):
         """Points per game adjusted for team's total games played"""
         team_games = self.team_total_regular_season_games
         if team_games > 0:
-            return round(self.total_points / team_games, 1)
+            return per_game(self.total_points, team_games)
         return 0
 
     @property
@@ -389,7 +529,7 @@ class Player(models.Model):
         """Rebounds per game adjusted for team's total games played"""
         team_games = self.team_total_regular_season_games
         if team_games > 0:
-            return round(self.total_rebounds / team_games, 1)
+            return per_game(self.total_rebounds, team_games)
         return 0
 
     @property
@@ -397,7 +537,7 @@ class Player(models.Model):
         """Assists per game adjusted for team's total games played"""
         team_games = self.team_total_regular_season_games
         if team_games > 0:
-            return round(self.total_assists / team_games, 1)
+            return per_game(self.total_assists, team_games)
         return 0
 
     @property
@@ -405,7 +545,7 @@ class Player(models.Model):
         """Blocks per game adjusted for team's total games played"""
         team_games = self.team_total_regular_season_games
         if team_games > 0:
-            return round(self.total_blocks / team_games, 1)
+            return per_game(self.total_blocks, team_games)
         return 0
 
     @property
@@ -413,7 +553,7 @@ class Player(models.Model):
         """Steals per game adjusted for team's total games played"""
         team_games = self.team_total_regular_season_games
         if team_games > 0:
-            return round(self.total_steals / team_games, 1)
+            return per_game(self.total_steals, team_games)
         return 0
 
     # Playoff fairness-adjusted statistics
@@ -422,7 +562,7 @@ class Player(models.Model):
         """Playoff points per game adjusted for team's total playoff games played"""
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
-            return round(self.total_playoff_points / team_playoff_games, 1)
+            return per_game(self.total_playoff_points, team_playoff_games)
         return 0
 
     @property
@@ -430,7 +570,7 @@ class Player(models.Model):
         """Playoff rebounds per game adjusted for team's total playoff games played"""
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
-            return round(self.total_playoff_rebounds / team_playoff_games, 1)
+            return per_game(self.total_playoff_rebounds, team_playoff_games)
         return 0
 
     @property
@@ -438,7 +578,7 @@ class Player(models.Model):
         """Playoff assists per game adjusted for team's total playoff games played"""
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
-            return round(self.total_playoff_assists / team_playoff_games, 1)
+            return per_game(self.total_playoff_assists, team_playoff_games)
         return 0
 
     @property
@@ -446,7 +586,7 @@ class Player(models.Model):
         """Playoff blocks per game adjusted for team's total playoff games played"""
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
-            return round(self.total_playoff_blocks / team_playoff_games, 1)
+            return per_game(self.total_playoff_blocks, team_playoff_games)
         return 0
 
     @property
@@ -454,10 +594,19 @@ class Player(models.Model):
         """Playoff steals per game adjusted for team's total playoff games played"""
         team_playoff_games = self.team_total_playoff_games
         if team_playoff_games > 0:
-            return round(self.total_playoff_steals / team_playoff_games, 1)
+            return per_game(self.total_playoff_steals, team_playoff_games)
         return 0
 
 
+class PlayerStatisticsQuerySet(models.QuerySet):
+    def totals_lines(self, *fields):
+        """Values of each box score as consumed by PlayerSeasonTotals.objects.apply_changes, plus any `fields`"""
+        return self.values(
+            'player_id', 'game_id', *SUMMED_STAT_FIELDS, *fields,
+            season_id=F('game__season_id'), playoff_game=F('game__playoff_game'),
+        )
+
+
 class PlayerStatistics(models.Model):
     player = models.ForeignKey(Player, related_name='statistics', on_delete=models.CASCADE)
     game = models.ForeignKey(Game, related_name='player_statistics', on_delete=models.CASCADE)
@@ -486,6 +635,14 @@ class PlayerStatistics(models.Model):
     plus_minus = models.DecimalField(max_digits=5, decimal_places=2, default=0)  # Allows values like 123.45 or 0.20
     efficiency = models.DecimalField(max_digits=5, decimal_places=2, default=0)  # Allows values like 123.45 or 0.20
 
+    objects = PlayerStatisticsQuerySet.as_manager()
+
+    def totals_line(self):
+        """This box score's contribution to its PlayerSeasonTotals row"""
+        line = {field: int(getattr(self, field)) for field in SUMMED_STAT_FIELDS}
+        line.update(player_id=self.player_id, season_id=self.game.season_id, playoff_game=self.game.playoff_game)
+        return line
+
     @property
     def total_points(self):
         return (self.two_point_fg * 2) + (self.three_point_fg * 3) + self.free_throw_fg
@@ -524,3 +681,247 @@ class PlayerStatistics(models.Model):
 
     def __str__(self):
         return f"{self.player} - {self.game}"
+
+    def clean(self):
+        validate_season_not_archived(self.game.season_id if self.game_id else None)
+
+
+class PlayerSeasonTotalsQuerySet(models.QuerySet):
+    def apply_changes(self, changes):
+        """
+        Apply box score changes to the summary rows by delta.
+
+        `changes` is an iterable of (old, new) pairs of totals lines (see
+        PlayerStatistics.totals_line); old is None for an inserted box score
+        and new is None for a deleted one.
+        """
+        self.apply_deltas(self.accumulate_deltas(changes))
+
+    @staticmethod
+    def accumulate_deltas(changes, deltas=None):
+        """
+        Sum box score changes into per summary row deltas, adding to `deltas`
+        when given. Callers writing many batches can accumulate them and
+        apply the deltas once.
+        """
+        deltas = defaultdict(Counter) if deltas is None else deltas
+        for old, new in changes:
+            for line, sign in ((old, -1), (new, 1)):
+                if line is None:
+                    continue
+                delta = deltas[PlayerSeasonTotals.key_for(line)]
+                delta['games_played'] += sign
+                for field in SUMMED_STAT_FIELDS:
+                    delta[field] += sign * line[field]
+        return deltas
+
+    def apply_deltas(self, deltas):
+        """Add accumulate_deltas() output to the summary rows"""
+        deltas = {key: delta for key, delta in deltas.items() if any(delta.values())}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            # Only a key gaining a box score can be missing its row
+            self.bulk_create(
+                [
+                    PlayerSeasonTotals(player_id=player_id, season_id=season_id, phase=phase)
+                    for (player_id, season_id, phase), delta in deltas.items()
+                    if delta['games_played'] > 0
+                ],
+                ignore_conflicts=True,
+            )
+            rows = self.select_for_update().filter(
+                player_id__in={player_id for player_id, _, _ in deltas},
+                season_id__in={season_id for _, season_id, _ in deltas},
+            )
+            updated = []
+            for row in rows:
+                delta = deltas.get((row.player_id, row.season_id, row.phase))
+                if delta is None:
+                    continue
+                for field, value in delta.items():
+                    setattr(row, field, getattr(row, field) + value)
+                updated.append(row)
+            self.bulk_update(updated, ['games_played', *SUMMED_STAT_FIELDS])
+
+    def rebuild(self, season=None, players=None):
+        """Recompute the summary rows from the raw box scores, optionally for one season or some players"""
+        stats = PlayerStatistics.objects.all()
+        totals = self.all()
+        if season is not None:
+            stats = stats.filter(game__season=season)
+            totals = totals.filter(season=season)
+        if players is not None:
+            stats = stats.filter(player__in=players)
+            totals = totals.filter(player__in=players)
+
+        grouped = stats.order_by().values(
+            'player_id',
+            season_id=F('game__season_id'),
+            phase=Case(
+                When(game__playoff_game__isnull=True, then=Value(PlayerSeasonTotals.REGULAR)),
+                default=Value(PlayerSeasonTotals.PLAYOFF),
+            ),
+        ).annotate(
+            games_count=Count('id'),
+            **{f'total_{field}': Sum(field) for field in SUMMED_STAT_FIELDS},
+        )
+
+        with transaction.atomic():
+            totals.delete()
+            created = self.bulk_create(
+                [
+                    PlayerSeasonTotals(
+                        player_id=row['player_id'],
+                        season_id=row['season_id'],
+                        phase=row['phase'],
+                        games_played=row['games_count'],
+                        **{field: row[f'total_{field}'] for field in SUMMED_STAT_FIELDS},
+                    )
+                    for row in grouped
+                ],
+                batch_size=1000,
+            )
+        return len(created)
+
+
+class PlayerSeasonTotals(models.Model):
+    """A player's summed box scores for one phase of a season, maintained by delta on every box score write"""
+    REGULAR = 'regular'
+    PLAYOFF = 'playoff'
+    PHASE_CHOICES = [
+        (REGULAR, 'Regular season'),
+        (PLAYOFF, 'Playoffs'),
+    ]
+
+    player = models.ForeignKey(Player, related_name='season_totals', on_delete=models.CASCADE)
+    season = models.ForeignKey(Season, related_name='player_totals', on_delete=models.CASCADE)
+    phase = models.CharField(max_length=7, choices=PHASE_CHOICES)
+
+    games_played = models.PositiveIntegerField(default=0)
+    minutes_played = models.PositiveIntegerField(default=0)  # this is total seconds
+
+    two_point_fg = models.PositiveIntegerField(default=0)
+    two_point_attempts = models.PositiveIntegerField(default=0)
+
+    three_point_fg = models.PositiveIntegerField(default=0)
+    three_point_attempts = models.PositiveIntegerField(default=0)
+
+    free_throw_fg = models.PositiveIntegerField(default=0)
+    free_throw_attempts = models.PositiveIntegerField(default=0)
+
+    offensive_rebounds = models.PositiveIntegerField(default=0)
+    defensive_rebounds = models.PositiveIntegerField(default=0)
+
+    assists = models.PositiveIntegerField(default=0)
+    turnovers = models.PositiveIntegerField(default=0)
+    steals = models.PositiveIntegerField(default=0)
+    blocks = models.PositiveIntegerField(default=0)
+    fouls = models.PositiveIntegerField(default=0)
+    fouls_drawn = models.PositiveIntegerField(default=0)
+
+    objects = PlayerSeasonTotalsQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('player', 'season', 'phase')
+
+    def __str__(self):
+        return f"{self.player} - {self.season} ({self.phase})"
+
+    @classmethod
+    def phase_for(cls, playoff_game):
+        return cls.REGULAR if playoff_game is None else cls.PLAYOFF
+
+    @classmethod
+    def key_for(cls, line):
+        return (line['player_id'], line['season_id'], cls.phase_for(line['playoff_game']))
+
+
+class IngestJob(models.Model):
+    """A CSV upload stored for processing outside the request that uploaded it"""
+    BOX_SCORES = 'box_scores'
+    ROSTER = 'roster'
+    KIND_CHOICES = [
+        (BOX_SCORES, 'Player statistics'),
+        (ROSTER, 'Roster'),
+    ]
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    season_number = models.PositiveIntegerField()
+    file = models.FileField(upload_to='ingest-jobs/%Y/%m/')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    rows_processed = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)  # the response body of a synchronous upload
+    errors = models.JSONField(default=list, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.get_kind_display()} upload for season {self.season_number} ({self.status})"
+
+    @property
+    def progress_cache_key(self):
+        # Progress is reported through the cache: the job's own writes are invisible until it commits
+        return f'ingest-job:{self.pk}:rows-processed'
+
+    @property
+    def heartbeat_cache_key(self):
+        # Set while the job runs, so a job whose worker died can be told from one still running
+        return f'ingest-job:{self.pk}:heartbeat'
+
+    @property
+    def current_rows_processed(self):
+        if self.status == self.RUNNING:
+            return cache.get(self.progress_cache_key, self.rows_processed)
+        return self.rows_processed
+
+    @property
+    def duration(self):
+        """Seconds spent processing, so far if still running"""
+        if self.started_at is None:
+            return None
+        return ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+
+
+class UploadBatch(models.Model):
+    """A file uploaded into a season, identified by its content so that a repeated upload can be skipped"""
+    season = models.ForeignKey(Season, related_name='upload_batches', on_delete=models.CASCADE)
+    kind = models.CharField(max_length=20, choices=IngestJob.KIND_CHOICES)
+    content_hash = models.CharField(max_length=64)  # sha256 hex digest of the file
+    result = models.JSONField()  # the response body of the upload
+    # The season's data_version after the upload; once the season changes again, the file is no longer a repeat
+    data_version = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('season', 'kind', 'content_hash')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} upload {self.content_hash[:12]} for {self.season}"
+
+
+class ArchivedResponse(models.Model):
+    """A read response of an archived season, computed when it was archived (see api.archive)"""
+    season = models.ForeignKey(Season, related_name='archived_responses', on_delete=models.CASCADE)
+    path = models.CharField(max_length=255)  # the request path with its sorted query string
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('season', 'path')
+
+    def __str__(self):
+        return f"{self.path} of season {self.season}"
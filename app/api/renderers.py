@@ -0,0 +1,53 @@
+"""
+The columnar format of list responses, chosen with ?format=columnar. Field
+names are sent once as columns instead of in every row, and the nested
+objects a view names in columnar_included (its teams and players) are sent
+once, by id, in the included map instead of in every row referencing them:
+
+    {"columns": ["id", "name", "team", ...],
+     "rows": [[1, "Player 0", 3, ...], ...],
+     "included": {"teams": {"3": {"id": 3, "name": "Team 0", ...}}}}
+
+A list of objects nested in a row, like a game's box scores, is itself a
+{"columns", "rows"} table. Other responses, like a single object or an
+error, are rendered as plain JSON.
+"""
+from rest_framework.renderers import JSONRenderer
+
+
+def is_object_list(data):
+    return isinstance(data, list) and all(isinstance(item, dict) for item in data)
+
+
+class ColumnarTable:
+    def __init__(self, included_fields):
+        # field name -> the name of the included map its objects are side-loaded into
+        self.included_fields = included_fields
+        self.included = {}
+
+    def table(self, objects):
+        columns = list(objects[0]) if objects else []
+        return {
+            'columns': columns,
+            'rows': [[self.cell(column, item.get(column)) for column in columns] for item in objects],
+        }
+
+    def cell(self, column, value):
+        kind = self.included_fields.get(column)
+        if kind is not None and isinstance(value, dict) and 'id' in value:
+            self.included.setdefault(kind, {}).setdefault(value['id'], value)
+            return value['id']
+        if value and is_object_list(value):
+            return self.table(value)
+        return value
+
+
+class ColumnarRenderer(JSONRenderer):
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if is_object_list(data):
+            view = (renderer_context or {}).get('view')
+            columnar = ColumnarTable(getattr(view, 'columnar_included', {}))
+            data = {**columnar.table(data), 'included': columnar.included}
+        return super().render(data, accepted_media_type, renderer_context)
@@ -1,7 +1,8 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Team, Player, Game, PlayerStatistics, Season
-from django.db.models import Sum
+from .models import Team, Player, Game, PlayerStatistics, PlayerSeasonTotals, Season, IngestJob
+from django.db.models import F, Sum
+from .standings import HeadToHeadMatrix
 
 
 class SeasonSerializer(serializers.ModelSerializer):
@@ -40,7 +41,7 @@ class PlayerDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Player
-        fields = ['name', 'jersey_number', 'position', 'team', 'season']
+        fields = ['id', 'name', 'jersey_number', 'position', 'team', 'season']
 
 
 class PlayerOnlySerializer(serializers.ModelSerializer):
@@ -372,24 +373,20 @@ class TeamDetailSerializer(serializers.ModelSerializer):
         ]
 
     def get_player_statistics(self, obj):
-        stats = PlayerStatistics.objects.filter(player__team=obj)
+        stats = PlayerStatistics.objects.filter(player__team=obj).select_related('player')
         return PlayerStatisticsSerializer(stats, many=True).data
 
     def get_team_stats(self, obj):
-        stats = PlayerStatistics.objects.filter(player__team=obj)
-
-        def sum_stat(field):
-            return stats.aggregate(total=Sum(field))['total'] or 0
-
-        return {
-            'total_points': sum((s.total_points for s in stats), 0),
-            'total_rebounds': sum((s.total_rebounds for s in stats), 0),
-            'total_assists': sum_stat('assists'),
-            'total_blocks': sum_stat('blocks'),
-            'total_steals': sum_stat('steals'),
-            'total_turnovers': sum_stat('turnovers'),
-            'total_fouls': sum_stat('fouls'),
-        }
+        totals = PlayerSeasonTotals.objects.filter(player__team=obj).aggregate(
+            total_points=Sum(F('two_point_fg') * 2 + F('three_point_fg') * 3 + F('free_throw_fg')),
+            total_rebounds=Sum(F('offensive_rebounds') + F('defensive_rebounds')),
+            total_assists=Sum('assists'),
+            total_blocks=Sum('blocks'),
+            total_steals=Sum('steals'),
+            total_turnovers=Sum('turnovers'),
+            total_fouls=Sum('fouls'),
+        )
+        return {name: total or 0 for name, total in totals.items()}
     
 class GameWithStatsSerializer(serializers.ModelSerializer):
     player_statistics = PlayerStatisticsSerializer(many=True, read_only=True)
@@ -422,6 +419,16 @@ class PlayerCSVSerializer(serializers.Serializer):
     team = serializers.CharField()
     jersey_number = serializers.IntegerField()
 
+class IngestJobSerializer(serializers.ModelSerializer):
+    season = serializers.IntegerField(source='season_number')
+    rows_processed = serializers.IntegerField(source='current_rows_processed')
+    duration = serializers.FloatField()
+
+    class Meta:
+        model = IngestJob
+        fields = ['id', 'kind', 'season', 'status', 'rows_processed', 'errors', 'result', 'duration',
+                  'created_at', 'started_at', 'finished_at']
+
 class TeamStandingsSerializer(serializers.ModelSerializer):
     total_games_played = serializers.SerializerMethodField()
     total_regular_season_games_played = serializers.SerializerMethodField()
@@ -452,16 +459,7 @@ class TeamStandingsSerializer(serializers.ModelSerializer):
 
     def get_head_to_head_records(self, obj):
         """Get head-to-head records against all other teams in the same season"""
-        season_teams = Team.objects.filter(season=obj.season).exclude(id=obj.id)
-        records = {}
-        
-        for other_team in season_teams:
-            wins, losses = obj.get_head_to_head_record(other_team)
-            if wins > 0 or losses > 0:  # Only include teams they've played against
-                records[other_team.name] = {
-                    'wins': wins,
-                    'losses': losses,
-                    'win_percentage': obj.get_head_to_head_win_percentage(other_team)
-                }
-        
-        return records
\ No newline at end of file
+        head_to_head = self.context.get('head_to_head')
+        if head_to_head is None:
+            head_to_head = HeadToHeadMatrix.for_teams(Team.objects.filter(season=obj.season_id))
+        return head_to_head.records(obj)
\ No newline at end of file
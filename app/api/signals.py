@@ -0,0 +1,78 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Season, Team, Player, Game, PlayerStatistics, PlayerSeasonTotals
+
+
+@receiver(pre_save, sender=PlayerStatistics)
+def remember_previous_box_score(sender, instance, raw=False, **kwargs):
+    """Keep the stored values of an updated box score so post_save can apply the difference"""
+    instance._previous_totals_line = None
+    if instance.pk and not raw:
+        instance._previous_totals_line = PlayerStatistics.objects.filter(pk=instance.pk).totals_lines().first()
+
+
+@receiver(post_save, sender=PlayerStatistics)
+def apply_box_score_to_totals(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_totals_line', None)
+    PlayerSeasonTotals.objects.apply_changes([(previous, instance.totals_line())])
+
+
+@receiver(pre_delete, sender=PlayerStatistics)
+def remove_box_score_from_totals(sender, instance, **kwargs):
+    # Runs before the delete so the totals row still exists when a player is deleted with its box scores
+    PlayerSeasonTotals.objects.apply_changes([(instance.totals_line(), None)])
+
+
+@receiver(pre_save, sender=Game)
+def remember_previous_game_phase(sender, instance, raw=False, **kwargs):
+    instance._previous_phase = None
+    if instance.pk and not raw:
+        instance._previous_phase = Game.objects.filter(pk=instance.pk).values('season_id', 'playoff_game').first()
+
+
+@receiver(post_save, sender=Game)
+def move_totals_on_game_phase_change(sender, instance, created=False, raw=False, **kwargs):
+    """A game moved to another season or between regular season and playoffs moves its box scores with it"""
+    previous = getattr(instance, '_previous_phase', None)
+    if created or raw or previous is None:
+        return
+    if (previous['season_id'] == instance.season_id and
+            PlayerSeasonTotals.phase_for(previous['playoff_game']) == PlayerSeasonTotals.phase_for(instance.playoff_game)):
+        return
+    players = instance.player_statistics.values('player_id')
+    PlayerSeasonTotals.objects.rebuild(players=players)
+
+
+@receiver(pre_save, sender=Team)
+@receiver(pre_save, sender=Player)
+def remember_previous_season(sender, instance, raw=False, **kwargs):
+    instance._previous_season_id = None
+    if instance.pk and not raw:
+        instance._previous_season_id = sender.objects.filter(pk=instance.pk).values_list('season_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Team)
+@receiver([post_save, post_delete], sender=Player)
+@receiver([post_save, post_delete], sender=Game)
+@receiver([post_save, post_delete], sender=PlayerStatistics)
+def bump_season_data_version(sender, instance, raw=False, **kwargs):
+    """Any change to a season's data invalidates the responses cached for it (see api.cache)"""
+    if raw:
+        return
+    if sender is PlayerStatistics:
+        season_ids = {instance.game.season_id}
+    else:
+        season_ids = {instance.season_id}
+    # A row moved to another season changes both seasons
+    if sender is Game:
+        previous = getattr(instance, '_previous_phase', None)
+    elif sender is PlayerStatistics:
+        previous = getattr(instance, '_previous_totals_line', None)
+    else:
+        previous = {'season_id': getattr(instance, '_previous_season_id', None)}
+    if previous is not None and previous['season_id'] is not None:
+        season_ids.add(previous['season_id'])
+    Season.objects.filter(pk__in=season_ids).bump_data_version()
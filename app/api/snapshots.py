@@ -0,0 +1,24 @@
+"""
+Where publish_season_snapshot writes the static JSON of an archived season,
+which nginx serves before a request reaches Django (see nginx/nginx.conf).
+A snapshot would keep serving the season's old data after a change, so it
+is removed whenever the season's data version is bumped.
+"""
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+
+def snapshot_directory(root, season_number):
+    """Where nginx looks for the snapshot of a season"""
+    return Path(root) / f'season-{season_number}'
+
+
+def has_snapshots(root=None):
+    root = Path(root or settings.SEASON_SNAPSHOT_ROOT)
+    return root.is_dir() and any(root.glob('season-*'))
+
+
+def remove_snapshot(season_number, root=None):
+    shutil.rmtree(snapshot_directory(root or settings.SEASON_SNAPSHOT_ROOT, season_number), ignore_errors=True)
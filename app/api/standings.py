@@ -0,0 +1,135 @@
+# standings.py
+from collections import defaultdict, namedtuple
+from itertools import groupby
+
+from django.db.models import Count, Sum
+
+from .models import Game
+
+
+def _game_rows(teams):
+    """Games between the teams in one grouped query: a row per (home team, away team, winner, playoff game)"""
+    return list(
+        Game.objects.filter(home_team__in=teams, away_team__in=teams)
+        .order_by()
+        .values('home_team_id', 'away_team_id', 'winner_id', 'playoff_game')
+        .annotate(
+            games=Count('id'),
+            home_points=Sum('home_team_score'),
+            away_points=Sum('away_team_score'),
+        )
+    )
+
+
+class HeadToHeadMatrix:
+    """
+    Head-to-head wins between every pair of a set of teams, built from a single
+    GROUP BY home_team, away_team, winner query over their games. Only plain
+    ids and names are kept so the matrix can be cached.
+    """
+
+    def __init__(self, teams, wins):
+        self.teams = sorted((team.pk, team.name, team.season_id) for team in teams)
+        self._wins = wins  # {(team_id, opponent_id): games won by team_id}
+
+    @classmethod
+    def for_teams(cls, teams):
+        teams = list(teams)
+        return cls.from_rows(teams, _game_rows(teams))
+
+    @classmethod
+    def from_rows(cls, teams, rows):
+        wins = defaultdict(int)
+        for row in rows:
+            home_team_id, away_team_id, winner_id = row['home_team_id'], row['away_team_id'], row['winner_id']
+            if winner_id == home_team_id:
+                wins[(home_team_id, away_team_id)] += row['games']
+            elif winner_id == away_team_id:
+                wins[(away_team_id, home_team_id)] += row['games']
+        return cls(teams, dict(wins))
+
+    def wins(self, team, other_team):
+        """Get the number of wins of a team against another team"""
+        return self._wins.get((team.pk, other_team.pk), 0)
+
+    def record(self, team, other_team):
+        """Get the head-to-head record of a team against another team (wins, losses)"""
+        if team.pk == other_team.pk:
+            return (0, 0)
+        return (self.wins(team, other_team), self.wins(other_team, team))
+
+    def win_percentage(self, team, other_team):
+        wins, losses = self.record(team, other_team)
+        total_games = wins + losses
+        if total_games > 0:
+            return wins / total_games
+        return 0.0
+
+    def records(self, team):
+        """Head-to-head records against every team of the same season that this team has played"""
+        records = {}
+        for other_id, other_name, other_season_id in self.teams:
+            if other_id == team.pk or other_season_id != team.season_id:
+                continue
+            wins = self._wins.get((team.pk, other_id), 0)
+            losses = self._wins.get((other_id, team.pk), 0)
+            if wins > 0 or losses > 0:  # Only include teams they've played against
+                records[other_name] = {
+                    'wins': wins,
+                    'losses': losses,
+                    'win_percentage': wins / (wins + losses),
+                }
+        return records
+
+
+TeamRecord = namedtuple('TeamRecord', ['team_id', 'wins', 'losses', 'head_to_head_wins', 'point_differential'])
+
+
+class Standings:
+    """Teams in standings order with the records used to rank them"""
+
+    def __init__(self, records, head_to_head):
+        self.records = records
+        self.head_to_head = head_to_head
+
+    def order(self, teams):
+        """Sort team instances into standings order"""
+        position = {record.team_id: index for index, record in enumerate(self.records)}
+        return sorted(teams, key=lambda team: position[team.pk])
+
+
+def compute_standings(teams):
+    """
+    Rank teams with the tiebreakers applied in order:
+    1. Wins (higher is better)
+    2. Losses (lower is better)
+    3. Head-to-head wins against the other teams with the same record
+    4. Regular season point differential
+
+    The games are loaded once in a single grouped query; everything else runs
+    in memory and the result only holds plain values, so it can be cached.
+    """
+    teams = list(teams)
+    rows = _game_rows(teams)
+    head_to_head = HeadToHeadMatrix.from_rows(teams, rows)
+
+    point_differential = defaultdict(int)
+    for row in rows:
+        if row['playoff_game'] is None:
+            point_differential[row['home_team_id']] += row['home_points'] - row['away_points']
+            point_differential[row['away_team_id']] += row['away_points'] - row['home_points']
+
+    records = []
+    by_record = sorted(teams, key=lambda team: (-team.wins, team.losses, team.pk))
+    for _, tied_teams in groupby(by_record, key=lambda team: (team.wins, team.losses)):
+        tied_teams = list(tied_teams)
+        head_to_head_wins = {
+            team.pk: sum(head_to_head.wins(team, other_team) for other_team in tied_teams if other_team.pk != team.pk)
+            for team in tied_teams
+        }
+        tied_teams.sort(key=lambda team: (-head_to_head_wins[team.pk], -point_differential[team.pk], team.pk))
+        records.extend(
+            TeamRecord(team.pk, team.wins, team.losses, head_to_head_wins[team.pk], point_differential[team.pk])
+            for team in tied_teams
+        )
+    return Standings(records, head_to_head)
@@ -0,0 +1,8 @@
+from celery import shared_task
+
+from .jobs import run_ingest_job
+
+
+@shared_task
+def process_ingest_job(job_id):
+    run_ingest_job(job_id)
@@ -0,0 +1,110 @@
+import itertools
+
+import pytest
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.cache import get_response_cache
+from api.models import Season, Team, Player, Game, PlayerStatistics, PlayerSeasonTotals
+
+
+def make_league(season_number=1, teams=4, players_per_team=3, playoff_games=2):
+    """
+    Create a season where every team plays every other team home and away,
+    followed by a few playoff games, with a box score for every rostered player.
+    Box scores are bulk inserted and the season totals rebuilt afterwards.
+    """
+    season, _ = Season.objects.get_or_create(number=season_number)
+    team_list = [
+        Team.objects.create(name=f"S{season_number} Team {i}", season=season)
+        for i in range(teams)
+    ]
+    players = {
+        team.id: [
+            Player.objects.create(
+                name=f"{team.name} Player {j}", jersey_number=j, position='G', team=team, season=season
+            )
+            for j in range(players_per_team)
+        ]
+        for team in team_list
+    }
+
+    games = []
+    for number, (home, away) in enumerate(itertools.permutations(team_list, 2), start=1):
+        games.append(Game.objects.create(
+            season=season, game_number=number, home_team=home, away_team=away,
+            home_team_score=60 + (number * 7) % 23, away_team_score=60 + (number * 11) % 19,
+        ))
+    playoff_codes = [code for code, _ in Game.PLAYOFF_CHOICES][:playoff_games]
+    for index, code in enumerate(playoff_codes):
+        games.append(Game.objects.create(
+            season=season, playoff_game=code, home_team=team_list[0], away_team=team_list[index + 1],
+            home_team_score=70 + index, away_team_score=65,
+        ))
+
+    statistics = []
+    for game in games:
+        if game.winner_id:
+            loser_id = game.away_team_id if game.winner_id == game.home_team_id else game.home_team_id
+            Team.objects.filter(pk=game.winner_id).update(wins=F('wins') + 1)
+            Team.objects.filter(pk=loser_id).update(losses=F('losses') + 1)
+        for team in (game.home_team, game.away_team):
+            for index, player in enumerate(players[team.id]):
+                seed = game.pk + player.pk
+                statistics.append(PlayerStatistics(
+                    player=player, game=game,
+                    minutes_played=600 + seed % 900,
+                    two_point_fg=seed % 6, two_point_attempts=seed % 6 + 4,
+                    three_point_fg=seed % 3, three_point_attempts=seed % 3 + 2,
+                    free_throw_fg=seed % 4, free_throw_attempts=seed % 4 + 1,
+                    offensive_rebounds=seed % 2, defensive_rebounds=seed % 5,
+                    assists=seed % 7, turnovers=seed % 3, steals=seed % 2,
+                    blocks=index % 2, fouls=seed % 4, fouls_drawn=seed % 3,
+                ))
+    PlayerStatistics.objects.bulk_create(statistics)
+    PlayerSeasonTotals.objects.rebuild(season=season)
+    return season
+
+
+class QueryCounter(CaptureQueriesContext):
+    """Captures queries, ignoring the savepoints ATOMIC_REQUESTS wraps around each request"""
+
+    @property
+    def statements(self):
+        return [
+            query['sql'] for query in self.captured_queries
+            if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT'))
+        ]
+
+    def __len__(self):
+        return len(self.statements)
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    # Season ids and data versions restart in every test, so cached responses would leak between them
+    get_response_cache().clear()
+    yield
+    get_response_cache().clear()
+
+
+@pytest.fixture
+def count_queries():
+    return lambda: QueryCounter(connection)
+
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+
+@pytest.fixture
+def league_factory(db):
+    return make_league
+
+
+@pytest.fixture
+def league(league_factory):
+    return league_factory()
@@ -0,0 +1,153 @@
+import time
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+
+from api import cache
+from api.archive import ArchiveError, archive_season, unarchive_season
+from api.cache import ARCHIVED_CACHE_CONTROL, get_response_cache
+from api.models import ArchivedResponse, Player, Team
+
+
+def upload_roster(api_client, rows, season=1, **params):
+    return api_client.post(
+        "/api/bball/players-upload/",
+        {"csv_file": SimpleUploadedFile("roster.csv", ("name,position,team,jersey_number\n" + rows).encode()),
+         "season": season, **params},
+        format="multipart",
+    )
+
+
+@pytest.fixture
+def archive_paths(settings):
+    settings.SEASON_ARCHIVE_PATHS = [
+        "/api/bball/teams/", "/api/bball/teams/{team}/", "/api/bball/top-players/?fairness_adjusted=true",
+    ]
+
+
+@pytest.mark.django_db
+class TestArchiveSeason:
+    def test_final_responses_are_stored(self, league, api_client, archive_paths):
+        standings = api_client.get("/api/bball/teams/?season=1").json()
+        team_count = Team.objects.filter(season=league).count()
+
+        assert archive_season(league) == 2 + team_count
+
+        league.refresh_from_db()
+        assert league.is_archived
+        stored = ArchivedResponse.objects.get(season=league, path="/api/bball/teams/?season=1")
+        assert stored.data == standings
+        assert ArchivedResponse.objects.filter(
+            season=league, path="/api/bball/top-players/?fairness_adjusted=true&season=1").exists()
+
+    def test_reads_are_immutable_and_skip_the_database(self, league, api_client, archive_paths, count_queries):
+        archive_season(league)
+
+        for path in ["/api/bball/teams/?season=1", "/api/bball/games/?season=1"]:
+            api_client.get(path)
+            with count_queries() as queries:
+                response = api_client.get(path)
+            assert response.status_code == 200
+            assert response['Cache-Control'] == ARCHIVED_CACHE_CONTROL
+            assert len(queries) == 0, queries.statements
+
+    def test_stored_responses_refill_a_cleared_cache(self, league, api_client, archive_paths, count_queries):
+        archive_season(league)
+        expected = api_client.get("/api/bball/top-players/?season=1&fairness_adjusted=true").json()
+        get_response_cache().clear()
+
+        with count_queries() as queries:
+            response = api_client.get("/api/bball/top-players/?fairness_adjusted=true&season=1")
+
+        # The season lookup and the stored response
+        assert len(queries) == 2
+        assert response.json() == expected
+
+    def test_failed_archive_leaves_nothing_cached(self, league, api_client, settings):
+        settings.SEASON_ARCHIVE_PATHS = ["/api/bball/players/", "/api/bball/teams/0/"]
+        with pytest.raises(ArchiveError):
+            archive_season(league)
+        player = Player.objects.filter(season=league).first()
+        player.name = "Renamed"
+        player.save()
+
+        response = api_client.get("/api/bball/players/?season=1")
+
+        assert response['Cache-Control'] != ARCHIVED_CACHE_CONTROL
+        assert "Renamed" in [row['name'] for row in response.json()]
+        assert not ArchivedResponse.objects.exists()
+
+    def test_only_stored_responses_are_cached_for_good(self, league, api_client, archive_paths, count_queries,
+                                                       monkeypatch):
+        archive_season(league)
+        monkeypatch.setattr(cache, 'get_cache_timeout', lambda: 1)
+        stored, other = "/api/bball/teams/?season=1", "/api/bball/teams/?season=1&order=any"
+        api_client.get(stored)
+        api_client.get(other)
+
+        time.sleep(1.1)
+
+        with count_queries() as queries:
+            api_client.get(stored)
+        assert len(queries) == 0
+        with count_queries() as queries:
+            assert api_client.get(other)['Cache-Control'] == ARCHIVED_CACHE_CONTROL
+        assert len(queries) > 0
+
+    def test_uploads_are_rejected(self, league, api_client, archive_paths):
+        archive_season(league)
+        player = Player.objects.filter(season=league).first()
+        row = f"{player.name},{player.position},{player.team.name},77\n"
+
+        for params in [{}, {"async": "true"}]:
+            response = upload_roster(api_client, row, **params)
+            assert response.status_code == 400
+            assert response.data == {'error': "Season 1 is archived and can't be changed", 'season': 1}
+        player.refresh_from_db()
+        assert player.jersey_number != 77
+
+    def test_rows_are_read_only_in_the_admin(self, league, admin_client, archive_paths):
+        archive_season(league)
+        team = Team.objects.filter(season=league).first()
+
+        response = admin_client.post(reverse('admin:api_team_change', args=[team.pk]), {'name': 'Renamed'})
+
+        assert response.status_code == 403
+        team.refresh_from_db()
+        assert team.name != 'Renamed'
+        with pytest.raises(ValidationError):
+            Player(name='New', team=team, season=league).full_clean()
+
+    def test_unarchive_allows_changes_again(self, league, api_client, archive_paths,
+                                            django_capture_on_commit_callbacks):
+        archive_season(league)
+        api_client.get("/api/bball/teams/?season=1")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            unarchive_season(league)
+
+        assert not ArchivedResponse.objects.filter(season=league).exists()
+        response = api_client.get("/api/bball/teams/?season=1")
+        assert response['Cache-Control'] != ARCHIVED_CACHE_CONTROL
+        player = Player.objects.filter(season=league).first()
+        assert upload_roster(api_client, f"{player.name},{player.position},{player.team.name},77\n").status_code == 201
+
+    def test_marker_stored_by_a_read_racing_unarchive_expires(self, league, api_client, archive_paths, settings,
+                                                              django_capture_on_commit_callbacks):
+        settings.RESPONSE_CACHE_SOFT_TIMEOUT = 1
+        archive_season(league)
+        api_client.get("/api/bball/teams/?season=1")
+        key = cache.archived_season_key(league.number)
+        marker = get_response_cache().get(key)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            unarchive_season(league)
+        # A read that found the season archived before the commit stores the marker after it
+        get_response_cache().set(key, marker, settings.RESPONSE_CACHE_SOFT_TIMEOUT)
+        assert api_client.get("/api/bball/teams/?season=1")['Cache-Control'] == ARCHIVED_CACHE_CONTROL
+
+        time.sleep(1.1)
+
+        assert api_client.get("/api/bball/teams/?season=1")['Cache-Control'] != ARCHIVED_CACHE_CONTROL
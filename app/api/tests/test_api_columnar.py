@@ -0,0 +1,58 @@
+import pytest
+
+
+def expand(table, included, included_fields):
+    """The objects of a columnar table, with their side-loaded objects put back"""
+    objects = []
+    for row in table['rows']:
+        item = {}
+        for column, value in zip(table['columns'], row):
+            if column in included_fields and value is not None:
+                value = included[included_fields[column]][str(value)]
+            elif isinstance(value, dict) and 'rows' in value:
+                value = expand(value, included, included_fields)
+            item[column] = value
+        objects.append(item)
+    return objects
+
+
+@pytest.mark.django_db
+class TestColumnarFormat:
+    @pytest.mark.parametrize('url, included_fields', [
+        ("/api/bball/players/?season=1", {'team': 'teams'}),
+        ("/api/bball/games/?season=1",
+         {'home_team': 'teams', 'away_team': 'teams', 'winner': 'teams', 'player': 'players'}),
+        ("/api/bball/player-statistics/?season=1", {'player': 'players'}),
+    ])
+    def test_columnar_list_has_the_same_data(self, league, api_client, url, included_fields):
+        expected = api_client.get(url).json()
+
+        response = api_client.get(url + "&format=columnar")
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/json'
+        columnar = response.json()
+        assert set(columnar) == {'columns', 'rows', 'included'}
+        assert expand(columnar, columnar['included'], included_fields) == expected
+
+    def test_referenced_objects_are_included_once(self, league, api_client):
+        columnar = api_client.get("/api/bball/games/?season=1&format=columnar").json()
+
+        home_team = columnar['columns'].index('home_team')
+        assert isinstance(columnar['rows'][0][home_team], int)
+        assert set(columnar['included']) == {'teams', 'players'}
+        assert len(columnar['included']['teams']) == 4
+
+    def test_payload_is_smaller(self, league, api_client):
+        for url in ["/api/bball/players/?season=1", "/api/bball/games/?season=1"]:
+            plain = api_client.get(url).content
+            columnar = api_client.get(url + "&format=columnar").content
+
+            assert len(columnar) * 2 < len(plain), url
+
+    def test_detail_is_plain_json(self, league, api_client):
+        player_id = api_client.get("/api/bball/players/?season=1").json()[0]['id']
+
+        response = api_client.get(f"/api/bball/players/{player_id}/?season=1&format=columnar")
+
+        assert response.json() == api_client.get(f"/api/bball/players/{player_id}/?season=1").json()
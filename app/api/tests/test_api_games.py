@@ -0,0 +1,21 @@
+import pytest
+
+from api.models import Team, Game
+from api.serializers import TeamSerializer
+
+
+@pytest.mark.django_db
+class TestTeamGameCounts:
+    def test_annotated_counts_match_count_queries(self, league):
+        annotated = {team.id: TeamSerializer(team).data for team in Team.objects.with_game_counts()}
+        for team in Team.objects.all():
+            assert annotated[team.id] == TeamSerializer(team).data
+
+    @pytest.mark.parametrize("url", ["/api/bball/games/?season=1", "/api/bball/playoffs/?season=1", "/api/bball/teams/?season=1"])
+    def test_nested_teams_add_no_queries_per_row(self, league, api_client, count_queries, url):
+        with count_queries() as queries:
+            response = api_client.get(url)
+
+        assert response.status_code == 200
+        assert len(response.data) > 1
+        assert len(queries) <= 6
@@ -0,0 +1,148 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+
+from api.models import Game, Player, PlayerStatistics, IngestJob
+
+STATISTICS_HEADER = "player,game,min,2pm,2pa,3pm,3pa,ftm,fta,or,dr,as,to,st,bs,pf,fd,pm,eff\n"
+
+
+@pytest.fixture
+def ingest_settings(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.INGEST_EXECUTOR = "eager"
+    return settings
+
+
+def upload_statistics_async(api_client, rows):
+    return api_client.post(
+        "/api/bball/upload-player-statistics/?async=true",
+        {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(rows)).encode()), "season": 1},
+        format="multipart",
+    )
+
+
+def statistics_rows():
+    game = Game.objects.filter(game_number__isnull=False).first()
+    return [
+        f"{player.name},{game.game_number},20:00,7,9,1,2,0,0,1,1,1,1,1,1,1,1,0,0\n"
+        for player in Player.objects.filter(team=game.home_team)
+    ]
+
+
+@pytest.mark.django_db
+class TestIngestJobs:
+    def test_async_upload_returns_a_job(self, league, api_client, ingest_settings):
+        rows = statistics_rows()
+
+        response = upload_statistics_async(api_client, rows)
+
+        assert response.status_code == 202
+        assert response['Location'] == f"/api/bball/ingest-jobs/{response.data['id']}/"
+        job = api_client.get(response['Location']).data
+        assert job['status'] == IngestJob.SUCCEEDED
+        assert job['kind'] == IngestJob.BOX_SCORES
+        assert job['season'] == 1
+        assert job['rows_processed'] == len(rows)
+        assert job['result'] == {
+            'message': 'CSV file uploaded successfully', 'inserted': 0, 'updated': len(rows), 'unchanged': 0,
+        }
+        assert job['duration'] >= 0
+        assert PlayerStatistics.objects.filter(two_point_fg=7).count() == len(rows)
+
+    def test_failed_job_reports_errors_and_writes_nothing(self, league, api_client, ingest_settings):
+        rows = statistics_rows() + ["Nobody,1,20:00,7,9,1,2,0,0,1,1,1,1,1,1,1,1,0,0\n"]
+
+        response = upload_statistics_async(api_client, rows)
+
+        job = api_client.get(f"/api/bball/ingest-jobs/{response.data['id']}/").data
+        assert job['status'] == IngestJob.FAILED
+        assert job['errors'][0]['missing_players'] == ["Nobody"]
+        assert job['result'] is None
+        assert not PlayerStatistics.objects.filter(two_point_fg=7).exists()
+
+    def test_async_roster_upload(self, api_client, ingest_settings):
+        response = api_client.post(
+            "/api/bball/players-upload/",
+            {"csv_file": SimpleUploadedFile("roster.csv", b"name,position,team,jersey_number\nAce,G,Aces,1\n"),
+             "season": 5, "async": "true"},
+            format="multipart",
+        )
+
+        assert response.status_code == 202
+        assert response.data['status'] == IngestJob.SUCCEEDED
+        assert response.data['result'] == {'players_created': 1, 'players_updated': 0, 'players_unchanged': 0}
+
+    def test_small_upload_is_synchronous_by_default(self, league, api_client, ingest_settings):
+        response = api_client.post(
+            "/api/bball/upload-player-statistics/",
+            {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(statistics_rows())).encode()),
+             "season": 1},
+            format="multipart",
+        )
+
+        assert response.status_code == 201
+        assert not IngestJob.objects.exists()
+
+    @pytest.mark.parametrize("params, expected_status", [("", 202), ("?async=false", 201)])
+    def test_large_upload_is_a_job_by_default(self, league, api_client, ingest_settings, params, expected_status):
+        ingest_settings.INGEST_ASYNC_THRESHOLD = 100
+
+        response = api_client.post(
+            "/api/bball/upload-player-statistics/" + params,
+            {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(statistics_rows())).encode()),
+             "season": 1},
+            format="multipart",
+        )
+
+        assert response.status_code == expected_status
+
+    def test_processed_files_are_deleted(self, league, api_client, ingest_settings, tmp_path):
+        upload_statistics_async(api_client, statistics_rows())
+        upload_statistics_async(api_client, ["Nobody,1,20:00,7,9,1,2,0,0,1,1,1,1,1,1,1,1,0,0\n"])
+
+        assert [job.file.name for job in IngestJob.objects.all()] == ["", ""]
+        assert not [path for path in tmp_path.rglob("*") if path.is_file()]
+
+    def test_job_whose_worker_died_is_marked_failed(self, api_client, ingest_settings):
+        started_at = timezone.now() - timedelta(seconds=ingest_settings.INGEST_JOB_STALE_AFTER + 1)
+        dead, alive = [
+            IngestJob.objects.create(kind=IngestJob.ROSTER, season_number=1, status=IngestJob.RUNNING,
+                                     started_at=started_at, file=ContentFile(b"name\n", name="roster.csv"))
+            for _ in range(2)
+        ]
+        cache.set(alive.heartbeat_cache_key, True)
+
+        jobs = {job['id']: job for job in api_client.get("/api/bball/ingest-jobs/").data}
+
+        assert jobs[dead.pk]['status'] == IngestJob.FAILED
+        assert jobs[dead.pk]['errors'] == [{'error': 'Processing stopped without finishing'}]
+        assert jobs[alive.pk]['status'] == IngestJob.RUNNING
+        dead.refresh_from_db()
+        assert not dead.file
+
+
+@pytest.mark.django_db(transaction=True)
+def test_thread_executor_processes_the_job_after_commit(api_client, ingest_settings):
+    ingest_settings.INGEST_EXECUTOR = "thread"
+
+    response = api_client.post(
+        "/api/bball/players-upload/?async=true",
+        {"csv_file": SimpleUploadedFile("roster.csv", b"name,position,team,jersey_number\nAce,G,Aces,1\n"),
+         "season": 6},
+        format="multipart",
+    )
+    assert response.status_code == 202
+
+    deadline = time.monotonic() + 10
+    job = response.data
+    while job['status'] in (IngestJob.PENDING, IngestJob.RUNNING) and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = api_client.get(response['Location']).data
+    assert job['status'] == IngestJob.SUCCEEDED
+    assert Player.objects.filter(name="Ace", season__number=6).exists()
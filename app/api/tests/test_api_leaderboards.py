@@ -0,0 +1,124 @@
+import pytest
+
+from api.leaderboards import CATEGORIES, leaderboards
+from api.models import Player, PlayerSeasonTotals, per_game
+
+REGULAR = PlayerSeasonTotals.REGULAR
+PLAYOFF = PlayerSeasonTotals.PLAYOFF
+
+PROPERTIES = {
+    'points': 'average_points_per_game',
+    'rebounds': 'average_rebounds_per_game',
+    'assists': 'average_assists_per_game',
+    'three_points_made': 'total_three_point_fg',
+    'blocks': 'average_blocks_per_game',
+    'steals': 'average_steals_per_game',
+}
+PLAYOFF_PROPERTIES = {
+    'points': 'average_playoff_points_per_game',
+    'rebounds': 'average_playoff_rebounds_per_game',
+    'assists': 'average_playoff_assists_per_game',
+    'three_points_made': 'total_playoff_three_point_fg',
+    'blocks': 'average_playoff_blocks_per_game',
+    'steals': 'average_playoff_steals_per_game',
+}
+FAIRNESS_PROPERTIES = {
+    'points': 'fairness_adjusted_points_per_game',
+    'rebounds': 'fairness_adjusted_rebounds_per_game',
+    'assists': 'fairness_adjusted_assists_per_game',
+    'three_points_made': 'total_three_point_fg',
+    'blocks': 'fairness_adjusted_blocks_per_game',
+    'steals': 'fairness_adjusted_steals_per_game',
+}
+
+
+@pytest.mark.django_db
+class TestTopPlayers:
+    @pytest.mark.parametrize("fairness_adjusted, properties", [(False, PROPERTIES), (True, FAIRNESS_PROPERTIES)])
+    def test_leaders_match_python_sorting(self, league, fairness_adjusted, properties):
+        players = list(Player.objects.all())
+        if not fairness_adjusted:
+            players = [p for p in players if p.games_played_ratio >= 0.75]
+
+        leaders = leaderboards(Player.objects.all(), fairness_adjusted=fairness_adjusted, limit=5)[REGULAR]
+
+        for category in CATEGORIES:
+            prop = properties[category.key]
+            expected = sorted((getattr(p, prop) for p in players), reverse=True)[:5]
+            assert [getattr(entry.player, prop) for entry in leaders[category.key]][:5] == expected
+
+    def test_playoff_leaders_match_python_sorting(self, league):
+        players = [p for p in Player.objects.all() if p.playoff_games_played_ratio >= 0.75]
+
+        leaders = leaderboards(Player.objects.all(), phases=[REGULAR, PLAYOFF], limit=3)[PLAYOFF]
+
+        for category in CATEGORIES:
+            prop = PLAYOFF_PROPERTIES[category.key]
+            expected = sorted((getattr(p, prop) for p in players), reverse=True)[:3]
+            assert [getattr(entry.player, prop) for entry in leaders[category.key]][:3] == expected
+
+    @pytest.mark.parametrize("total, games, expected", [(1, 4, 0.3), (3, 8, 0.4), (5, 2, 2.5), (1, 8, 0.1)])
+    def test_per_game_values_round_half_up_like_the_ranking(self, total, games, expected):
+        assert per_game(total, games) == expected
+
+    def test_ranked_values_never_increase(self, league):
+        leaders = leaderboards(Player.objects.all(), limit=50)[REGULAR]
+
+        for category in CATEGORIES:
+            values = [getattr(entry.player, PROPERTIES[category.key]) for entry in leaders[category.key]]
+            assert values == sorted(values, reverse=True)
+
+    def test_ties_share_a_rank(self, league):
+        leaders = leaderboards(Player.objects.all(), limit=3)[REGULAR]
+
+        for entries in leaders.values():
+            for entry in entries:
+                same_rank = [other for other in entries if other.rank == entry.rank]
+                assert entry.tied == (len(same_rank) > 1)
+
+    def test_players_below_games_ratio_are_excluded(self, league):
+        player = Player.objects.first()
+        player.statistics.filter(game__playoff_game__isnull=True).first().delete()
+        player.statistics.filter(game__playoff_game__isnull=True).first().delete()
+
+        leaders = leaderboards(Player.objects.all(), limit=50)[REGULAR]
+
+        assert all(entry.player.pk != player.pk for entries in leaders.values() for entry in entries)
+
+
+@pytest.mark.django_db
+class TestTopPlayersView:
+    def test_categories_and_limit(self, league, api_client):
+        response = api_client.get("/api/bball/top-players/?season=1&categories=points,assists&limit=2")
+
+        assert response.status_code == 200
+        assert 'top_points_per_game' in response.data
+        assert 'top_assists_per_game' in response.data
+        assert 'top_rebounds_per_game' not in response.data
+        assert {'rank', 'tied', 'name', 'team'} <= set(response.data['top_points_per_game'][0])
+        assert all(row['rank'] <= 2 for row in response.data['top_points_per_game'])
+
+    def test_unknown_category_returns_400(self, league, api_client):
+        response = api_client.get("/api/bball/top-players/?season=1&categories=dunks")
+
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("url", [
+        "/api/bball/top-players/?season=1",
+        "/api/bball/top-players/?season=1&fairness_adjusted=true",
+        "/api/bball/top-players/?season=1&include_playoffs=true",
+        "/api/bball/playoffs-top-players/?season=1",
+    ])
+    def test_runs_constant_number_of_queries(self, league, api_client, count_queries, url):
+        with count_queries() as queries:
+            response = api_client.get(url)
+
+        assert response.status_code == 200
+        assert len(queries) == 4
+
+    def test_include_playoffs_matches_playoff_endpoint(self, league, api_client):
+        combined = api_client.get("/api/bball/top-players/?season=1&include_playoffs=true")
+        playoffs = api_client.get("/api/bball/playoffs-top-players/?season=1")
+
+        assert combined.data['playoffs'] == playoffs.data
+        assert 'total_playoff_points' in playoffs.data['top_points_per_game'][0]
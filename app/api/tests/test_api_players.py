@@ -0,0 +1,25 @@
+import pytest
+
+from api.models import Player
+from api.serializers import PlayerSerializer, PlayerPlayoffsSerializer
+
+
+@pytest.mark.django_db
+class TestPlayerSeasonTotals:
+    def test_annotated_values_match_per_property_queries(self, league):
+        annotated = {p.id: PlayerSerializer(p).data for p in Player.objects.with_season_totals()}
+        for player in Player.objects.all():
+            assert annotated[player.id] == PlayerSerializer(player).data
+
+    def test_playoff_annotated_values_match_per_property_queries(self, league):
+        annotated = {p.id: PlayerPlayoffsSerializer(p).data for p in Player.objects.with_season_totals(playoff=True)}
+        for player in Player.objects.all():
+            assert annotated[player.id] == PlayerPlayoffsSerializer(player).data
+
+    def test_player_list_runs_constant_number_of_queries(self, league, api_client, count_queries):
+        with count_queries() as queries:
+            response = api_client.get("/api/bball/players/?season=1")
+
+        assert response.status_code == 200
+        assert len(response.data) == Player.objects.count()
+        assert len(queries) == 3
@@ -0,0 +1,93 @@
+"""
+Every read route in api/urls.py runs a fixed number of queries, whatever the
+size of the league. A serializer change that adds a query per row fails here
+with the SQL it ran.
+"""
+import pytest
+
+from api.models import Team, Player, Game, PlayerStatistics, IngestJob
+
+
+def first_team():
+    return Team.objects.order_by('pk').first().pk
+
+
+def first_player():
+    return Player.objects.order_by('pk').first().pk
+
+
+def first_game():
+    return Game.objects.filter(game_number__isnull=False).order_by('pk').first().pk
+
+
+def first_playoff_game():
+    return Game.objects.filter(playoff_game__isnull=False).order_by('pk').first().pk
+
+
+def first_playoff_statistics():
+    return PlayerStatistics.objects.filter(game__playoff_game__isnull=False).order_by('pk').first().pk
+
+
+def an_ingest_job():
+    return IngestJob.objects.create(kind=IngestJob.BOX_SCORES, season_number=1, file='ingest-jobs/stats.csv').pk
+
+
+# (url, object to retrieve or None for a list, query budget of an uncached response)
+ROUTES = [
+    ("/api/bball/teams/", None, 3),
+    ("/api/bball/teams/{}/", first_team, 4),
+    ("/api/bball/players/", None, 3),
+    ("/api/bball/players/{}/", first_player, 3),
+    ("/api/bball/games/", None, 6),
+    ("/api/bball/games/{}/", first_game, 6),
+    ("/api/bball/player-statistics/", None, 2),
+    ("/api/bball/player-statistics/{}/", first_playoff_statistics, 2),
+    ("/api/bball/top-players/", None, 4),
+    ("/api/bball/top-players/?fairness_adjusted=true", None, 4),
+    ("/api/bball/playoffs/", None, 5),
+    ("/api/bball/playoffs/{}/", first_playoff_game, 5),
+    ("/api/bball/playoffs-top-players/", None, 4),
+]
+# Routes whose responses aren't cached per season
+UNCACHED_ROUTES = [
+    # Finding the jobs whose worker died, then the jobs
+    ("/api/bball/ingest-jobs/", None, 2),
+    ("/api/bball/ingest-jobs/{}/", an_ingest_job, 2),
+    ("/api/bball/cache-stats/", None, 0),
+]
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    @pytest.mark.parametrize("scale", [1, 2], ids=["league", "doubled-league"])
+    @pytest.mark.parametrize("url, lookup, budget", ROUTES + UNCACHED_ROUTES,
+                             ids=[route[0] for route in ROUTES + UNCACHED_ROUTES])
+    def test_route_stays_within_query_budget(self, api_client, count_queries, league_factory,
+                                             scale, url, lookup, budget):
+        league_factory(teams=4 * scale, players_per_team=3 * scale, playoff_games=2 * scale)
+        if lookup is not None:
+            url = url.format(lookup())
+        url += ('&' if '?' in url else '?') + 'season=1'
+
+        with count_queries() as queries:
+            response = api_client.get(url)
+
+        assert response.status_code == 200
+        assert len(queries) == budget, (
+            f"{url} ran {len(queries)} queries, budget is {budget}:\n" + "\n\n".join(queries.statements)
+        )
+
+    @pytest.mark.parametrize("url, lookup, budget", ROUTES, ids=[route[0] for route in ROUTES])
+    def test_cached_route_only_looks_up_the_season_version(self, api_client, count_queries, league,
+                                                          url, lookup, budget):
+        if lookup is not None:
+            url = url.format(lookup())
+        url += ('&' if '?' in url else '?') + 'season=1'
+        computed = api_client.get(url)
+
+        with count_queries() as queries:
+            response = api_client.get(url)
+
+        assert response.status_code == 200
+        assert response.data == computed.data
+        assert len(queries) == 1, "\n\n".join(queries.statements)
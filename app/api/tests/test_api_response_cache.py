@@ -0,0 +1,280 @@
+import threading
+import time
+from io import StringIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from rest_framework.response import Response
+
+from api.cache import SeasonVersion, compute_once, get_response_cache, get_stats, record
+from api.models import Season, Team, Player, Game, PlayerStatistics
+
+
+def upload_roster(api_client, csv):
+    return api_client.post(
+        "/api/bball/players-upload/",
+        {"csv_file": SimpleUploadedFile("roster.csv", csv.encode()), "season": 1},
+        format="multipart",
+    )
+
+
+def data_versions():
+    return dict(Season.objects.values_list('number', 'data_version'))
+
+
+@pytest.mark.django_db
+class TestResponseCache:
+    def test_cached_response_is_served_until_the_season_changes(self, league, api_client):
+        player = Player.objects.filter(season=league).order_by('pk').first()
+        url = "/api/bball/players/?season=1"
+        before = api_client.get(url).data
+
+        # An update that bypasses the signals isn't seen until the version is bumped
+        Player.objects.filter(pk=player.pk).update(name="Renamed")
+        assert api_client.get(url).data == before
+
+        player.refresh_from_db()
+        player.save()
+        names = {row['name'] for row in api_client.get(url).data}
+        assert "Renamed" in names
+
+    @pytest.mark.parametrize("write", [
+        lambda season: Player.objects.filter(season=season).first().save(),
+        lambda season: Game.objects.filter(season=season).first().save(),
+        lambda season: season.teams.first().save(),
+        lambda season: PlayerStatistics.objects.filter(game__season=season).first().save(),
+        lambda season: PlayerStatistics.objects.filter(game__season=season).first().delete(),
+    ], ids=["player", "game", "team", "box-score-saved", "box-score-deleted"])
+    def test_writes_only_invalidate_their_season(self, league_factory, write):
+        first = league_factory(season_number=1)
+        league_factory(season_number=2)
+        before = data_versions()
+        write(first)
+
+        assert data_versions() == {1: before[1] + 1, 2: before[2]}
+
+    @pytest.mark.parametrize("model", [Game, Team, Player])
+    def test_moving_a_row_invalidates_both_seasons(self, league_factory, model):
+        first, second = league_factory(season_number=1), league_factory(season_number=2)
+        row = model.objects.filter(season=first).first()
+        before = data_versions()
+        row.season = second
+        if model is not Game:
+            row.name = "Moved"  # names are unique per season
+        row.save()
+
+        assert data_versions() == {1: before[1] + 1, 2: before[2] + 1}
+        assert Season.objects.get(number=1).data_updated_at is not None
+
+    def test_upload_invalidates_the_season_only_when_it_writes(self, league, api_client):
+        player = Player.objects.filter(season=league).first()
+        row = f"{player.name},{player.position},{player.team.name},{player.jersey_number + 50}\n"
+
+        before = data_versions()
+        upload_roster(api_client, "name,position,team,jersey_number\n" + row)
+        assert data_versions() == {1: before[1] + 1}
+
+        upload_roster(api_client, "name,position,team,jersey_number\n" + row)  # the same file again
+        assert data_versions() == {1: before[1] + 1}
+
+    def test_rebuilding_totals_invalidates_the_season(self, league):
+        before = data_versions()
+        call_command('rebuild_player_totals', season=1, stdout=StringIO())
+
+        assert data_versions() == {1: before[1] + 1}
+
+    def test_query_parameter_order_shares_a_cache_entry(self, league, api_client, count_queries):
+        api_client.get("/api/bball/top-players/?season=1&fairness_adjusted=true&limit=3")
+
+        with count_queries() as queries:
+            response = api_client.get("/api/bball/top-players/?limit=3&fairness_adjusted=true&season=1")
+
+        assert response.status_code == 200
+        assert len(queries) == 1
+
+    def test_errors_and_unknown_seasons_are_not_cached(self, league, api_client, count_queries):
+        api_client.get("/api/bball/top-players/?season=1&limit=oops")
+        with count_queries() as queries:
+            response = api_client.get("/api/bball/top-players/?season=1&limit=oops")
+        assert response.status_code == 400
+        assert len(queries) == 1
+
+        api_client.get("/api/bball/players/?season=99")
+        with count_queries() as queries:
+            response = api_client.get("/api/bball/players/?season=99")
+        assert response.data == []
+        assert len(queries) == 2
+
+
+@pytest.mark.django_db
+class TestConditionalRequests:
+    url = "/api/bball/teams/?season=1"
+
+    def test_matching_etag_is_answered_with_304(self, league, api_client, count_queries):
+        response = api_client.get(self.url)
+        etag = response.headers['ETag']
+
+        with count_queries() as queries:
+            not_modified = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        assert not_modified.status_code == 304
+        assert not_modified.content == b''
+        assert not_modified.headers['ETag'] == etag
+        assert len(queries) == 1
+
+    def test_if_modified_since_is_not_a_validator(self, league, api_client):
+        # The season's last change is shared by its URLs, so a date from one can't answer for another
+        response = api_client.get(self.url)
+        assert 'Last-Modified' not in response.headers
+
+        other = api_client.get("/api/bball/games/?season=1", HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 2099 00:00:00 GMT')
+
+        assert other.status_code == 200
+
+    def test_write_changes_the_etag(self, league, api_client):
+        etag = api_client.get(self.url).headers['ETag']
+        league.teams.first().save()
+
+        response = api_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+        # A response served from the cache carries the same validators
+        assert api_client.get(self.url).headers['ETag'] == response.headers['ETag']
+
+    def test_etag_depends_on_the_route_and_parameters(self, league, api_client):
+        etags = {
+            api_client.get(url).headers['ETag'] for url in [
+                self.url, "/api/bball/players/?season=1", "/api/bball/top-players/?season=1",
+                "/api/bball/top-players/?season=1&limit=3",
+            ]
+        }
+
+        assert len(etags) == 4
+
+
+def season_version(version):
+    return SeasonVersion(id=1, version=version, is_archived=False)
+
+
+class TestSingleFlight:
+    def compute(self, calls, data='computed', delay=0):
+        def compute():
+            calls.append(data)
+            time.sleep(delay)
+            return Response(data)
+        return compute
+
+    def test_concurrent_misses_compute_once(self):
+        cache, calls, responses = get_response_cache(), [], []
+        before = get_stats()
+
+        def request():
+            responses.append(compute_once(cache, 'leaders', season_version(1), 'leaders:latest', self.compute(calls, delay=0.2)))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert calls == ['computed']
+        assert [(response.data, current) for response, current in responses] == [('computed', True)] * 5
+        assert get_stats().get('waited', 0) - before.get('waited', 0) == 4
+        assert get_stats().get('coalesced', 0) - before.get('coalesced', 0) == 4
+
+    def test_previous_version_is_served_while_another_request_computes(self):
+        cache, calls = get_response_cache(), []
+        cache.set('leaders:latest', (1, 'previous'))
+        cache.add('leaders:lock', True)
+
+        response, current = compute_once(cache, 'leaders', season_version(2), 'leaders:latest', self.compute(calls))
+
+        assert (response.data, current) == ('previous', False)
+        assert calls == []
+
+    def test_computes_when_the_other_request_gives_up(self):
+        cache, calls = get_response_cache(), []
+        cache.add('leaders:lock', True)
+        threading.Timer(0.1, cache.delete, ['leaders:lock']).start()
+
+        response, current = compute_once(cache, 'leaders', season_version(1), 'leaders:latest', self.compute(calls))
+
+        assert (response.data, current) == ('computed', True)
+        assert calls == ['computed']
+
+    @pytest.mark.django_db
+    def test_previous_response_has_no_validators(self, league, api_client, monkeypatch):
+        url = "/api/bball/top-players/?season=1"
+        computed = api_client.get(url)
+        league.teams.first().save()
+        # Another request holds the lock of the new version's response
+        monkeypatch.setattr(get_response_cache(), 'add', lambda *args, **kwargs: False)
+
+        response = api_client.get(url)
+
+        assert response.data == computed.data
+        assert 'ETag' not in response.headers
+
+    @pytest.mark.django_db
+    def test_counters_are_exposed(self, api_client):
+        record('waited')
+
+        response = api_client.get("/api/bball/cache-stats/")
+
+        assert response.status_code == 200
+        assert response.data['waited'] >= 1
+
+
+@pytest.mark.django_db
+class TestStaleWhileRevalidate:
+    url = "/api/bball/players/?season=1"
+
+    @pytest.fixture(autouse=True)
+    def refresh_inline(self, settings):
+        settings.RESPONSE_CACHE_SOFT_TIMEOUT = 0
+        settings.RESPONSE_CACHE_REFRESH_WORKERS = 0
+
+    def test_stale_response_is_served_and_refreshed(self, league, api_client):
+        player = Player.objects.filter(season=league).order_by('pk').first()
+        api_client.get(self.url)
+        # Unseen by the data version, like anything else that changes before the response expires
+        Player.objects.filter(pk=player.pk).update(name="Renamed")
+
+        stale = api_client.get(self.url)
+        refreshed = api_client.get(self.url)
+
+        assert "Renamed" not in {row['name'] for row in stale.data}
+        assert "Renamed" in {row['name'] for row in refreshed.data}
+
+    def test_fresh_response_is_not_refreshed(self, league, api_client, settings, count_queries):
+        settings.RESPONSE_CACHE_SOFT_TIMEOUT = 60
+        api_client.get(self.url)
+
+        with count_queries() as queries:
+            api_client.get(self.url)
+
+        assert len(queries) == 1
+
+    def test_responses_allow_stale_while_revalidate(self, league, api_client, settings):
+        response = api_client.get(self.url)
+
+        assert response.headers['Cache-Control'] == (
+            f"max-age=0, stale-while-revalidate={settings.REST_FRAMEWORK['DEFAULT_CACHE_TIMEOUT']}"
+        )
+
+    def test_hit_stale_and_miss_ratios_are_reported(self, league, api_client, settings):
+        before = get_stats()
+        api_client.get(self.url)
+        api_client.get(self.url)
+        settings.RESPONSE_CACHE_SOFT_TIMEOUT = 60
+        api_client.get(self.url)
+        api_client.get(self.url)
+
+        stats = get_stats()
+        assert {event: stats[event] - before.get(event, 0) for event in ['hit', 'stale', 'miss']} == {
+            'hit': 2, 'stale': 1, 'miss': 1,
+        }
+        assert stats['hit_ratio'] + stats['stale_ratio'] + stats['miss_ratio'] == pytest.approx(1, abs=1e-3)
+        assert api_client.get("/api/bball/cache-stats/").data['hit_ratio'] is not None
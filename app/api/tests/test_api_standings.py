@@ -0,0 +1,77 @@
+import pickle
+
+import pytest
+
+from api.models import Season, Team, Game
+from api.standings import HeadToHeadMatrix, compute_standings
+
+
+@pytest.mark.django_db
+class TestHeadToHeadMatrix:
+    def test_matrix_matches_per_pair_queries(self, league):
+        teams = list(Team.objects.all())
+        Game.objects.create(season=league, game_number=99, home_team=teams[0], away_team=teams[1],
+                            home_team_score=50, away_team_score=50)
+        matrix = HeadToHeadMatrix.for_teams(teams)
+
+        for team in teams:
+            for other_team in teams:
+                assert matrix.record(team, other_team) == team.get_head_to_head_record(other_team)
+                assert matrix.win_percentage(team, other_team) == team.get_head_to_head_win_percentage(other_team)
+
+    def test_matrix_is_built_in_one_query(self, league, count_queries):
+        teams = list(Team.objects.all())
+        with count_queries() as queries:
+            HeadToHeadMatrix.for_teams(teams)
+
+        assert len(queries) == 1
+
+    def test_standings_head_to_head_records(self, league, api_client):
+        response = api_client.get("/api/bball/teams/?season=1")
+
+        assert response.status_code == 200
+        for row in response.data:
+            team = Team.objects.get(pk=row['id'])
+            for other_name, record in row['head_to_head_records'].items():
+                other_team = Team.objects.get(name=other_name)
+                assert (record['wins'], record['losses']) == team.get_head_to_head_record(other_team)
+
+
+@pytest.mark.django_db
+class TestStandings:
+    def make_team(self, season, name, wins, losses):
+        return Team.objects.create(name=name, season=season, wins=wins, losses=losses)
+
+    def test_tied_teams_are_ranked_by_head_to_head_then_point_differential(self):
+        season = Season.objects.create(number=7)
+        leader = self.make_team(season, "Leader", 5, 0)
+        tied_a = self.make_team(season, "Tied A", 3, 2)
+        tied_b = self.make_team(season, "Tied B", 3, 2)
+        tied_c = self.make_team(season, "Tied C", 3, 2)
+        last = self.make_team(season, "Last", 0, 5)
+        # C beats B, so C is ahead of B; A has no head-to-head wins but the best point differential
+        Game.objects.create(season=season, game_number=1, home_team=tied_c, away_team=tied_b,
+                            home_team_score=61, away_team_score=60)
+        Game.objects.create(season=season, game_number=2, home_team=tied_a, away_team=last,
+                            home_team_score=90, away_team_score=40)
+
+        standings = compute_standings(Team.objects.filter(season=season))
+
+        assert [record.team_id for record in standings.records] == [leader.pk, tied_c.pk, tied_a.pk, tied_b.pk, last.pk]
+        assert standings.records[1].head_to_head_wins == 1
+        assert standings.records[2].point_differential == 50
+
+    def test_standings_can_be_pickled(self, league):
+        standings = compute_standings(Team.objects.all())
+
+        restored = pickle.loads(pickle.dumps(standings))
+        assert restored.records == standings.records
+
+    def test_retrieve_does_not_compute_standings(self, league, api_client, count_queries):
+        team = Team.objects.first()
+        with count_queries() as queries:
+            response = api_client.get(f"/api/bball/teams/{team.pk}/?season=1")
+
+        assert response.status_code == 200
+        assert response.data['name'] == team.name
+        assert not any('"api_game"' in sql for sql in queries.statements)
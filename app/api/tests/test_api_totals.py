@@ -0,0 +1,96 @@
+import pytest
+from io import StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+
+from api.models import Game, Player, PlayerStatistics, PlayerSeasonTotals, SUMMED_STAT_FIELDS
+
+
+def snapshot_totals():
+    return {
+        (row.player_id, row.season_id, row.phase): (row.games_played, *[getattr(row, f) for f in SUMMED_STAT_FIELDS])
+        for row in PlayerSeasonTotals.objects.all()
+        if row.games_played
+    }
+
+
+def rebuilt_totals():
+    PlayerSeasonTotals.objects.rebuild()
+    return snapshot_totals()
+
+
+@pytest.mark.django_db
+class TestPlayerSeasonTotals:
+    def test_totals_are_maintained_on_create(self, league):
+        regular_game = Game.objects.filter(playoff_game__isnull=True).first()
+        playoff_game = Game.objects.filter(playoff_game__isnull=False).first()
+        for player in Player.objects.all():
+            for game in (regular_game, playoff_game):
+                if not PlayerStatistics.objects.filter(player=player, game=game).exists():
+                    PlayerStatistics.objects.create(player=player, game=game, two_point_fg=3, assists=2)
+
+        maintained = snapshot_totals()
+        assert maintained == rebuilt_totals()
+
+    def test_totals_are_created_for_a_first_box_score(self, league):
+        player = Player.objects.first()
+        player.statistics.all().delete()
+        game = Game.objects.filter(playoff_game__isnull=True).first()
+
+        PlayerStatistics.objects.create(player=player, game=game, three_point_fg=2)
+
+        totals = PlayerSeasonTotals.objects.get(player=player, phase=PlayerSeasonTotals.REGULAR)
+        assert (totals.games_played, totals.three_point_fg) == (1, 2)
+
+    def test_totals_are_maintained_on_update_and_delete(self, league):
+        stat = PlayerStatistics.objects.filter(game__playoff_game__isnull=True).first()
+        stat.two_point_fg += 5
+        stat.assists = 0
+        stat.save()
+        PlayerStatistics.objects.filter(game__playoff_game__isnull=False).first().delete()
+
+        maintained = snapshot_totals()
+        assert maintained == rebuilt_totals()
+
+    def test_totals_follow_a_game_moved_to_the_playoffs(self, league):
+        game = Game.objects.filter(playoff_game__isnull=True).first()
+        game.playoff_game = Game.TTB
+        game.save()
+
+        maintained = snapshot_totals()
+        assert maintained == rebuilt_totals()
+
+    def test_deleting_a_player_removes_its_totals(self, league):
+        player = Player.objects.first()
+        player.delete()
+
+        assert not PlayerSeasonTotals.objects.filter(player_id=player.id).exists()
+
+    def test_upload_updates_totals(self, league, api_client):
+        player = Player.objects.first()
+        game = Game.objects.filter(game_number__isnull=False, player_statistics__player=player).first()
+        before = PlayerSeasonTotals.objects.get(player=player, phase=PlayerSeasonTotals.REGULAR)
+        existing = PlayerStatistics.objects.get(player=player, game=game)
+
+        header = "player,game,min,2pm,2pa,3pm,3pa,ftm,fta,or,dr,as,to,st,bs,pf,fd,pm,eff\n"
+        row = f"{player.name},{game.game_number},20:00,9,12,1,2,0,0,1,1,1,1,1,1,1,1,0,0\n"
+        response = api_client.post(
+            "/api/bball/upload-player-statistics/",
+            {"file": SimpleUploadedFile("stats.csv", (header + row).encode()), "season": 1},
+            format="multipart",
+        )
+
+        assert response.status_code == 201
+        after = PlayerSeasonTotals.objects.get(player=player, phase=PlayerSeasonTotals.REGULAR)
+        assert after.games_played == before.games_played
+        assert after.two_point_fg == before.two_point_fg - existing.two_point_fg + 9
+
+    def test_rebuild_command(self, league):
+        expected = snapshot_totals()
+        PlayerSeasonTotals.objects.all().delete()
+        out = StringIO()
+
+        call_command("rebuild_player_totals", "--season", "1", stdout=out)
+
+        assert "Rebuilt" in out.getvalue()
+        assert snapshot_totals() == expected
@@ -0,0 +1,367 @@
+import itertools
+import resource
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from api.models import (
+    Season, Team, Game, Player, PlayerStatistics, PlayerSeasonTotals, UploadBatch, SUMMED_STAT_FIELDS,
+)
+
+STATISTICS_HEADER = "player,game,min,2pm,2pa,3pm,3pa,ftm,fta,or,dr,as,to,st,bs,pf,fd,pm,eff\n"
+
+
+def statistics_row(player_name, game_reference, two_point_fg=1):
+    return f"{player_name},{game_reference},20:30,{two_point_fg},9,1,2,0,0,1,1,1,1,1,1,1,1,0,1.5\n"
+
+
+def upload_statistics(api_client, rows, season=1):
+    return api_client.post(
+        "/api/bball/upload-player-statistics/",
+        {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(rows)).encode()), "season": season},
+        format="multipart",
+    )
+
+
+def upload_roster(api_client, rows, season=1):
+    csv = "name,position,team,jersey_number\n" + "".join(rows)
+    return api_client.post(
+        "/api/bball/players-upload/",
+        {"csv_file": SimpleUploadedFile("roster.csv", csv.encode()), "season": season},
+        format="multipart",
+    )
+
+
+def totals_snapshot():
+    return {
+        (row.player_id, row.phase): (row.games_played, *[getattr(row, f) for f in SUMMED_STAT_FIELDS])
+        for row in PlayerSeasonTotals.objects.all()
+        if row.games_played
+    }
+
+
+@pytest.mark.django_db
+class TestUploadPlayerStatistics:
+    def box_score_rows(self, two_point_fg):
+        games = Game.objects.filter(season__number=1).select_related('home_team')
+        return [
+            statistics_row(player.name, game.playoff_game or game.game_number, two_point_fg)
+            for game in games
+            for player in Player.objects.filter(team=game.home_team)
+        ]
+
+    def test_upload_creates_and_updates_box_scores(self, league, api_client):
+        PlayerStatistics.objects.all().delete()
+        rows = self.box_score_rows(two_point_fg=2)
+
+        response = upload_statistics(api_client, rows)
+
+        assert response.status_code == 201
+        assert (response.data['inserted'], response.data['updated'], response.data['unchanged']) == (len(rows), 0, 0)
+        assert PlayerStatistics.objects.count() == len(rows)
+        box_score = PlayerStatistics.objects.first()
+        assert (box_score.minutes_played, box_score.two_point_fg, float(box_score.efficiency)) == (1230, 2, 1.5)
+
+        response = upload_statistics(api_client, self.box_score_rows(two_point_fg=5))
+
+        assert response.status_code == 201
+        assert (response.data['inserted'], response.data['updated'], response.data['unchanged']) == (0, len(rows), 0)
+        assert PlayerStatistics.objects.count() == len(rows)
+        assert set(PlayerStatistics.objects.values_list('two_point_fg', flat=True)) == {5}
+        maintained = totals_snapshot()
+        PlayerSeasonTotals.objects.rebuild()
+        assert maintained == totals_snapshot()
+
+    def test_identical_upload_is_a_no_op(self, league, api_client, count_queries):
+        rows = self.box_score_rows(two_point_fg=4)
+        first = upload_statistics(api_client, rows)
+
+        with count_queries() as queries:
+            response = upload_statistics(api_client, rows)
+
+        assert response.status_code == 200
+        assert response.data['already_uploaded']
+        assert response.data['updated'] == first.data['updated']
+        assert not any(sql.startswith(("INSERT", "UPDATE")) for sql in queries.statements)
+        # The same file is new to another season
+        assert upload_statistics(api_client, rows, season=2).status_code == 400
+
+    def test_upload_reverting_a_later_change_is_applied(self, league, api_client):
+        PlayerStatistics.objects.all().delete()
+        rows = self.box_score_rows(two_point_fg=4)
+        upload_statistics(api_client, rows)
+        upload_statistics(api_client, self.box_score_rows(two_point_fg=5))
+
+        response = upload_statistics(api_client, rows)
+
+        assert response.status_code == 201
+        assert response.data['updated'] == len(rows)
+        assert set(PlayerStatistics.objects.values_list('two_point_fg', flat=True)) == {4}
+        # Until the season changes again, the file is a repeat
+        assert upload_statistics(api_client, rows).data['already_uploaded']
+
+    def test_upload_after_a_change_in_the_admin_is_applied(self, league, api_client):
+        rows = self.box_score_rows(two_point_fg=4)
+        upload_statistics(api_client, rows)
+        box_score = PlayerStatistics.objects.first()
+        box_score.two_point_fg = 0
+        box_score.save()
+
+        response = upload_statistics(api_client, rows)
+
+        assert response.status_code == 201
+        assert PlayerStatistics.objects.get(pk=box_score.pk).two_point_fg == 4
+
+    def test_changed_upload_only_writes_changed_rows(self, league, api_client, count_queries):
+        rows = self.box_score_rows(two_point_fg=4)
+        upload_statistics(api_client, rows)
+        rows[0] = rows[0].replace(",20:30,4,", ",20:30,6,")
+        player_name = rows[0].split(",")[0]
+
+        with count_queries() as queries:
+            response = upload_statistics(api_client, rows)
+
+        assert response.status_code == 201
+        assert (response.data['inserted'], response.data['updated'], response.data['unchanged']) == (0, 1, len(rows) - 1)
+        upserts = [sql for sql in queries.statements if sql.startswith("INSERT INTO \"api_playerstatistics\"")]
+        assert len(upserts) == 1 and upserts[0].count("VALUES (") == 1
+        assert PlayerStatistics.objects.filter(player__name=player_name, two_point_fg=6).count() == 1
+        maintained = totals_snapshot()
+        PlayerSeasonTotals.objects.rebuild()
+        assert maintained == totals_snapshot()
+
+    def test_dry_run_reports_every_error_without_writing(self, league, api_client, count_queries):
+        player = Player.objects.first()
+        game = Game.objects.filter(game_number__isnull=False).first()
+        rows = [
+            statistics_row(player.name, game.game_number),
+            statistics_row("Nobody", game.game_number),
+            statistics_row(player.name, 999),
+            statistics_row(player.name, "SF2").replace(",9,", ",nine,"),
+            "Too,Short\n",
+            statistics_row("No One", "F"),
+        ]
+
+        with count_queries() as queries:
+            response = api_client.post(
+                "/api/bball/upload-player-statistics/?dry_run=true",
+                {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(rows)).encode()), "season": 1},
+                format="multipart",
+            )
+
+        assert response.status_code == 400
+        assert response.data['rows'] == 6
+        assert [(error['row'], error['error']) for error in response.data['errors']] == [
+            (3, "Player 'Nobody' not found"),
+            (4, "Game '999' not found"),
+            (5, "Invalid two_point_attempts 'nine'"),
+            (6, "Expected 19 columns, found 2"),
+            (7, "Player 'No One' not found"),
+            (7, "Game 'F' not found"),
+        ]
+        assert not any(sql.startswith(("INSERT", "UPDATE", "DELETE")) for sql in queries.statements)
+        assert len(queries) == 3
+
+    def test_dry_run_accepts_a_valid_file(self, league, api_client):
+        before = PlayerStatistics.objects.count()
+        response = api_client.post(
+            "/api/bball/upload-player-statistics/?dry_run=true",
+            {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + "".join(self.box_score_rows(9))).encode()),
+             "season": 1},
+            format="multipart",
+        )
+
+        assert response.status_code == 200
+        assert response.data['valid'] and response.data['errors'] == []
+        assert not PlayerStatistics.objects.filter(two_point_fg=9).exists()
+        assert PlayerStatistics.objects.count() == before
+
+    def test_query_count_does_not_grow_with_the_rows(self, league_factory, api_client, count_queries):
+        league_factory(teams=8, players_per_team=6)
+        rows = self.box_score_rows(two_point_fg=3)
+        assert len(rows) > 300
+
+        with count_queries() as few_queries:
+            upload_statistics(api_client, rows[:20])
+        with count_queries() as many_queries:
+            upload_statistics(api_client, rows)
+
+        # SQLite splits a bulk insert into statements of at most 999 parameters
+        assert len(many_queries) <= len(few_queries) + 2 * len(rows) // 50
+
+    def test_million_row_upload_streams_in_constant_memory(self, league, api_client, tmp_path):
+        """
+        The multipart body is written to disk and streamed in as the request
+        input, so the test itself never holds the file in memory either.
+        """
+        box_scores = [
+            (player.name, game.game_number)
+            for game in Game.objects.filter(season__number=1, game_number__isnull=False)
+            for player in Player.objects.filter(team=game.home_team)
+        ]
+        box_scores_before = PlayerStatistics.objects.count()
+        pairs = itertools.cycle(box_scores)
+        boundary = "StatisticsBoundary"
+        body = tmp_path / "body"
+        with open(body, "w", newline="") as f:
+            f.write(f'--{boundary}\r\nContent-Disposition: form-data; name="season"\r\n\r\n1\r\n')
+            f.write(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="stats.csv"\r\n'
+                    'Content-Type: text/csv\r\n\r\n')
+            f.write(STATISTICS_HEADER)
+            for number, (player_name, game_number) in zip(range(1_000_000), pairs):
+                f.write(statistics_row(player_name, game_number, two_point_fg=number % 7))
+            f.write(f"\r\n--{boundary}--\r\n")
+        size = body.stat().st_size
+        assert size > 50_000_000
+
+        peak_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        with open(body, "rb") as stream:
+            response = api_client.generic(
+                "POST", "/api/bball/upload-player-statistics/?async=false",
+                content_type=f"multipart/form-data; boundary={boundary}",
+                CONTENT_LENGTH=str(size),
+                **{"wsgi.input": stream},
+            )
+        peak_rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - peak_rss_before) * 1024
+
+        assert response.status_code == 201
+        assert PlayerStatistics.objects.count() == box_scores_before
+        # The last of the million rows for a player and game is the one stored
+        last_number = 1_000_000 - 1
+        player_name, game_number = box_scores[last_number % len(box_scores)]
+        assert PlayerStatistics.objects.get(
+            player__name=player_name, game__game_number=game_number
+        ).two_point_fg == last_number % 7
+        maintained = totals_snapshot()
+        PlayerSeasonTotals.objects.rebuild()
+        assert maintained == totals_snapshot()
+        # Reading the whole file would hold its bytes, their decoded text and a million lines at once
+        assert peak_rss_growth < size / 2
+
+    def test_every_missing_player_and_game_is_reported(self, league, api_client):
+        player = Player.objects.first()
+        game = Game.objects.filter(game_number__isnull=False).first()
+        before = PlayerStatistics.objects.filter(player=player, game=game).get().two_point_fg
+
+        response = upload_statistics(api_client, [
+            statistics_row(player.name, game.game_number, two_point_fg=before + 1),
+            statistics_row("Nobody", game.game_number),
+            statistics_row("No One", 999),
+            statistics_row(player.name, "SF2"),
+        ])
+
+        assert response.status_code == 400
+        assert response.data['missing_players'] == ["No One", "Nobody"]
+        assert response.data['missing_games'] == ["999", "SF2"]
+        assert PlayerStatistics.objects.get(player=player, game=game).two_point_fg == before
+
+    def test_invalid_value_reports_its_row(self, league, api_client):
+        player = Player.objects.first()
+        response = upload_statistics(api_client, [
+            statistics_row(player.name, 1),
+            statistics_row(player.name, 2).replace(",9,", ",nine,"),
+        ])
+
+        assert response.status_code == 400
+        assert response.data['row'] == 3
+
+    @pytest.mark.parametrize("row, error", [
+        (statistics_row("{}", 1, two_point_fg=-1), "Invalid two_point_fg -1: "),
+        (statistics_row("{}", 1).replace(",1.5\n", ",12345.6\n"), "Invalid efficiency 12345.6: "),
+        (statistics_row("{}", 1).replace(",1.5\n", ",1.555\n"), "Invalid efficiency 1.555: "),
+    ])
+    def test_values_the_database_cannot_store_are_rejected(self, league, api_client, row, error):
+        player = Player.objects.first()
+        row = row.replace("{}", player.name)
+        before = PlayerStatistics.objects.count()
+
+        dry_run = api_client.post(
+            "/api/bball/upload-player-statistics/?dry_run=true",
+            {"file": SimpleUploadedFile("stats.csv", (STATISTICS_HEADER + row).encode()), "season": 1},
+            format="multipart",
+        )
+        response = upload_statistics(api_client, [row])
+
+        assert dry_run.status_code == 400
+        assert dry_run.data['errors'][0]['error'].startswith(error)
+        assert response.status_code == 400
+        assert (response.data['row'], response.data['error'][:len(error)]) == (2, error)
+        assert PlayerStatistics.objects.count() == before
+
+
+@pytest.mark.django_db
+class TestUploadRoster:
+    def test_upload_creates_teams_and_players(self, api_client, count_queries):
+        rows = [f"Player {i},G,Team {i % 25},{i % 100}\n" for i in range(500)]
+
+        with count_queries() as queries:
+            response = upload_roster(api_client, rows, season=3)
+
+        assert response.status_code == 201
+        assert response.data == {'players_created': 500, 'players_updated': 0, 'players_unchanged': 0}
+        season = Season.objects.get(number=3)
+        assert Team.objects.filter(season=season).count() == 25
+        assert Player.objects.get(name="Player 26", season=season).team.name == "Team 1"
+        # One statement per batch of players or teams, not per row
+        assert len(queries) < 60
+
+    def test_upload_updates_existing_players(self, league, api_client):
+        player = Player.objects.filter(season__number=1).first()
+        team = Team.objects.filter(season__number=1).exclude(pk=player.team_id).first()
+
+        response = upload_roster(api_client, [
+            f"{player.name},C,{team.name},42\n",
+            "Rookie,F,Expansion Team,7\n",
+        ])
+
+        assert response.status_code == 201
+        assert response.data == {'players_created': 1, 'players_updated': 1, 'players_unchanged': 0}
+        player.refresh_from_db()
+        assert (player.position, player.jersey_number, player.team_id) == ("C", 42, team.pk)
+        assert Player.objects.get(name="Rookie").team.name == "Expansion Team"
+
+    def test_unchanged_players_are_not_counted_as_updated(self, league, api_client):
+        first, second = Player.objects.filter(season__number=1).select_related('team')[:2]
+
+        response = upload_roster(api_client, [
+            f"{first.name},{first.position},{first.team.name},{first.jersey_number}\n",
+            f"{second.name},{second.position},{second.team.name},{second.jersey_number + 50}\n",
+        ])
+
+        assert response.data == {'players_created': 0, 'players_updated': 1, 'players_unchanged': 1}
+
+    def test_concurrent_identical_upload_is_a_repeat(self, league, api_client, monkeypatch):
+        player = Player.objects.filter(season__number=1).select_related('team').first()
+        row = f"{player.name},{player.position},{player.team.name},{player.jersey_number + 50}\n"
+        upload_roster(api_client, [row])
+        # The other upload missed the batch as well, so this one inserts it a second time
+        UploadBatch.objects.update(data_version=None)
+        monkeypatch.setattr(UploadBatch.objects, 'update_or_create',
+                            lambda defaults, **lookup: UploadBatch.objects.create(**lookup, **defaults))
+
+        response = upload_roster(api_client, [row])
+
+        assert response.status_code == 200
+        assert response.data['already_uploaded'] is True
+        assert response.data['players_updated'] == 1
+
+    def test_every_invalid_row_is_reported_before_writing(self, api_client):
+        response = upload_roster(api_client, [
+            "Valid,G,Team A,1\n",
+            "No Number,G,Team A,\n",
+            "Bad Number,G,Team A,x\n",
+        ], season=4)
+
+        assert response.status_code == 400
+        assert [error['row'] for error in response.data['errors']] == [3, 4]
+        assert 'jersey_number' in response.data['errors'][0]['errors']
+        assert not Player.objects.filter(name="Valid").exists()
+
+    def test_team_name_from_another_season_is_rejected(self, league, api_client):
+        team = Team.objects.filter(season__number=1).first()
+
+        response = upload_roster(api_client, [f"Somebody,G,{team.name},5\n"], season=2)
+
+        assert response.status_code == 400
+        assert response.data['teams'] == [team.name]
+        assert not Player.objects.filter(name="Somebody").exists()
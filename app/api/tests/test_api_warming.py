@@ -0,0 +1,66 @@
+import logging
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from api.models import Team, Player
+from api.warming import warm_paths, warm_season
+
+
+def upload_roster(api_client, rows):
+    return api_client.post(
+        "/api/bball/players-upload/",
+        {"csv_file": SimpleUploadedFile("roster.csv", ("name,position,team,jersey_number\n" + rows).encode()),
+         "season": 1},
+        format="multipart",
+    )
+
+
+@pytest.fixture
+def warm_inline(settings):
+    settings.RESPONSE_CACHE_WARM_WORKERS = 0
+    settings.RESPONSE_CACHE_WARM_PATHS = [
+        "/api/bball/teams/", "/api/bball/teams/{team}/", "/api/bball/top-players/?fairness_adjusted=true",
+    ]
+
+
+@pytest.mark.django_db
+class TestWarming:
+    def test_paths_are_expanded_for_the_season(self, league, warm_inline):
+        team_ids = Team.objects.filter(season=league).order_by('pk').values_list('pk', flat=True)
+
+        assert warm_paths(1) == [
+            "/api/bball/teams/?season=1",
+            *[f"/api/bball/teams/{team_id}/?season=1" for team_id in team_ids],
+            "/api/bball/top-players/?fairness_adjusted=true&season=1",
+        ]
+
+    def test_upload_warms_the_season_after_commit(self, league, api_client, warm_inline, count_queries,
+                                                  django_capture_on_commit_callbacks):
+        player = Player.objects.filter(season=league).first()
+        with django_capture_on_commit_callbacks(execute=True):
+            response = upload_roster(api_client, f"{player.name},{player.position},{player.team.name},77\n")
+        assert response.status_code == 201
+
+        for path in warm_paths(1):
+            with count_queries() as queries:
+                response = api_client.get(path)
+            assert response.status_code == 200
+            assert len(queries) == 1, path
+
+    def test_repeated_upload_does_not_warm(self, league, api_client, warm_inline,
+                                           django_capture_on_commit_callbacks):
+        player = Player.objects.filter(season=league).first()
+        row = f"{player.name},{player.position},{player.team.name},77\n"
+        upload_roster(api_client, row)
+
+        with django_capture_on_commit_callbacks() as callbacks:
+            upload_roster(api_client, row)
+
+        assert callbacks == []
+
+    def test_duration_is_logged(self, league, warm_inline, caplog):
+        with caplog.at_level(logging.INFO, logger='api.warming'):
+            warm_season(1)
+
+        assert f"Warmed {len(warm_paths(1))} responses of season 1 in" in caplog.text
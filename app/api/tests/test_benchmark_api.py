@@ -0,0 +1,60 @@
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.cache import get_response_cache
+from api.management.commands.benchmark_api import ENDPOINTS, percentile
+
+
+def benchmark(*args):
+    out = StringIO()
+    call_command('benchmark_api', '--season', '1', '--iterations', '2', '--warmup', '0', *args, stdout=out)
+    return out.getvalue()
+
+
+def test_percentile_interpolates_between_samples():
+    samples = [4, 1, 3, 2]
+    assert percentile(samples, 0) == 1
+    assert percentile(samples, 50) == 2.5
+    assert percentile(samples, 100) == 4
+    assert percentile([7], 99) == 7
+
+
+@pytest.mark.django_db
+class TestBenchmarkApi:
+    def test_writes_a_baseline_for_every_endpoint(self, league, tmp_path):
+        path = tmp_path / 'baseline.json'
+        benchmark('--save-baseline', str(path))
+
+        baseline = json.loads(path.read_text())
+        assert baseline['dataset']['teams'] == 4
+        assert set(baseline['endpoints']) == {name for name, _, _ in ENDPOINTS}
+        for result in baseline['endpoints'].values():
+            assert 0 < result['p50_ms'] <= result['p95_ms'] <= result['p99_ms']
+            assert result['queries'] >= 1
+            assert result['bytes'] > 0
+        # The season's data version and the box score
+        assert baseline['endpoints']['player-statistics-detail']['rows'] == 2
+
+    def test_fails_when_queries_grow_past_the_baseline(self, league, tmp_path):
+        path = tmp_path / 'baseline.json'
+        benchmark('--endpoint', 'teams-list', '--save-baseline', str(path))
+        baseline = json.loads(path.read_text())
+
+        assert 'No regressions' in benchmark('--endpoint', 'teams-list', '--baseline', str(path),
+                                             '--threshold', '1000')
+
+        baseline['endpoints']['teams-list']['queries'] -= 1
+        path.write_text(json.dumps(baseline))
+        with pytest.raises(CommandError, match='teams-list: .* queries'):
+            benchmark('--endpoint', 'teams-list', '--baseline', str(path), '--threshold', '1000')
+
+    def test_uncached_runs_leave_the_shared_cache_alone(self, league):
+        response_cache = get_response_cache()
+        response_cache.set('other-worker', 'kept')
+
+        benchmark('--endpoint', 'teams-list')
+
+        assert response_cache.get('other-worker') == 'kept'
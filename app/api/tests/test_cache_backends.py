@@ -0,0 +1,147 @@
+import time
+import uuid
+
+import pytest
+from django.core.cache import caches
+
+from api.cache_backends import LocalInvalidationBus, TwoTierCache
+
+
+def worker_cache(channel, **options):
+    """A TwoTierCache with its own L1, as another worker process would have"""
+    return TwoTierCache(f'worker-{uuid.uuid4().hex}', {
+        'OPTIONS': {'SHARED_CACHE': 'shared', 'CHANNEL': channel, **options},
+    })
+
+
+@pytest.fixture
+def channel():
+    return f'test-{uuid.uuid4().hex}'
+
+
+@pytest.fixture
+def workers(channel):
+    return worker_cache(channel), worker_cache(channel)
+
+
+class StaleShared:
+    """A shared tier whose reads return what it held before, as a read that raced a write would"""
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def get(self, key, version=None):
+        return self.entry
+
+
+class TestTwoTierCache:
+    def test_reads_are_served_from_process_memory(self, workers):
+        first, second = workers
+        first.set('leaders', {'points': [1, 2]})
+
+        assert second.get('leaders') == {'points': [1, 2]}
+        # Gone from the shared tier without a broadcast, the workers still have their copies
+        caches['shared'].delete('leaders')
+        assert first.get('leaders') == second.get('leaders') == {'points': [1, 2]}
+
+    def test_writes_invalidate_the_other_workers(self, workers):
+        first, second = workers
+        first.set('leaders', 'old')
+        assert second.get('leaders') == 'old'
+
+        first.set('leaders', 'new')
+        assert second.get('leaders') == 'new'
+
+        first.delete('leaders')
+        assert second.get('leaders') is None
+
+    def test_fill_that_raced_a_write_is_not_kept(self, workers, monkeypatch):
+        first, second = workers
+        first.set('leaders', 'old')
+        old_entry = caches['shared'].get('leaders')
+        first.set('leaders', 'new')
+
+        # The read started before the write, and finished after its broadcast
+        with monkeypatch.context() as patch:
+            patch.setattr(second, 'shared', StaleShared(old_entry))
+            assert second.get('leaders') == 'old'
+
+        assert second.get('leaders') == 'new'
+
+    def test_fill_that_raced_a_delete_is_not_kept(self, workers, monkeypatch):
+        first, second = workers
+        first.set('leaders', 'old')
+        old_entry = caches['shared'].get('leaders')
+        first.delete('leaders')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(second, 'shared', StaleShared(old_entry))
+            second.get('leaders')
+
+        assert second.get('leaders') is None
+
+    def test_only_replacing_or_removing_an_entry_is_broadcast(self, workers, channel):
+        first, _ = workers
+        messages = []
+        LocalInvalidationBus(channel, {}).subscribe(messages.append)
+
+        first.set('leaders', 'first')
+        first.add('lock', 1)
+        first.delete('missing')
+        assert messages == []
+
+        first.set('leaders', 'second')
+        first.delete('lock')
+        assert [message.rsplit(':', 1)[1] for message in messages] == ['leaders', 'lock']
+
+    def test_clear_empties_every_worker(self, workers):
+        first, second = workers
+        first.set('leaders', 'cached')
+        second.get('leaders')
+
+        first.clear()
+
+        assert second.get('leaders', 'missing') == 'missing'
+
+    def test_local_tier_is_bounded(self):
+        cache = worker_cache(f'test-{uuid.uuid4().hex}', LOCAL_MAX_ENTRIES=2)
+        for key in ['a', 'b', 'c']:
+            cache.set(key, key)
+
+        assert list(cache.local.entries) == [cache.make_key('b'), cache.make_key('c')]
+        # Evicted from process memory only
+        assert cache.get('a') == 'a'
+
+    def test_values_are_copies(self, workers):
+        first, _ = workers
+        first.set('leaders', {'points': [1]})
+        first.get('leaders')['points'].append(2)
+
+        assert first.get('leaders') == {'points': [1]}
+
+    def test_zero_timeout_is_not_kept_locally(self, workers):
+        first, _ = workers
+        first.set('leaders', 'cached', timeout=0)
+
+        assert first.get('leaders') is None
+
+    def test_local_copy_does_not_outlive_the_shared_entry(self, workers):
+        first, second = workers
+        first.set('leaders', 'expiring', timeout=0.2)
+        assert second.get('leaders') == 'expiring'
+
+        time.sleep(0.3)
+
+        assert first.get('leaders') is None
+        assert second.get('leaders') is None
+
+    def test_touch_and_incr_keep_the_expiry_in_step(self, workers):
+        first, second = workers
+        first.set('hits', 1, timeout=0.2)
+        assert first.touch('hits', timeout=None)
+        assert first.incr('hits') == 2
+
+        time.sleep(0.3)
+
+        assert second.get('hits') == 2
+        assert not first.touch('missing')
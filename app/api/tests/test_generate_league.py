@@ -0,0 +1,72 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F, Q, Sum
+
+from api.models import Game, Player, PlayerStatistics, PlayerSeasonTotals, Season, Team, SUMMED_STAT_FIELDS
+
+
+def generate(*args):
+    out = StringIO()
+    call_command('generate_league', '--teams', '4', '--players', '5', '--games', '6', *args, stdout=out)
+    return out.getvalue()
+
+
+def league_snapshot(season):
+    return (
+        list(Team.objects.filter(season=season).order_by('name').values_list('name', 'wins', 'losses')),
+        list(Game.objects.filter(season=season).order_by('date', 'pk')
+             .values_list('home_team__name', 'away_team__name', 'home_team_score', 'away_team_score', 'playoff_game')),
+        list(PlayerStatistics.objects.filter(game__season=season).order_by('game__date', 'game_id', 'player__name')
+             .values_list('player__name', *SUMMED_STAT_FIELDS)),
+    )
+
+
+@pytest.mark.django_db
+class TestGenerateLeague:
+    def test_generates_a_consistent_league(self):
+        output = generate('--seed', '1')
+        season = Season.objects.latest('number')
+
+        assert f'Generated 1 season(s) starting at season {season.number}' in output
+        assert Team.objects.filter(season=season).count() == 4
+        assert Player.objects.filter(season=season).count() == 20
+        assert Game.objects.filter(season=season, playoff_game__isnull=True).count() == 12
+        # 4 team bracket: two semi finals and a final
+        assert Game.objects.filter(season=season, playoff_game__isnull=False).count() == 3
+        for team in Team.objects.filter(season=season):
+            assert team.wins + team.losses == 6 + Game.objects.filter(
+                Q(home_team=team) | Q(away_team=team), playoff_game__isnull=False).count()
+
+        for game in Game.objects.filter(season=season):
+            assert game.home_team_score != game.away_team_score
+            assert game.winner_id == (game.home_team_id if game.home_team_score > game.away_team_score
+                                      else game.away_team_id)
+            home_points = game.player_statistics.filter(player__team=game.home_team).aggregate(
+                points=Sum(2 * F('two_point_fg') + 3 * F('three_point_fg') + F('free_throw_fg')))['points']
+            assert home_points == game.home_team_score
+
+        generated = {
+            (row.player_id, row.phase): (row.games_played, *[getattr(row, f) for f in SUMMED_STAT_FIELDS])
+            for row in PlayerSeasonTotals.objects.all()
+        }
+        PlayerSeasonTotals.objects.rebuild()
+        assert generated == {
+            (row.player_id, row.phase): (row.games_played, *[getattr(row, f) for f in SUMMED_STAT_FIELDS])
+            for row in PlayerSeasonTotals.objects.all()
+        }
+
+    def test_same_seed_generates_the_same_league(self):
+        generate('--seed', '7')
+        generate('--seed', '7')
+        first, second = Season.objects.order_by('-number')[:2][::-1]
+        first_snapshot, second_snapshot = league_snapshot(first), league_snapshot(second)
+        # Team and player names carry the season number
+        assert [row[1:] for row in first_snapshot[0]] == [row[1:] for row in second_snapshot[0]]
+        assert [row[2:] for row in first_snapshot[1]] == [row[2:] for row in second_snapshot[1]]
+        assert [row[1:] for row in first_snapshot[2]] == [row[1:] for row in second_snapshot[2]]
+
+    def test_requires_enough_teams(self):
+        with pytest.raises(CommandError):
+            call_command('generate_league', '--teams', '1', stdout=StringIO())
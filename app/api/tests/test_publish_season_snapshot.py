@@ -0,0 +1,97 @@
+import gzip
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from api.archive import archive_season, unarchive_season
+from api.management.commands.publish_season_snapshot import brotli
+from api.models import Team, Player, Game
+
+
+def publish(output, *args):
+    out = StringIO()
+    call_command('publish_season_snapshot', '1', '--output', str(output), '--force', *args, stdout=out)
+    return out.getvalue()
+
+
+def snapshot(output, path, suffix=''):
+    return (output / 'season-1' / path.strip('/') / f'index.json{suffix}').read_bytes()
+
+
+@pytest.mark.django_db
+class TestPublishSeasonSnapshot:
+    def test_every_read_endpoint_is_published(self, league, api_client, tmp_path):
+        output = publish(tmp_path)
+
+        paths = [
+            "/api/bball/teams/", "/api/bball/players/", "/api/bball/games/", "/api/bball/player-statistics/",
+            "/api/bball/top-players/", "/api/bball/playoffs/", "/api/bball/playoffs-top-players/",
+            *[f"/api/bball/teams/{pk}/" for pk in Team.objects.values_list('pk', flat=True)],
+            *[f"/api/bball/players/{pk}/" for pk in Player.objects.values_list('pk', flat=True)],
+            *[f"/api/bball/games/{pk}/" for pk in Game.objects.values_list('pk', flat=True)],
+        ]
+        for path in paths:
+            expected = api_client.get(path + "?season=1").json()
+            assert json.loads(snapshot(tmp_path, path)) == expected, path
+            assert json.loads(gzip.decompress(snapshot(tmp_path, path, '.gz'))) == expected, path
+        assert f"to {tmp_path / 'season-1'}" in output
+
+    @pytest.mark.skipif(brotli is None, reason="brotli is not installed")
+    def test_brotli_encoding_is_published(self, league, tmp_path):
+        publish(tmp_path)
+
+        assert brotli.decompress(snapshot(tmp_path, "/api/bball/teams/", '.br')) == snapshot(
+            tmp_path, "/api/bball/teams/")
+
+    def test_republishing_replaces_the_snapshot(self, league, tmp_path):
+        publish(tmp_path)
+        team = Team.objects.order_by('pk').last()
+        Game.objects.filter(home_team=team).delete()
+        Game.objects.filter(away_team=team).delete()
+        team.delete()
+
+        publish(tmp_path)
+
+        assert not (tmp_path / 'season-1' / 'api' / 'bball' / 'teams' / str(team.pk)).exists()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ['season-1']
+
+    def test_remove_deletes_the_snapshot(self, league, tmp_path):
+        publish(tmp_path)
+
+        publish(tmp_path, '--remove')
+
+        assert not (tmp_path / 'season-1').exists()
+
+    def test_unknown_season_is_rejected(self, tmp_path):
+        with pytest.raises(CommandError, match='Season 7 does not exist'):
+            call_command('publish_season_snapshot', '7', '--output', str(tmp_path))
+
+    def test_open_season_needs_force(self, league, tmp_path):
+        with pytest.raises(CommandError, match='Season 1 is not archived'):
+            call_command('publish_season_snapshot', '1', '--output', str(tmp_path))
+
+        assert not (tmp_path / 'season-1').exists()
+
+    def test_change_removes_the_snapshot(self, league, tmp_path, settings):
+        settings.SEASON_SNAPSHOT_ROOT = str(tmp_path)
+        publish(tmp_path)
+
+        player = Player.objects.filter(season=league).first()
+        player.name = "Renamed"
+        player.save()
+
+        assert not (tmp_path / 'season-1').exists()
+
+    def test_archived_season_is_published_until_unarchived(self, league, tmp_path, settings):
+        settings.SEASON_SNAPSHOT_ROOT = str(tmp_path)
+        settings.SEASON_ARCHIVE_PATHS = ["/api/bball/teams/"]
+        archive_season(league)
+        call_command('publish_season_snapshot', '1', stdout=StringIO())
+        assert (tmp_path / 'season-1').exists()
+
+        unarchive_season(league)
+
+        assert not (tmp_path / 'season-1').exists()
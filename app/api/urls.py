@@ -2,7 +2,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import TeamViewSet, PlayerViewSet, GameViewSet, PlayerStatisticsViewSet, PlayerCSVUploadViewSet, UploadPlayerStatisticsViewSet
-from .views import TopPlayersViewSet, PlayoffTeamsViewSet, TopPlayoffsPlayersViewSet
+from .views import TopPlayersViewSet, PlayoffTeamsViewSet, TopPlayoffsPlayersViewSet, IngestJobViewSet
+from .views import CacheStatsViewSet
 
 router = DefaultRouter()
 router.register(r'teams', TeamViewSet, basename='teams')
@@ -11,6 +12,8 @@ router.register(r'games', GameViewSet, basename='games')
 router.register(r'player-statistics', PlayerStatisticsViewSet, basename='player-statistics')
 router.register(r'players-upload', PlayerCSVUploadViewSet, basename='player-csv-upload')
 router.register(r'upload-player-statistics', UploadPlayerStatisticsViewSet, basename='csv-upload-player-statistics')
+router.register(r'ingest-jobs', IngestJobViewSet, basename='ingest-jobs')
+router.register(r'cache-stats', CacheStatsViewSet, basename='cache-stats')
 router.register(r'top-players', TopPlayersViewSet, basename='top-players')
 
 router.register(r'playoffs', PlayoffTeamsViewSet, basename='playoffs')
@@ -1,12 +1,21 @@
 # views.py
 from rest_framework import viewsets
-from .models import Season, Team, Player, Game, PlayerStatistics
+from .models import Season, Team, Player, Game, PlayerStatistics, PlayerSeasonTotals, IngestJob
 from .serializers import TeamDetailSerializer, TeamSerializer, PlayerSerializer, GameSerializer, GameWithStatsSerializer
-from .serializers import PlayerStatisticsSerializer, PlayerCSVSerializer, TeamWithGamesSerializer
-from .serializers import PlayerPlayoffsSerializer, TeamStandingsSerializer
+from .serializers import PlayerStatisticsSerializer, TeamWithGamesSerializer
+from .serializers import PlayerPlayoffsSerializer, TeamStandingsSerializer, IngestJobSerializer
+from .standings import compute_standings
+from .leaderboards import MIN_GAMES_PLAYED_RATIO, leaderboard_data, leaderboards, parse_categories, parse_limit
+from .ingest import IngestError, check_season_not_archived, ingest_upload, validate_box_scores
+from .jobs import fail_stale_ingest_jobs, start_ingest_job
+from .cache import get_stats, season_cached
+from .renderers import ColumnarRenderer
 from rest_framework.decorators import action
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Prefetch
+from django.urls import reverse
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 
@@ -18,7 +27,7 @@ from django.views.decorators.csrf import csrf_exempt
 
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-import csv
+from rest_framework.settings import api_settings
 
 class PlayoffTeamsViewSet(viewsets.ModelViewSet):
     serializer_class = GameSerializer
@@ -29,7 +38,7 @@ class PlayoffTeamsViewSet(viewsets.ModelViewSet):
         # Get the season from query parameters
         season_number = self.request.query_params.get('season', 1)
         # Start with the base queryset
-        queryset = Game.objects.exclude(game_number__isnull=False).order_by('date')
+        queryset = Game.objects.exclude(game_number__isnull=False).order_by('date').with_teams()
         
         # Filter by season if provided
         if season_number:
@@ -37,54 +46,67 @@ class PlayoffTeamsViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    @season_cached
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class PlayerCSVUploadViewSet(viewsets.ViewSet):
+    @season_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class IngestUploadMixin:
+    """
+    Runs an upload within the request, or as a background IngestJob when sent
+    with async=true or, unless sent with async=false, when the file is at
+    least settings.INGEST_ASYNC_THRESHOLD bytes
+    """
+    ingest_kind = None
+
+    def run_upload(self, request, uploaded_file, season_number):
+        run_async = (request.query_params.get('async') or request.data.get('async') or '').lower()
+        if run_async == 'true' or (run_async != 'false' and uploaded_file.size >= settings.INGEST_ASYNC_THRESHOLD):
+            # Rejected here rather than as a failed job
+            try:
+                check_season_not_archived(season_number)
+            except IngestError as e:
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+            job = start_ingest_job(self.ingest_kind, season_number, uploaded_file)
+            return Response(
+                IngestJobSerializer(job).data,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': reverse('api:ingest-jobs-detail', args=[job.pk])},
+            )
+
+        with transaction.atomic():
+            try:
+                body = ingest_upload(self.ingest_kind, season_number, uploaded_file)
+            except IngestError as e:
+                transaction.set_rollback(True)
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+        if body.get('already_uploaded'):
+            return Response(body, status=status.HTTP_200_OK)
+        return Response(body, status=status.HTTP_201_CREATED)
+
+
+class ColumnarListMixin:
+    """Lists can also be rendered with ?format=columnar, side-loading the columnar_included fields"""
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer]
+    columnar_included = {}
+
+
+class PlayerCSVUploadViewSet(IngestUploadMixin, viewsets.ViewSet):
     permission_classes = []
+    ingest_kind = IngestJob.ROSTER
 
     def create(self, request):
         csv_file = request.FILES.get('csv_file')
         season_number = request.data.get('season')  # Get season from request data
-        if not csv_file.name.endswith('.csv'):
+        if not csv_file or not csv_file.name.endswith('.csv'):
             return Response({'error': 'Invalid file format. Please upload a CSV file.'}, status=400)
+        if not season_number:
+            return Response({'error': 'Season number is required'}, status=400)
 
-        players_created = 0
-        players_updated = 0
-
-        decoded_file = csv_file.read().decode('utf-8').splitlines()
-        csv_reader = csv.DictReader(decoded_file)
-
-        season = None
-        if season_number:
-            season, created = Season.objects.get_or_create(number=season_number)
-        else:
-            raise ValueError('Season number is required')
-        
-        for row in csv_reader:
-            serializer = PlayerCSVSerializer(data=row)
-            if serializer.is_valid():
-                data = serializer.validated_data
-                team_name = data.pop('team')
-
-                # Get or create the team
-                team, created = Team.objects.get_or_create(name=team_name, season=season)
-
-                # Update or create the player with the associated team and season
-                player, created = Player.objects.update_or_create(
-                    name=data['name'],
-                    season=season,
-                    defaults={**data, 'team': team}
-                )
-                
-                if created:
-                    players_created += 1
-                else:
-                    players_updated += 1
-            else:
-                return Response(serializer.errors, status=400)
-
-        return Response({'players_created': players_created, 'players_updated': players_updated}, status=201)
+        return self.run_upload(request, csv_file, season_number)
 
 
 class TeamViewSet(viewsets.ModelViewSet):
@@ -94,35 +116,28 @@ class TeamViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         season_number = self.request.query_params.get('season', 1)
         if season_number:
-            teams = Team.objects.filter(season__number=season_number).distinct()
-        else:
-            teams = Team.objects.all()
-        
-        # Sort teams with head-to-head tiebreaker
-        return sorted(teams, key=lambda team: self._get_team_sort_key(team, teams), reverse=True)
-
-    def _get_team_sort_key(self, team, all_teams):
-        """
-        Create a sort key for a team that considers:
-        1. Wins (primary)
-        2. Losses (secondary, lower is better)
-        3. Head-to-head record against tied teams (tiebreaker)
-        """
-        # Primary sort: wins (higher is better)
-        wins = team.wins
-        
-        # Secondary sort: losses (lower is better, so we negate it)
-        losses = -team.losses
-        
-        # Find teams with the same win-loss record for head-to-head comparison
-        tied_teams = [t for t in all_teams if t.wins == team.wins and t.losses == team.losses and t != team]
-        
-        # Calculate head-to-head wins against tied teams
-        head_to_head_wins = sum(team.get_head_to_head_wins(tied_team) for tied_team in tied_teams)
-        
-        # Return a tuple for sorting: (wins, -losses, head_to_head_wins)
-        # This ensures teams are sorted by wins first, then by fewer losses, then by head-to-head wins
-        return (wins, losses, head_to_head_wins)
+            return Team.objects.filter(season__number=season_number).distinct()
+        return Team.objects.all()
+
+    @season_cached
+    def list(self, request, *args, **kwargs):
+        # Standings are only computed for the list; retrieve looks up the single team
+        teams = list(self.filter_queryset(self.get_queryset()).with_game_counts())
+        standings = compute_standings(teams)
+        self.head_to_head = standings.head_to_head
+
+        serializer = self.get_serializer(standings.order(teams), many=True)
+        return Response(serializer.data)
+
+    @season_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if hasattr(self, 'head_to_head'):
+            context['head_to_head'] = self.head_to_head
+        return context
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -131,233 +146,165 @@ class TeamViewSet(viewsets.ModelViewSet):
             return TeamStandingsSerializer
         return TeamWithGamesSerializer
     
-class PlayerViewSet(viewsets.ModelViewSet):
+class PlayerViewSet(ColumnarListMixin, viewsets.ModelViewSet):
     serializer_class = PlayerSerializer
+    columnar_included = {'team': 'teams'}
     permission_classes = []
     http_method_names = ['get']
 
     def get_queryset(self):
         season_number = self.request.query_params.get('season', 1)
         if season_number:
-            return Player.objects.filter(season__number=season_number)
-        return Player.objects.all()
+            return Player.objects.filter(season__number=season_number).with_season_totals()
+        return Player.objects.with_season_totals()
 
+    @season_cached
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class GameViewSet(viewsets.ModelViewSet):
+    @season_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class GameViewSet(ColumnarListMixin, viewsets.ModelViewSet):
     serializer_class = GameWithStatsSerializer
+    columnar_included = {'home_team': 'teams', 'away_team': 'teams', 'winner': 'teams', 'player': 'players'}
     permission_classes = []
     http_method_names = ['get']
 
     def get_queryset(self):
         season_number = self.request.query_params.get('season', 1)
+        queryset = Game.objects.with_teams().prefetch_related(
+            Prefetch('player_statistics', queryset=PlayerStatistics.objects.select_related('player'))
+        )
         if season_number:
-            return Game.objects.filter(season__number=season_number).order_by('-date')
-        return Game.objects.all().order_by('-date')
+            return queryset.filter(season__number=season_number).order_by('-date')
+        return queryset.order_by('-date')
 
+    @season_cached
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-class PlayerStatisticsViewSet(viewsets.ModelViewSet):
+    @season_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class PlayerStatisticsViewSet(ColumnarListMixin, viewsets.ModelViewSet):
     serializer_class = PlayerStatisticsSerializer
+    columnar_included = {'player': 'players'}
     permission_classes = []
     http_method_names = ['get']
 
     def get_queryset(self):
         season_number = self.request.query_params.get('season', 1)
+        queryset = PlayerStatistics.objects.select_related('player')
         if season_number:
-            return PlayerStatistics.objects.filter(game__season__number=season_number).exclude(game__playoff_game__isnull=True)
-        return PlayerStatistics.objects.exclude(game__playoff_game__isnull=True)
+            return queryset.filter(game__season__number=season_number).exclude(game__playoff_game__isnull=True)
+        return queryset.exclude(game__playoff_game__isnull=True)
 
+    @season_cached
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
+    @season_cached
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
-class UploadPlayerStatisticsViewSet(viewsets.ViewSet):
+class UploadPlayerStatisticsViewSet(IngestUploadMixin, viewsets.ViewSet):
     permission_classes = []
     parser_classes = [MultiPartParser, FormParser]
+    ingest_kind = IngestJob.BOX_SCORES
 
-    def parse_minutes_played(self, time_str):
-        if isinstance(time_str, str) and ":" in time_str:
-            minutes, seconds = map(int, time_str.split(":"))
-            return minutes * 60 + seconds
-        return 0  # default fallback
-    
-    @transaction.atomic
     def create(self, request):
         file_obj = request.FILES.get('file')
         season_number = request.data.get('season')  # Get season from request data
         if not file_obj:
             return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        if not season_number:
+            return Response({'error': 'Season number is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-        decoded_file = file_obj.read().decode('utf-8').splitlines()
+        if request.query_params.get('dry_run', '').lower() == 'true':
+            try:
+                report = validate_box_scores(season_number, file_obj)
+            except IngestError as e:
+                return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
+            return Response(report, status=status.HTTP_200_OK if report['valid'] else status.HTTP_400_BAD_REQUEST)
 
-        csv_reader = csv.reader(decoded_file)
-        next(csv_reader)  # Skip header 
-        
-        season = None
-        if season_number:
-            season, created = Season.objects.get_or_create(number=season_number)
-        else:
-            raise ValueError('Season number is required')
+        return self.run_upload(request, file_obj, season_number)
 
-        for row in csv_reader:
 
-            player_name, game_number, minutes_played, two_point_fg, two_point_attempts, \
-            three_point_fg, three_point_attempts, free_throw_fg, free_throw_attempts, \
-            offensive_rebounds, defensive_rebounds, assists, turnovers, \
-            steals, blocks, fouls, fouls_drawn, plus_minus, efficiency = row
+class IngestJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status and progress of uploads processed as IngestJobs"""
+    serializer_class = IngestJobSerializer
+    permission_classes = []
+    queryset = IngestJob.objects.order_by('-created_at')
 
-            if not game_number:
-                continue  # Skip entry if game number is blank
-            
-            player_name = player_name.strip()
+    def get_queryset(self):
+        fail_stale_ingest_jobs()
+        return super().get_queryset()
 
-            try:
-                player = Player.objects.get(name=player_name, season=season)
-            except Player.DoesNotExist:
-                return Response({
-                    'error': "Player not found at row",
-                    'player_name': player_name,
-                    'season': season_number
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-            if isinstance(game_number, str) and ("F" in game_number or "TTB" in game_number):
-                game = Game.objects.get(playoff_game=game_number, season=season)
-            else:
-                game = Game.objects.get(game_number=game_number, season=season)
-
-            minutes_played = self.parse_minutes_played(minutes_played)
-
-            # Create player statistics
-            PlayerStatistics.objects.update_or_create(
-                player=player,
-                game=game,
-                defaults={
-                    'minutes_played': minutes_played,
-                    'two_point_fg': two_point_fg,
-                    'two_point_attempts': two_point_attempts,
-                    'three_point_fg': three_point_fg,
-                    'three_point_attempts': three_point_attempts,
-                    'free_throw_fg': free_throw_fg,
-                    'free_throw_attempts': free_throw_attempts,
-                    'defensive_rebounds': defensive_rebounds,
-                    'offensive_rebounds': offensive_rebounds,
-                    'assists': assists,
-                    'turnovers': turnovers,
-                    'steals': steals,
-                    'blocks': blocks,
-                    'fouls': fouls,
-                    'fouls_drawn': fouls_drawn,
-                    'plus_minus': plus_minus,
-                    'efficiency': efficiency,
-                }
-            )
 
-        return Response({'message': 'CSV file uploaded successfully'}, status=status.HTTP_201_CREATED)
+class CacheStatsViewSet(viewsets.ViewSet):
+    """Response cache counters of the worker that serves the request"""
+    permission_classes = []
+
+    def list(self, request):
+        return Response(get_stats())
 
 
 class TopPlayersViewSet(viewsets.ViewSet):
     permission_classes = []
+    phase = PlayerSeasonTotals.REGULAR
+
+    serializer_classes = {
+        PlayerSeasonTotals.REGULAR: PlayerSerializer,
+        PlayerSeasonTotals.PLAYOFF: PlayerPlayoffsSerializer,
+    }
 
+    @season_cached
     def list(self, request):
         season_number = request.query_params.get('season', 1)
         use_fairness_adjusted = request.query_params.get('fairness_adjusted', 'false').lower() == 'true'
-        
+        include_playoffs = (self.phase == PlayerSeasonTotals.REGULAR and
+                            request.query_params.get('include_playoffs', 'false').lower() == 'true')
+        try:
+            categories = parse_categories(request.query_params.get('categories'))
+            limit = parse_limit(request.query_params.get('limit'))
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
         if season_number:
             players = Player.objects.filter(season__number=season_number)  # Filter by season
         else:
             players = Player.objects.all()  # Fetch all players
 
-        # If not using fairness-adjusted stats, filter players who played at least 75% of team games
-        if not use_fairness_adjusted:
-            players = [p for p in players if p.games_played_ratio >= 0.75]
-
-        # Sort players based on different statistics using lambda functions
-        if use_fairness_adjusted:
-            # Use fairness-adjusted statistics that consider team's total games played
-            top_points_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_points_per_game)[:10]
-            top_rebounds_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_rebounds_per_game)[:10]
-            top_assists_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_assists_per_game)[:10]
-            top_three_points_made = sorted(players, key=lambda p: -p.total_three_point_fg)[:10]  # Total 3PM doesn't need adjustment
-            top_blocks_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_blocks_per_game)[:10]
-            top_steals_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_steals_per_game)[:10]
-        else:
-            # Use original per-game statistics (player's games played only)
-            top_points_per_game = sorted(players, key=lambda p: -p.average_points_per_game)[:10]
-            top_rebounds_per_game = sorted(players, key=lambda p: -p.average_rebounds_per_game)[:10]
-            top_assists_per_game = sorted(players, key=lambda p: -p.average_assists_per_game)[:10]
-            top_three_points_made = sorted(players, key=lambda p: -p.total_three_point_fg)[:10]
-            top_blocks_per_game = sorted(players, key=lambda p: -p.average_blocks_per_game)[:10]
-            top_steals_per_game = sorted(players, key=lambda p: -p.average_steals_per_game)[:10]
-
-        data = {
-            'top_points_per_game': PlayerSerializer(top_points_per_game, many=True).data,
-            'top_rebounds_per_game': PlayerSerializer(top_rebounds_per_game, many=True).data,
-            'top_assists_per_game': PlayerSerializer(top_assists_per_game, many=True).data,
-            'top_three_points_made': PlayerSerializer(top_three_points_made, many=True).data,
-            'top_blocks_per_game': PlayerSerializer(top_blocks_per_game, many=True).data,
-            'top_steals_per_game': PlayerSerializer(top_steals_per_game, many=True).data,
-            'fairness_adjusted': use_fairness_adjusted,
-            'min_games_played_ratio': 0.75 if not use_fairness_adjusted else None,
-            'filtering_info': {
-                'fairness_adjusted': use_fairness_adjusted,
-                'min_games_played_ratio': 0.75 if not use_fairness_adjusted else None,
-                'description': 'When fairness_adjusted=false, only players who played at least 75% of their team\'s games are included to ensure data quality.'
-            }
-        }
+        # Both phases are ranked in the same statement when the playoff leaders are included
+        phases = [self.phase, PlayerSeasonTotals.PLAYOFF] if include_playoffs else [self.phase]
+        leaders = leaderboards(players, phases=phases, fairness_adjusted=use_fairness_adjusted,
+                               categories=categories, limit=limit)
 
+        data = self.get_leaderboard_data(self.phase, categories, leaders, use_fairness_adjusted)
+        if include_playoffs:
+            data['playoffs'] = self.get_leaderboard_data(
+                PlayerSeasonTotals.PLAYOFF, categories, leaders, use_fairness_adjusted
+            )
         return Response(data)
 
-class TopPlayoffsPlayersViewSet(viewsets.ViewSet):
-    permission_classes = []
-
-    def list(self, request):
-        season_number = request.query_params.get('season', 1)
-        use_fairness_adjusted = request.query_params.get('fairness_adjusted', 'false').lower() == 'true'
-        
-        if season_number:
-            players = Player.objects.filter(season__number=season_number)
-        else:
-            players = Player.objects.all()
-
-        # If not using fairness-adjusted stats, filter players who played at least 75% of team playoff games
-        if not use_fairness_adjusted:
-            players = [p for p in players if p.playoff_games_played_ratio >= 0.75]
-
-        # Sort players based on different statistics using lambda functions
-        if use_fairness_adjusted:
-            # Use fairness-adjusted playoff statistics that consider team's total playoff games played
-            top_points_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_playoff_points_per_game)[:10]
-            top_rebounds_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_playoff_rebounds_per_game)[:10]
-            top_assists_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_playoff_assists_per_game)[:10]
-            top_three_points_made = sorted(players, key=lambda p: -p.total_playoff_three_point_fg)[:10]  # Total playoff 3PM doesn't need adjustment
-            top_blocks_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_playoff_blocks_per_game)[:10]
-            top_steals_per_game = sorted(players, key=lambda p: -p.fairness_adjusted_playoff_steals_per_game)[:10]
-        else:
-            # Use original playoff per-game statistics (player's playoff games played only)
-            top_points_per_game = sorted(players, key=lambda p: -p.average_playoff_points_per_game)[:10]
-            top_rebounds_per_game = sorted(players, key=lambda p: -p.average_playoff_rebounds_per_game)[:10]
-            top_assists_per_game = sorted(players, key=lambda p: -p.average_playoff_assists_per_game)[:10]
-            top_three_points_made = sorted(players, key=lambda p: -p.total_playoff_three_point_fg)[:10]
-            top_blocks_per_game = sorted(players, key=lambda p: -p.average_playoff_blocks_per_game)[:10]
-            top_steals_per_game = sorted(players, key=lambda p: -p.average_playoff_steals_per_game)[:10]
-
-        data = {
-            'top_points_per_game': PlayerPlayoffsSerializer(top_points_per_game, many=True).data,
-            'top_rebounds_per_game': PlayerPlayoffsSerializer(top_rebounds_per_game, many=True).data,
-            'top_assists_per_game': PlayerPlayoffsSerializer(top_assists_per_game, many=True).data,
-            'top_three_points_made': PlayerPlayoffsSerializer(top_three_points_made, many=True).data,
-            'top_blocks_per_game': PlayerPlayoffsSerializer(top_blocks_per_game, many=True).data,
-            'top_steals_per_game': PlayerPlayoffsSerializer(top_steals_per_game, many=True).data,
+    def get_leaderboard_data(self, phase, categories, leaders, use_fairness_adjusted):
+        # Unless fairness adjusted, only players who played at least 75% of their team's games in the phase are ranked
+        data = leaderboard_data(self.serializer_classes[phase], categories, leaders[phase])
+        data.update({
             'fairness_adjusted': use_fairness_adjusted,
-            'min_games_played_ratio': 0.75 if not use_fairness_adjusted else None,
+            'min_games_played_ratio': MIN_GAMES_PLAYED_RATIO if not use_fairness_adjusted else None,
             'filtering_info': {
                 'fairness_adjusted': use_fairness_adjusted,
-                'min_games_played_ratio': 0.75 if not use_fairness_adjusted else None,
+                'min_games_played_ratio': MIN_GAMES_PLAYED_RATIO if not use_fairness_adjusted else None,
                 'description': 'When fairness_adjusted=false, only players who played at least 75% of their team\'s games are included to ensure data quality.'
             }
-        }
+        })
+        return data
+
 
-        return Response(data)
\ No newline at end of file
+class TopPlayoffsPlayersViewSet(TopPlayersViewSet):
+    phase = PlayerSeasonTotals.PLAYOFF
@@ -0,0 +1,90 @@
+"""
+Warming of a season's cached responses after an upload commits, so the
+first reads after it are cache hits instead of paying for the computation.
+
+The reads to warm are the paths in settings.RESPONSE_CACHE_WARM_PATHS, each
+with the season added to its query string. "{team}" in a path is replaced by
+each of the season's teams. They are computed by a pool of
+RESPONSE_CACHE_WARM_WORKERS threads, or inline when that is 0.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .cache import closing_connections, run_view
+from .models import Team
+
+logger = logging.getLogger(__name__)
+
+_warm_pool = None
+
+
+def get_warm_pool():
+    global _warm_pool
+    if _warm_pool is None:
+        _warm_pool = ThreadPoolExecutor(
+            max_workers=settings.RESPONSE_CACHE_WARM_WORKERS, thread_name_prefix='response-cache-warm'
+        )
+    return _warm_pool
+
+
+def warm_paths(season_number, paths=None):
+    """The paths of the reads to warm for a season, of RESPONSE_CACHE_WARM_PATHS unless given"""
+    if paths is None:
+        paths = settings.RESPONSE_CACHE_WARM_PATHS
+    season_paths = []
+    team_ids = None
+    for path in paths:
+        path += ('&' if '?' in path else '?') + f'season={season_number}'
+        if '{team}' in path:
+            if team_ids is None:
+                team_ids = list(Team.objects.filter(season__number=season_number)
+                                .order_by('pk').values_list('pk', flat=True))
+            season_paths.extend(path.format(team=team_id) for team_id in team_ids)
+        else:
+            season_paths.append(path)
+    return season_paths
+
+
+def warm_path(path):
+    try:
+        response = run_view(path)
+        if response.status_code != 200:
+            logger.warning('Warming %s returned %s', path, response.status_code)
+    except Exception:
+        logger.exception('Could not warm %s', path)
+
+
+def warm_season(season_number):
+    """Compute and cache a season's reads, in the warm pool unless it has no workers"""
+    paths = warm_paths(season_number)
+    if not paths:
+        return
+    started = time.perf_counter()
+
+    def log_duration():
+        logger.info('Warmed %s responses of season %s in %.2fs',
+                    len(paths), season_number, time.perf_counter() - started)
+
+    if not settings.RESPONSE_CACHE_WARM_WORKERS:
+        for path in paths:
+            warm_path(path)
+        log_duration()
+        return
+
+    remaining = [len(paths)]
+    remaining_lock = threading.Lock()
+
+    def path_done(future):
+        with remaining_lock:
+            remaining[0] -= 1
+            finished = remaining[0] == 0
+        if finished:
+            log_duration()
+
+    pool = get_warm_pool()
+    for path in paths:
+        pool.submit(closing_connections, warm_path, path).add_done_callback(path_done)
@@ -0,0 +1,7 @@
+# Load the Celery app with Django so shared_task uses it; Celery is only needed by the celery ingest executor
+try:
+    from .celery import app as celery_app
+except ImportError:
+    celery_app = None
+
+__all__ = ("celery_app",)
@@ -0,0 +1,11 @@
+import os
+
+from celery import Celery
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bball_league_api.settings")
+
+app = Celery("bball_league_api")
+
+# Every CELERY_ prefixed setting configures the app
+app.config_from_object("django.conf:settings", namespace="CELERY")
+app.autodiscover_tasks()
@@ -138,6 +138,14 @@ CELERY_TASK_TIME_LIMIT = 30 * 60
 # # https://docs.celeryq.dev/en/stable/userguide/configuration.html#beat-scheduler
 # CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
+# Uploads sent with async=true, or of INGEST_ASYNC_THRESHOLD bytes or more unless sent with async=false, are
+# processed as IngestJobs by "celery", "thread" (a pool in the web process) or "eager" (inline, for tests)
+INGEST_EXECUTOR = env("INGEST_EXECUTOR", default="thread")
+INGEST_THREAD_WORKERS = env.int("INGEST_THREAD_WORKERS", default=2)
+INGEST_ASYNC_THRESHOLD = env.int("INGEST_ASYNC_THRESHOLD", default=5 * 1024 * 1024)
+# A running IngestJob that hasn't reported progress for this many seconds is taken for dead and marked failed
+INGEST_JOB_STALE_AFTER = env.int("INGEST_JOB_STALE_AFTER", default=600)
+
 AUTH_USER_MODEL = "users.User"
 
 # Password validation
@@ -202,6 +210,9 @@ STATICFILES_FINDERS = [
 MEDIA_ROOT = str(BASE_DIR / "media")
 # https://docs.djangoproject.com/en/dev/ref/settings/#media-url
 MEDIA_URL = "/media/"
+# publish_season_snapshot writes static JSON of archived seasons here, on the media volume that nginx serves
+# them from (see nginx/nginx.conf)
+SEASON_SNAPSHOT_ROOT = env("SEASON_SNAPSHOT_ROOT", default=str(BASE_DIR / "mediafiles" / "snapshots"))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -309,14 +320,66 @@ SPECTACULAR_SETTINGS = {
 # ------------------------------------------------------------------------------
 
 
+# Each worker keeps the hottest entries in process memory in front of a cache shared by every worker,
+# and broadcasts invalidations so the others drop their copies (see api/cache_backends.py).
+# Without CACHE_REDIS_URL a local memory cache stands in for the shared tier.
+CACHE_REDIS_URL = env("CACHE_REDIS_URL", default="")
 CACHES = {
+    'shared': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': CACHE_REDIS_URL,
+    } if CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',  # Use local memory caching
-        # 'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',  # Use file-based caching
-        # 'LOCATION': '/path/to/cache/directory',  # Specify the path for file-based caching if chosen
-    }
+        'BACKEND': 'api.cache_backends.TwoTierCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'BUS': (
+                'api.cache_backends.RedisInvalidationBus' if CACHE_REDIS_URL
+                else 'api.cache_backends.LocalInvalidationBus'
+            ),
+            'LOCAL_MAX_ENTRIES': env.int("CACHE_LOCAL_MAX_ENTRIES", default=1000),
+            'LOCAL_TIMEOUT': env.int("CACHE_LOCAL_TIMEOUT", default=300),
+        },
+    },
 }
 
+# A missing response is computed by one request at a time (see api/cache.py): the lock expires after
+# RESPONSE_CACHE_LOCK_TIMEOUT seconds, and the other requests wait up to RESPONSE_CACHE_LOCK_WAIT seconds
+# for its result when there is no previous response to serve them
+RESPONSE_CACHE_LOCK_TIMEOUT = env.int("RESPONSE_CACHE_LOCK_TIMEOUT", default=30)
+RESPONSE_CACHE_LOCK_WAIT = env.float("RESPONSE_CACHE_LOCK_WAIT", default=5)
+# Cached responses older than this are served stale while a pool of RESPONSE_CACHE_REFRESH_WORKERS threads
+# recomputes them (0 refreshes inline), until they expire after REST_FRAMEWORK's DEFAULT_CACHE_TIMEOUT
+RESPONSE_CACHE_SOFT_TIMEOUT = env.int("RESPONSE_CACHE_SOFT_TIMEOUT", default=300)
+RESPONSE_CACHE_REFRESH_WORKERS = env.int("RESPONSE_CACHE_REFRESH_WORKERS", default=2)
+# Once an upload commits, these reads of its season are computed into the response cache by a pool of
+# RESPONSE_CACHE_WARM_WORKERS threads (0 warms inline) (see api/warming.py). The season is added to each
+# query string and "{team}" stands for every team of the season; an empty list turns warming off
+RESPONSE_CACHE_WARM_PATHS = env.list("RESPONSE_CACHE_WARM_PATHS", default=[
+    "/api/bball/teams/",
+    "/api/bball/teams/{team}/",
+    "/api/bball/players/",
+    "/api/bball/games/",
+    "/api/bball/top-players/",
+    "/api/bball/playoffs-top-players/",
+])
+RESPONSE_CACHE_WARM_WORKERS = env.int("RESPONSE_CACHE_WARM_WORKERS", default=2)
+# The reads computed and stored when a season is archived, as in RESPONSE_CACHE_WARM_PATHS (see
+# api/archive.py): the final standings, player totals and leaderboards
+SEASON_ARCHIVE_PATHS = env.list("SEASON_ARCHIVE_PATHS", default=[
+    "/api/bball/teams/",
+    "/api/bball/teams/{team}/",
+    "/api/bball/players/",
+    "/api/bball/top-players/",
+    "/api/bball/top-players/?fairness_adjusted=true",
+    "/api/bball/playoffs-top-players/",
+    "/api/bball/playoffs-top-players/?fairness_adjusted=true",
+])
+
 
 from datetime import timedelta
 